@@ -1,9 +1,96 @@
-from flask import Flask, jsonify,request
-from compiler import Compiler
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, jsonify, request, Response, stream_with_context
+from compiler import error_details, parse_stages
+from lexicalAnalizer import LexicalAnalyzer
+from compileCache import CompileCache
+from artifactStore import ArtifactStore
+from responseEncoder import dumps
+from optimizer import parse_passes
+from instrumentation import instrumentation
+from compileService import (CompileService, CompileOptions, CompileTimeout, QueueFull, SingleFlight,
+                            flight_key, run_compiler)
+from compactEncoding import msgpack
+from compileSession import SessionStore
+from compileChannel import CompileChannel
+import vectorEvaluator
+import virtualMachine
+import streamCompiler
 from flask_cors import CORS
 
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:  # optional: the /channel WebSocket needs `pip install flask-sock`
+    Sock = None
+
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
+CORS(app, resources={r"/*": {"origins": "*"}},
+     expose_headers=["X-Code-Bytes", "X-Data-Bytes", "X-Instructions"])
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+TEXT_MIMETYPE = "text/plain"
+BINARY_MIMETYPE = "application/octet-stream"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+OUTPUT_FORMATS = ("text", "binary")
+# "compact" flattens tokens and the AST (see compactEncoding.py); MessagePack always uses it
+ENCODINGS = ("json", "compact")
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+def json_object():
+    """The request's JSON object, {} without a JSON body, or None for any other JSON value."""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    return data if isinstance(data, dict) else None
+
+# ARTIFACT_STORE=path adds an on-disk tier shared by every process and kept across restarts
+artifact_store = None
+if os.environ.get('ARTIFACT_STORE'):
+    artifact_store = ArtifactStore(os.environ['ARTIFACT_STORE'], env_int('ARTIFACT_STORE_BYTES', 1024 ** 3))
+
+# Shared by every request in this process; set COMPILE_CACHE_ENTRIES=0 to disable
+compile_cache = None
+if env_int('COMPILE_CACHE_ENTRIES', 4096) > 0 or artifact_store is not None:
+    compile_cache = CompileCache(
+        max_entries=env_int('COMPILE_CACHE_ENTRIES', 4096),
+        max_bytes=env_int('COMPILE_CACHE_BYTES', 64 * 1024 * 1024),
+        store=artifact_store,
+    )
+
+# Incremental compile sessions live in this process; route a session's requests to one worker
+sessions = SessionStore(env_int('SESSION_LIMIT', 1000), env_int('SESSION_TTL', 3600))
+
+# Identical statements compiled at the same time share one inline compile
+inline_flights = SingleFlight()
+
+# Compiles arriving over /channel connections run here, so their replies can go out of order
+channel_executor = ThreadPoolExecutor(env_int('CHANNEL_WORKERS', 8), thread_name_prefix="channel")
+
+# COMPILE_MODE=pool compiles in worker processes instead of on the request thread.
+# Workers re-import the main module as __mp_main__; only the server starts a pool.
+compile_service = None
+if os.environ.get('COMPILE_MODE', 'inline') == 'pool' and __name__ != '__mp_main__':
+    compile_service = CompileService(
+        workers=env_int('COMPILE_WORKERS', None),
+        max_queue=env_int('COMPILE_QUEUE_DEPTH', None),
+        cpu_limit=env_float('COMPILE_CPU_LIMIT', 5.0),
+        wall_limit=env_float('COMPILE_WALL_LIMIT', None),
+        cache_entries=env_int('COMPILE_CACHE_ENTRIES', 4096),
+        cache_bytes=env_int('COMPILE_CACHE_BYTES', 64 * 1024 * 1024),
+        instrumentation=instrumentation,
+        store_path=artifact_store.path if artifact_store is not None else None,
+        store_bytes=artifact_store.max_bytes if artifact_store is not None else None,
+    )
 
 @app.route('/api/message')
 def message():
@@ -14,13 +101,358 @@ def compiler():
     if request.method == "GET":
         return jsonify({'message': 'Hello from the Flask backend!'})
     if request.method == "POST":
-        data = request.get_json()
+        if request.mimetype == TEXT_MIMETYPE:
+            return compile_stream_route()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object with the statement in "text"'}), 400
         statement = data.get('text')
         if not statement:
             return jsonify({'error': 'No statement provided'}), 400
-        compiler = Compiler(statement)
-        result = compiler.compile()
-        return jsonify(result)
+        if not isinstance(statement, str):
+            return jsonify({'error': 'text must be a string'}), 400
+        try:
+            optimizations = parse_passes(data.get('optimize', request.args.get('optimize')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        best = request.accept_mimetypes.best
+        raw_binary = best == BINARY_MIMETYPE
+        use_msgpack = best in MSGPACK_MIMETYPES
+        if use_msgpack and msgpack is None:
+            return jsonify({'error': 'MessagePack responses are not available on this server'}), 406
+        output_format = "binary" if raw_binary else data.get('format', request.args.get('format', 'text'))
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({'error': f"format must be one of: {', '.join(OUTPUT_FORMATS)}"}), 400
+        encoding = data.get('encoding', request.args.get('encoding', 'json'))
+        if encoding not in ENCODINGS:
+            return jsonify({'error': f"encoding must be one of: {', '.join(ENCODINGS)}"}), 400
+        try:
+            # A raw binary response carries nothing but the machine code
+            stages = ("machine_code",) if raw_binary else parse_stages(data.get('stages', request.args.get('stages')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        profile = str(data.get('profile', request.args.get('profile', ''))).lower() in ('1', 'true')
+        options = CompileOptions(optimizations, output_format, stages, encoding == "compact" or use_msgpack, profile)
+        try:
+            outcome = run_compile(statement, options)
+        except QueueFull as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 503
+        except CompileTimeout as e:
+            return jsonify({'error': str(e)}), 422
+        except ValueError as e:
+            # Lexical and parse errors, with their position
+            return jsonify(error_details(e)), 400
+        if raw_binary:
+            return binary_response(outcome)
+        if use_msgpack:
+            return Response(outcome.msgpack(), mimetype=best)
+        return Response(outcome.json(), mimetype='application/json')
+
+
+def run_compile(statement, options=CompileOptions(), lexical_analyzer=None):
+    """
+    Compile on the request thread, or in the worker pool when one is
+    configured. Identical concurrent requests (other than profiling ones)
+    share a single compile.
+    """
+    if compile_service is not None:
+        return compile_service.compile(statement, options)
+    if options.profile:
+        return run_compiler(statement, options, compile_cache, lexical_analyzer=lexical_analyzer)
+    return inline_flights.run(
+        flight_key(statement, options),
+        lambda: run_compiler(statement, options, compile_cache, lexical_analyzer=lexical_analyzer))
+
+
+def binary_response(outcome):
+    """Raw assembled code, with the size report in headers."""
+    size = outcome.machine_code_size
+    response = Response(outcome.machine_code_bytes, mimetype=BINARY_MIMETYPE)
+    response.headers['X-Code-Bytes'] = str(size['code_bytes'])
+    response.headers['X-Data-Bytes'] = str(size['data_bytes'])
+    response.headers['X-Instructions'] = str(size['instructions'])
+    return response
+
+
+def iter_ndjson_statements(stream):
+    """Yield statements from an NDJSON body one line at a time."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON line: {e}")
+            continue
+        yield item.get('text') if isinstance(item, dict) else item
+
+
+def compile_batch(statements, options=CompileOptions()):
+    """Compile each statement in turn, yielding one NDJSON line per statement."""
+    lexical_analyzer = LexicalAnalyzer()
+    for index, statement in enumerate(statements):
+        try:
+            if isinstance(statement, Exception):
+                raise statement
+            if not isinstance(statement, str) or not statement:
+                raise ValueError('No statement provided')
+            outcome = run_compile(statement, options, lexical_analyzer)
+        except Exception as e:
+            yield dumps(dict(error_details(e), index=index)) + "\n"
+            continue
+        # Same text dumps({'index', 'result'}) would give, reusing the encoded result
+        yield f'{{"index":{index},"result":{outcome.json()}}}\n'
+
+
+@app.route('/compile/batch', methods=["POST"])
+def compile_batch_route():
+    optimize = request.args.get('optimize')
+    output_format = request.args.get('format', 'text')
+    stages = request.args.get('stages')
+    encoding = request.args.get('encoding', 'json')
+    if request.mimetype == NDJSON_MIMETYPE:
+        # Read the body lazily so large batches are never held in memory at once
+        statements = iter_ndjson_statements(request.stream)
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            optimize = data.get('optimize', optimize)
+            output_format = data.get('format', output_format)
+            stages = data.get('stages', stages)
+            encoding = data.get('encoding', encoding)
+            data = data.get('texts')
+        if not isinstance(data, list):
+            return jsonify({'error': 'Expected a list of statements or an NDJSON body'}), 400
+        statements = (item.get('text') if isinstance(item, dict) else item for item in data)
+    try:
+        optimizations = parse_passes(optimize)
+        stages = parse_stages(stages)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(OUTPUT_FORMATS)}"}), 400
+    if encoding not in ENCODINGS:
+        return jsonify({'error': f"encoding must be one of: {', '.join(ENCODINGS)}"}), 400
+    options = CompileOptions(optimizations, output_format, stages, encoding == "compact")
+    return Response(stream_with_context(compile_batch(statements, options)), mimetype=NDJSON_MIMETYPE)
+
+@app.route('/compile/stream', methods=["POST"])
+def compile_stream_route():
+    """
+    Compile a raw (or chunked) source body statement by statement, streaming
+    the machine code back as each statement completes. Nothing but the
+    current statement is held in memory; see streamCompiler.py.
+    """
+    try:
+        optimizations = parse_passes(request.args.get('optimize'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    chunks = streamCompiler.read_chunks(request.stream)
+    output = streamCompiler.compile_stream(
+        chunks, optimizations, env_int('STREAM_MAX_STATEMENT_TOKENS', streamCompiler.MAX_STATEMENT_TOKENS))
+    return Response(stream_with_context(output), mimetype=TEXT_MIMETYPE)
+
+def compile_channel(ws):
+    """
+    Many compiles over one WebSocket, answered as they finish, with
+    per-connection rate limits and superseding by key (see compileChannel.py).
+    """
+    channel = CompileChannel(ws.send, run_compile, channel_executor,
+                             rate=env_float('CHANNEL_RATE', 20.0),
+                             burst=env_int('CHANNEL_BURST', 40),
+                             max_pending=env_int('CHANNEL_MAX_PENDING', 8))
+    try:
+        while True:
+            channel.receive(ws.receive())
+    except ConnectionClosed:
+        pass
+    finally:
+        channel.close()
+
+if Sock is not None:
+    Sock(app).route('/channel')(compile_channel)
+else:
+    @app.route('/channel')
+    def channel_unavailable():
+        return jsonify({'error': 'Compile channels are not available on this server'}), 501
+
+@app.route('/session', methods=["POST"])
+def create_session():
+    data = json_object()
+    if data is None:
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    source = data.get('text', '')
+    if not isinstance(source, str):
+        return jsonify({'error': 'text must be a string'}), 400
+    try:
+        optimizations = parse_passes(data.get('optimize', request.args.get('optimize')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    session_id, session = sessions.create(source, optimizations)
+    return Response(dumps({'session': session_id, 'version': session.version,
+                           'statements': session.statements()}),
+                    status=201, mimetype='application/json')
+
+@app.route('/session/<session_id>', methods=["GET", "DELETE"])
+def session_state(session_id):
+    if request.method == "DELETE":
+        if not sessions.delete(session_id):
+            return jsonify({'error': 'Unknown session'}), 404
+        return '', 204
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown session'}), 404
+    with session.lock:
+        body = {'session': session_id, 'version': session.version, 'result': session.result()}
+        if request.args.get('source') in ('1', 'true'):
+            body['source'] = session.source()
+    return Response(dumps(body), mimetype='application/json')
+
+@app.route('/session/<session_id>/edits', methods=["POST"])
+def edit_session(session_id):
+    """
+    Apply {"edits": [{"start", "end", "text"}, ...]} in order. Offsets index
+    the source as it is after the previous edit. Each change in the reply
+    replaces statements[start:start + removed] with its statements.
+    """
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown session'}), 404
+    data = json_object()
+    if data is None:
+        return jsonify({'error': 'Expected a JSON object with a list of "edits"'}), 400
+    edits = data.get('edits')
+    if not isinstance(edits, list):
+        return jsonify({'error': 'Expected a list of edits'}), 400
+    with session.lock:
+        if 'version' in data and data['version'] != session.version:
+            return jsonify({'error': 'Session has changed', 'version': session.version}), 409
+        changes = []
+        for edit in edits:
+            if not isinstance(edit, dict):
+                return jsonify({'error': 'Each edit must be an object', 'version': session.version}), 400
+            try:
+                changes.append(session.apply_edit(edit.get('start'), edit.get('end'), edit.get('text', '')))
+            except ValueError as e:
+                # Earlier edits in the list have been applied; the version tells the client where it stands
+                return jsonify({'error': str(e), 'version': session.version, 'applied': len(changes)}), 400
+        body = {'session': session_id, 'version': session.version, 'changes': changes}
+    return Response(dumps(body), mimetype='application/json')
+
+@app.route('/evaluate', methods=["POST"])
+def evaluate():
+    """
+    Evaluate {"text": expression, "columns": {name: [int, ...]}} for every
+    row at once (see vectorEvaluator.py for the integer semantics).
+    """
+    if vectorEvaluator.numpy is None:
+        return jsonify({'error': 'Expression evaluation is not available on this server'}), 501
+    data = json_object()
+    if data is None:
+        return jsonify({'error': 'Expected a JSON object with the expression in "text"'}), 400
+    try:
+        result = vectorEvaluator.evaluate(
+            data.get('text'), data.get('columns', {}),
+            max_rows=env_int('EVALUATE_MAX_ROWS', vectorEvaluator.MAX_ROWS),
+            max_operations=env_int('EVALUATE_MAX_OPERATIONS', vectorEvaluator.MAX_OPERATIONS))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(dumps(result), mimetype='application/json')
+
+@app.route('/run', methods=["POST"])
+def run_program():
+    """
+    Compile {"text", "inputs": {name: int}, "optimize"} to IR and execute it
+    (see virtualMachine.py). "max_steps" may lower the server's step limit.
+    """
+    data = json_object()
+    if data is None:
+        return jsonify({'error': 'Expected a JSON object with the program in "text"'}), 400
+    source = data.get('text')
+    if not isinstance(source, str) or not source.strip():
+        return jsonify({'error': 'No statement provided'}), 400
+    inputs = data.get('inputs', {})
+    if not isinstance(inputs, dict):
+        return jsonify({'error': 'inputs must map variable names to integers'}), 400
+    max_steps = env_int('RUN_MAX_STEPS', virtualMachine.MAX_STEPS)
+    requested = data.get('max_steps')
+    if requested is not None:
+        if type(requested) is not int or requested < 0:
+            return jsonify({'error': 'max_steps must be a non-negative integer'}), 400
+        max_steps = min(requested, max_steps)
+    try:
+        optimizations = parse_passes(data.get('optimize', request.args.get('optimize')))
+        result = virtualMachine.run(source, inputs, optimizations, compile_cache, max_steps,
+                                    env_float('RUN_TIME_LIMIT', virtualMachine.TIME_LIMIT))
+    except (virtualMachine.StepLimitExceeded, virtualMachine.TimeLimitExceeded) as e:
+        return jsonify({'error': str(e)}), 422
+    except ValueError as e:
+        return jsonify(error_details(e)), 400
+    return Response(dumps(result), mimetype='application/json')
+
+@app.route('/metrics')
+def metrics():
+    lines = instrumentation.render_prometheus()
+    if compile_cache is not None:
+        stats = compile_cache.stats()
+        for name, key, help_text in (
+            ("compiler_cache_hits_total", "hits", "Compile cache hits per stage."),
+            ("compiler_cache_misses_total", "misses", "Compile cache misses per stage."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for stage, count in sorted(stats[key].items()):
+                lines.append(f'{name}{{stage="{stage}"}} {count}')
+        lines.append("# HELP compiler_cache_bytes Estimated bytes held by the compile cache.")
+        lines.append("# TYPE compiler_cache_bytes gauge")
+        lines.append(f"compiler_cache_bytes {stats['bytes']}")
+    if artifact_store is not None:
+        # Counters are this process's; workers in pool mode keep their own
+        stats = artifact_store.stats()
+        for name, key, kind, help_text in (
+            ("compiler_store_hits_total", "hits", "counter", "Artifact store hits."),
+            ("compiler_store_misses_total", "misses", "counter", "Artifact store misses."),
+            ("compiler_store_errors_total", "errors", "counter", "Artifact store reads and writes that failed."),
+            ("compiler_store_evictions_total", "evictions", "counter", "Artifact store entries evicted."),
+            ("compiler_store_bytes", "bytes", "gauge", "Bytes held by the artifact store, all processes."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {stats[key] or 0}")
+    flights = (compile_service.flights if compile_service is not None else inline_flights).stats()
+    for name, key, kind, help_text in (
+        ("compiler_inflight_compiles", "in_flight", "gauge", "Distinct compiles currently running."),
+        ("compiler_requests_coalesced_total", "coalesced", "counter",
+         "Requests that shared an identical in-flight compile instead of running their own."),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {flights[key]}")
+    if compile_service is not None:
+        stats = compile_service.stats()
+        for name, key, kind, help_text in (
+            ("compiler_pool_workers", "workers", "gauge", "Compile worker processes."),
+            ("compiler_pool_pending", "pending", "gauge", "Compiles running or queued."),
+            ("compiler_pool_rejected_total", "rejected", "counter", "Compiles rejected with 503."),
+            ("compiler_pool_timeouts_total", "timeouts", "counter", "Compiles stopped by their time budget."),
+            ("compiler_pool_restarts_total", "restarts", "counter", "Pool restarts after a worker crash."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {stats[key]}")
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+@app.route('/cache/stats')
+def cache_stats():
+    if compile_cache is None:
+        return jsonify({'enabled': False})
+    stats = dict(compile_cache.stats(), enabled=True)
+    if artifact_store is not None:
+        stats['store'] = artifact_store.stats()
+    return jsonify(stats)
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,270 @@
+"""
+On-disk store of compiler stage outputs, shared by every process that opens
+the same file and kept across restarts.
+
+Entries are keyed by normalized-source hash, stage (plus option variant) and
+compiler version. The version is a hash of the pipeline's source files, so a
+deploy that changes the compiler starts from an empty namespace, and the old
+version's rows are the first to be evicted. SQLite in WAL mode lets any
+number of processes read while one writes. Values are pickled, so the file
+must only be writable by the server itself.
+
+Precompile a corpus so fresh workers start warm:
+
+    python artifactStore.py corpus.txt --path artifacts.db --optimize all --format text
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import time
+import zlib
+from threading import Lock
+
+from astNodes import from_json
+from compactEncoding import encode_ast, decode_ast
+from compileCache import CompileCache, MISSING
+from compiler import Compiler
+from lexicalAnalizer import LexicalAnalyzer
+from optimizer import parse_passes
+
+# Modules whose code decides what a stage produces
+PIPELINE_MODULES = (
+    "lexicalAnalizer", "syntaxAnalizer", "astNodes", "codeGenerator", "controlFlow", "intermediateCode", "optimizer",
+    "lowering", "registerAllocator", "machineCodeGenerator", "assembler", "compiler", "compactEncoding",
+    "artifactStore",
+)
+
+# Values at least this big are stored zlib-compressed
+COMPRESS_OVER = 4096
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    version TEXT NOT NULL,
+    source TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    value BLOB NOT NULL,
+    compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (version, source, stage)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS artifacts_used ON artifacts (used);
+"""
+
+
+def compiler_version():
+    """COMPILER_VERSION from the environment, or a hash of the pipeline modules' source."""
+    if os.environ.get('COMPILER_VERSION'):
+        return os.environ['COMPILER_VERSION']
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in PIPELINE_MODULES:
+        with open(os.path.join(directory, name + ".py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# The AST is stored in its flat postfix form: nested nodes are too deep to pickle
+ENCODERS = {"AST": encode_ast}
+DECODERS = {"AST": lambda value: from_json(decode_ast(value))}
+
+
+class ArtifactStore:
+    """
+    SQLite-backed stage store with the same get/put interface as CompileCache.
+    Storage is best-effort: a locked or broken database counts an error and
+    acts as a miss, never failing the compile.
+
+    max_bytes    stored (compressed) value bytes to keep; the least recently
+                 used entries are evicted past it
+    """
+
+    # Seconds between updates of an entry's last-used time, so reads rarely write
+    TOUCH_INTERVAL = 300
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024, version=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = version or compiler_version()
+        self.lock = Lock()
+        self.connection = None
+        self.pid = None
+        # Bytes written since the size was last checked against max_bytes
+        self.unchecked_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def connect(self):
+        # A connection must not cross a fork; each process opens its own
+        if self.connection is None or self.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")  # only takes effect on a new file
+            connection.executescript(SCHEMA)
+            self.connection, self.pid = connection, os.getpid()
+        return self.connection
+
+    def get(self, key, stage, variant=None):
+        slot = f"{stage}|{variant}" if variant else stage
+        with self.lock:
+            try:
+                connection = self.connect()
+                row = connection.execute(
+                    "SELECT value, compressed, used FROM artifacts WHERE version = ? AND source = ? AND stage = ?",
+                    (self.version, key, slot)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return MISSING
+                blob, compressed, used = row
+                now = time.time()
+                if now - used > self.TOUCH_INTERVAL:
+                    connection.execute(
+                        "UPDATE artifacts SET used = ? WHERE version = ? AND source = ? AND stage = ?",
+                        (now, self.version, key, slot))
+                value = pickle.loads(zlib.decompress(blob) if compressed else blob)
+            except Exception:  # a storage failure is a miss, never a failed compile
+                self.errors += 1
+                return MISSING
+            self.hits += 1
+        decode = DECODERS.get(stage)
+        return decode(value) if decode else value
+
+    def put(self, key, stage, value, variant=None):
+        slot = f"{stage}|{variant}" if variant else stage
+        encode = ENCODERS.get(stage)
+        with self.lock:
+            try:
+                blob = pickle.dumps(encode(value) if encode else value, pickle.HIGHEST_PROTOCOL)
+                compressed = len(blob) >= COMPRESS_OVER
+                if compressed:
+                    blob = zlib.compress(blob, 1)
+                if len(blob) > self.max_bytes:
+                    return
+                self.connect().execute(
+                    "INSERT OR REPLACE INTO artifacts (version, source, stage, value, compressed, size, used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.version, key, slot, blob, int(compressed), len(blob), time.time()))
+                self.writes += 1
+                self.unchecked_bytes += len(blob)
+                # Checking the total scans the table, so only do it every 5% of the budget
+                if self.unchecked_bytes > self.max_bytes // 20:
+                    self.unchecked_bytes = 0
+                    self.evict()
+            except Exception:
+                self.errors += 1
+
+    def evict(self):
+        """Delete entries until the store is back under 90% of max_bytes: other versions first, then LRU."""
+        connection = self.connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+            excess = total - self.max_bytes * 9 // 10
+            if total <= self.max_bytes or excess <= 0:
+                connection.execute("COMMIT")
+                return
+            doomed = []
+            rows = connection.execute(
+                "SELECT version, source, stage, size FROM artifacts ORDER BY version = ?, used", (self.version,))
+            for version, source, stage, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append((version, source, stage))
+                excess -= size
+            rows.close()
+            connection.executemany(
+                "DELETE FROM artifacts WHERE version = ? AND source = ? AND stage = ?", doomed)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self.evictions += len(doomed)
+        connection.execute("PRAGMA incremental_vacuum")
+
+    def clear(self):
+        with self.lock:
+            self.connect().execute("DELETE FROM artifacts")
+
+    def stats(self):
+        with self.lock:
+            try:
+                entries, size = self.connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+            except sqlite3.Error:
+                self.errors += 1
+                entries = size = None
+            return {
+                'path': self.path,
+                'version': self.version,
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'errors': self.errors,
+            }
+
+
+def read_corpus(path):
+    """Statements from a corpus file: one per line, or one JSON string or {"text": ...} per line for .jsonl/.ndjson."""
+    structured = path.endswith((".jsonl", ".ndjson"))
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if structured:
+                item = json.loads(line)
+                yield item.get('text') if isinstance(item, dict) else item
+            else:
+                yield line.rstrip("\n")
+
+
+def warm(store, statements, variants):
+    """Compile every statement with each (optimizations, output format) variant into the store."""
+    # No memory tier: every stage goes straight to the store
+    cache = CompileCache(max_entries=0, store=store)
+    lexical_analyzer = LexicalAnalyzer()
+    compiled = failed = 0
+    for statement in statements:
+        for optimizations, output_format in variants:
+            try:
+                Compiler(statement, lexical_analyzer, cache, optimizations, output_format).compile()
+                compiled += 1
+            except ValueError:
+                failed += 1
+    return compiled, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompile a corpus into the artifact store.")
+    parser.add_argument("corpus", help="one statement per line, or .jsonl/.ndjson of strings or {\"text\": ...}")
+    parser.add_argument("--path", default=os.environ.get('ARTIFACT_STORE', 'compile-artifacts.db'))
+    parser.add_argument("--max-bytes", type=int, default=int(os.environ.get('ARTIFACT_STORE_BYTES', 1024 ** 3)))
+    parser.add_argument("--optimize", action="append",
+                        help='passes to precompile with, as in the API ("all", "none" or a list); repeatable')
+    parser.add_argument("--format", action="append", choices=("text", "binary"), help="repeatable")
+    args = parser.parse_args(argv)
+
+    variants = [(parse_passes(None if spec == "none" else spec), output_format)
+                for spec in args.optimize or ["none"] for output_format in args.format or ["text"]]
+    store = ArtifactStore(args.path, args.max_bytes)
+    start = time.perf_counter()
+    compiled, failed = warm(store, read_corpus(args.corpus), variants)
+    stats = store.stats()
+    print(f"{compiled} compiles ({failed} failed) in {time.perf_counter() - start:.1f}s; "
+          f"{stats['entries']} entries, {stats['bytes']} bytes in {args.path} (version {store.version})",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import re
+
+from intermediateCode import IRProgram
+from optimizer import INT32_MAX, INT32_MIN
+
+# Instruction byte: operand count in the top two bits, opcode number below
+OPCODES = {name: number for number, name in enumerate([
+    "NOP", "MOV", "ADD", "SUB", "IMUL", "IDIV", "POWER", "SHL", "SAR", "SHR",
+    "AND", "OR", "NOT", "CMP", "JMP", "JE", "JNE", "JL", "JLE", "JG", "JGE",
+    "CALL", "RET", "PROC", "ENDP", "CALL Print", "CALL Input",
+])}
+
+# x86 register numbers
+REGISTERS = {"%EAX": 0, "%ECX": 1, "%EDX": 2, "%EBX": 3, "%ESP": 4, "%EBP": 5, "%ESI": 6, "%EDI": 7}
+
+# Operand tags (top three bits of an operand's first byte)
+TAG_REGISTER = 0x00   # low bits: register number
+TAG_IMMEDIATE = 0x20  # followed by a zigzag varint
+TAG_DATA = 0x40       # followed by a varint byte offset into the data section
+TAG_STACK = 0x60      # followed by a varint byte offset below EBP
+TAG_LABEL = 0x80      # followed by a 4-byte little-endian code offset
+
+LABEL_OPERAND_SIZE = 5
+DATA_SLOT_SIZE = 4
+
+_IMMEDIATE = re.compile(r'^-?\d+$')
+_STACK_SLOT = re.compile(r'^\[%EBP-(\d+)\]$')
+
+
+class AssemblerError(ValueError):
+    pass
+
+
+def varint(value, out):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def varint_size(value):
+    size = 1
+    while value > 0x7F:
+        value >>= 7
+        size += 1
+    return size
+
+
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+class Assembly:
+    """Assembled code plus the symbol tables needed to load or inspect it."""
+
+    def __init__(self, code, labels, data, instructions):
+        self.code = code
+        self.labels = labels
+        self.data = data
+        self.instructions = instructions
+
+    def size_report(self):
+        return {
+            'code_bytes': len(self.code),
+            'data_bytes': DATA_SLOT_SIZE * len(self.data),
+            'instructions': self.instructions,
+            'labels': len(self.labels),
+        }
+
+    def symbols(self):
+        return {'labels': self.labels, 'data': self.data}
+
+
+class Assembler:
+    """
+    Two-pass assembler from an IRProgram to packed bytes. The first pass sizes
+    every instruction and records label addresses and data slots in the
+    symbol table; the second pass encodes with labels resolved.
+    """
+
+    def __init__(self, program):
+        self.program = program
+        self.labels = {}  # label name -> code offset
+        self.data = {}    # variable name -> data offset
+
+    def assemble(self):
+        names = self.program.symbols.names
+        instructions = self.program.instructions
+        label_names = {names[i.operands[0]] for i in instructions if i.opcode == IRProgram.LABEL}
+        # Classify each symbol once rather than per operand
+        kinds = [self.classify(name, label_names) for name in names]
+
+        # Pass 1: sizes, label addresses and data slots
+        sizes = {}
+        offset = 0
+        count = 0
+        for instruction in instructions:
+            if instruction.opcode == IRProgram.LABEL:
+                self.labels[names[instruction.operands[0]]] = offset
+                continue
+            if instruction.opcode == IRProgram.PARAM:
+                continue
+            if instruction.opcode not in OPCODES:
+                raise AssemblerError(
+                    f"Cannot encode instruction: {self.program.render_instruction(instruction)}")
+            offset += 1
+            for o in instruction.operands:
+                size = sizes.get(o)
+                if size is None:
+                    size = sizes[o] = self.operand_size(kinds[o], names[o])
+                offset += size
+            count += 1
+
+        # Pass 2: encode with every label address known; each symbol's
+        # operand bytes are encoded once and reused
+        encoded = {}
+        code = bytearray()
+        for instruction in instructions:
+            if instruction.opcode in (IRProgram.LABEL, IRProgram.PARAM):
+                continue
+            code.append(len(instruction.operands) << 6 | OPCODES[instruction.opcode])
+            for o in instruction.operands:
+                operand = encoded.get(o)
+                if operand is None:
+                    operand = encoded[o] = self.encode_operand(kinds[o], names[o])
+                code += operand
+        return Assembly(code, self.labels, self.data, count)
+
+    def classify(self, name, label_names):
+        if name in REGISTERS:
+            return TAG_REGISTER
+        if _IMMEDIATE.match(name):
+            return TAG_IMMEDIATE
+        if _STACK_SLOT.match(name):
+            return TAG_STACK
+        if name in label_names:
+            return TAG_LABEL
+        return TAG_DATA
+
+    def operand_size(self, kind, name):
+        if kind == TAG_REGISTER:
+            return 1
+        if kind == TAG_IMMEDIATE:
+            value = int(name)
+            if not INT32_MIN <= value <= INT32_MAX:
+                raise AssemblerError(f"Immediate {name} does not fit in 32 bits")
+            return 1 + varint_size(zigzag(value))
+        if kind == TAG_STACK:
+            return 1 + varint_size(int(_STACK_SLOT.match(name).group(1)))
+        if kind == TAG_LABEL:
+            return LABEL_OPERAND_SIZE
+        return 1 + varint_size(self.data_offset(name))
+
+    def data_offset(self, name):
+        offset = self.data.get(name)
+        if offset is None:
+            offset = self.data[name] = DATA_SLOT_SIZE * len(self.data)
+        return offset
+
+    def encode_operand(self, kind, name):
+        code = bytearray()
+        if kind == TAG_REGISTER:
+            code.append(TAG_REGISTER | REGISTERS[name])
+        elif kind == TAG_IMMEDIATE:
+            code.append(TAG_IMMEDIATE)
+            varint(zigzag(int(name)), code)
+        elif kind == TAG_STACK:
+            code.append(TAG_STACK)
+            varint(int(_STACK_SLOT.match(name).group(1)), code)
+        elif kind == TAG_LABEL:
+            code.append(TAG_LABEL)
+            code += self.labels[name].to_bytes(4, 'little')
+        else:
+            code.append(TAG_DATA)
+            varint(self.data[name], code)
+        return bytes(code)
@@ -0,0 +1,269 @@
+"""
+Typed AST nodes. Operands stay plain strings (the token text); operators,
+assignments, if/while statements and programs are small __slots__ objects. Nodes are immutable
+once built, and NodeTable hash-conses binary nodes so a repeated
+subexpression is one shared object: the tree becomes a DAG.
+
+Nodes compare by identity. Two equal subtrees built through the same
+NodeTable are the same object, so that is all the parser needs. JSON dicts
+are made only for responses, by to_json().
+"""
+
+
+class Node:
+    __slots__ = ()
+
+    def children(self):
+        return (self.left, self.right)
+
+    def estimated_size(self):
+        """Rough byte size, for the compile cache; a shared subtree counts once."""
+        return sum(80 if isinstance(node, Node) else 0 for node in unique_nodes(self))
+
+
+class BinaryOp(Node):
+    __slots__ = ('operator', 'left', 'right')
+    type = "arithmetic"
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def __repr__(self):
+        return f"BinaryOp({self.operator!r}, {self.left!r}, {self.right!r})"
+
+
+class Assignment(Node):
+    __slots__ = ('left', 'right')
+    type = "assignment"
+    operator = "="
+
+    def __init__(self, left, right):
+        self.left = left      # target name
+        self.right = right    # operand string or BinaryOp
+
+    def __repr__(self):
+        return f"Assignment({self.left!r}, {self.right!r})"
+
+
+class Conditional(Node):
+    __slots__ = ('condition', 'body', 'orelse')
+    type = "conditional"
+
+    def __init__(self, condition, body, orelse=()):
+        self.condition = condition  # operand string or BinaryOp; nonzero is true
+        self.body = tuple(body)
+        self.orelse = tuple(orelse)
+
+    def children(self):
+        return (self.condition,) + self.body + self.orelse
+
+    def __repr__(self):
+        return f"Conditional({self.condition!r}, {list(self.body)!r}, {list(self.orelse)!r})"
+
+
+class Loop(Node):
+    __slots__ = ('condition', 'body')
+    type = "loop"
+
+    def __init__(self, condition, body):
+        self.condition = condition
+        self.body = tuple(body)
+
+    def children(self):
+        return (self.condition,) + self.body
+
+    def __repr__(self):
+        return f"Loop({self.condition!r}, {list(self.body)!r})"
+
+
+class Program(Node):
+    __slots__ = ('body',)
+    type = "program"
+
+    def __init__(self, body):
+        self.body = tuple(body)
+
+    def children(self):
+        return self.body
+
+    def __repr__(self):
+        return f"Program({list(self.body)!r})"
+
+
+# Nodes holding statement blocks, and their dict types with the keys of their blocks
+BLOCK_NODES = (Program, Conditional, Loop)
+BLOCK_TYPES = {'program': ('body',), 'conditional': ('true_block', 'false_block'), 'loop': ('body',)}
+
+
+def unique_nodes(ast):
+    """Every distinct node and operand reachable from ast, each once."""
+    seen = set()
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield node
+        if isinstance(node, Node):
+            stack.extend(node.children())
+
+
+def tree_size(ast):
+    """Nodes in the AST as a tree (a shared subtree counts every time it is used), leaf operands included."""
+    sizes = {}
+    stack = [(ast, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not isinstance(node, Node) or id(node) in sizes:
+            continue
+        if not children_done:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children())
+            continue
+        sizes[id(node)] = 1 + sum(sizes.get(id(child), 1) for child in node.children())
+    return sizes.get(id(ast), 1)
+
+
+class NodeTable:
+    """Hash-consing table: binary() returns the existing node for an (operator, left, right) it has seen."""
+
+    __slots__ = ('nodes',)
+
+    def __init__(self):
+        self.nodes = {}
+
+    def binary(self, operator, left, right):
+        # Children are strings or nodes from this table, so identity hashing is enough
+        key = (operator, left, right)
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = BinaryOp(operator, left, right)
+        return node
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+def to_json(ast):
+    """
+    The response form of an AST: nested dicts, with operands as strings.
+    Anything that isn't a Node (an error message, an AST that is already a
+    dict) is returned unchanged. Blocks are walked with an explicit stack,
+    so nesting depth is limited only by memory.
+    """
+    if not isinstance(ast, BLOCK_NODES):
+        return statement_json(ast)
+    converted = {}
+
+    def block(statements):
+        return [converted[id(statement)] if isinstance(statement, BLOCK_NODES) else statement_json(statement)
+                for statement in statements]
+
+    stack = [(ast, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children() if isinstance(child, BLOCK_NODES))
+            continue
+        if isinstance(node, Program):
+            converted[id(node)] = {'type': 'program', 'body': block(node.body)}
+        elif isinstance(node, Conditional):
+            converted[id(node)] = {'type': 'conditional', 'condition': expression_json(node.condition),
+                                   'true_block': block(node.body), 'false_block': block(node.orelse)}
+        else:
+            converted[id(node)] = {'type': 'loop', 'condition': expression_json(node.condition),
+                                   'body': block(node.body)}
+    return converted[id(ast)]
+
+
+def statement_json(ast):
+    """to_json() for an assignment or an expression."""
+    if isinstance(ast, Assignment):
+        return {'type': 'assignment', 'operator': '=', 'left': ast.left, 'right': expression_json(ast.right)}
+    return expression_json(ast)
+
+
+def expression_json(root):
+    """
+    Dicts for an expression. Walks with an explicit stack, so deep
+    expressions are fine, and converts each shared node only once.
+    """
+    if type(root) is not BinaryOp:
+        return root
+    converted = {}
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        left, right = node.left, node.right
+        # Convert the children first; the node stays on the stack until they are done
+        if type(left) is BinaryOp:
+            left = converted.get(left)
+            if left is None:
+                stack.append(node.left)
+                continue
+        if type(right) is BinaryOp:
+            right = converted.get(right)
+            if right is None:
+                stack.append(node.right)
+                continue
+        stack.pop()
+        converted[node] = {'operator': node.operator, 'left': left, 'right': right}
+    return converted[root]
+
+
+def from_json(ast, table=None):
+    """Build nodes from a dict AST as produced by to_json(). Dicts of other node types are left as they are."""
+    if not isinstance(ast, dict):
+        return ast
+    if table is None:
+        table = NodeTable()
+    if ast.get('type') not in BLOCK_TYPES:
+        return statement_from_json(ast, table)
+    # Blocks post-order with an explicit stack, as in to_json()
+    built = {}
+    stack = [(ast, False)]
+    while stack:
+        node, children_done = stack.pop()
+        blocks = [node.get(key) or () for key in BLOCK_TYPES[node['type']]]
+        if not children_done:
+            stack.append((node, True))
+            stack.extend((statement, False) for statements in blocks for statement in statements
+                         if isinstance(statement, dict) and statement.get('type') in BLOCK_TYPES)
+            continue
+        blocks = [[built[id(statement)] if isinstance(statement, dict) and statement.get('type') in BLOCK_TYPES
+                   else statement_from_json(statement, table) for statement in statements]
+                  for statements in blocks]
+        if node['type'] == 'program':
+            built[id(node)] = Program(blocks[0])
+        elif node['type'] == 'conditional':
+            built[id(node)] = Conditional(statement_from_json(node['condition'], table), *blocks)
+        else:
+            built[id(node)] = Loop(statement_from_json(node['condition'], table), blocks[0])
+    return built[id(ast)]
+
+
+def statement_from_json(ast, table):
+    """from_json() for an assignment or an expression."""
+    # Post-order over the dicts; results stack holds converted children
+    results = []
+    stack = [(ast, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not isinstance(node, dict) or 'left' not in node or 'right' not in node:
+            results.append(node)
+        elif not children_done:
+            stack.append((node, True))
+            stack.append((node['right'], False))
+            stack.append((node['left'], False))
+        else:
+            right = results.pop()
+            left = results.pop()
+            if node.get('type') == 'assignment':
+                results.append(Assignment(left, right))
+            else:
+                results.append(table.binary(node['operator'], left, right))
+    return results[0]
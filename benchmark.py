@@ -0,0 +1,253 @@
+"""
+Benchmarks for the compiler pipeline.
+
+The default run compiles a seeded corpus from ProgramGenerator and reports,
+as JSON, the throughput and peak memory of each stage class, of the
+end-to-end Compiler.compile, and HTTP latency percentiles through the Flask
+test client. The same seed and settings always give the same corpus, so two
+result files can be compared:
+
+    python benchmark.py --seed 1 --output before.json
+    python benchmark.py --seed 1 --output after.json
+    python benchmark.py --compare before.json after.json
+
+--scaling instead times inputs of doubling size: long operator chains,
+deeply nested brackets and programs of many statements. Time per token
+should stay flat as the size grows, i.e. compile time is linear in input
+length.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from compiler import Compiler
+from lexicalAnalizer import LexicalAnalyzer
+from syntaxAnalizer import SyntaxAnalyzer
+from codeGenerator import IntermediateCodeGenerator
+from machineCodeGenerator import MachineCodeGenerator
+from optimizer import Optimizer, PASSES
+from programGenerator import ProgramGenerator, DEFAULT_OPERATOR_MIX
+
+
+def operator_chain(size):
+    return "x = " + " + ".join(f"a{i % 7} * {i}" for i in range(size))
+
+
+def nested_brackets(size):
+    return "x = " + "(a + " * size + "1" + ")" * size
+
+
+def many_statements(size):
+    return "\n".join(f"v{i % 50} = a{i % 7} * {i} + v{(i + 1) % 50}" for i in range(size))
+
+
+def time_compile(statement, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Compiler(statement).compile()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_scaling(name, build, sizes):
+    print(f"{name}:")
+    print(f"  {'size':>8} {'tokens':>9} {'ms':>10} {'us/token':>9}")
+    for size in sizes:
+        statement = build(size)
+        tokens = len(LexicalAnalyzer().scanner(statement))
+        elapsed = time_compile(statement)
+        print(f"  {size:>8} {tokens:>9} {elapsed * 1000:>10.2f} {elapsed * 1e6 / tokens:>9.2f}")
+
+
+# Stage benchmarks: each stage runs on inputs prepared by the one before it,
+# so its timing covers only its own class
+
+def stage_inputs(statements):
+    lexer = LexicalAnalyzer()
+    tokens = [lexer.analyzer(s) for s in statements]
+    asts = [SyntaxAnalyzer(t).parseTreeGenerator() for t in tokens]
+    programs = [IntermediateCodeGenerator(a).generate_intermediate_code() for a in asts]
+    return tokens, asts, programs
+
+
+def stage_benchmarks(statements):
+    tokens, asts, programs = stage_inputs(statements)
+    lexer = LexicalAnalyzer()
+    return {
+        "lex": lambda: [lexer.analyzer(s) for s in statements],
+        "parse": lambda: [SyntaxAnalyzer(t).parseTreeGenerator() for t in tokens],
+        "ir": lambda: [IntermediateCodeGenerator(a).generate_intermediate_code() for a in asts],
+        "optimize": lambda: [Optimizer(p, PASSES).optimize() for p in programs],
+        "machine_code": lambda: [MachineCodeGenerator(p).generate_code() for p in programs],
+        "assemble": lambda: [MachineCodeGenerator(p).generate_binary() for p in programs],
+        "end_to_end": lambda: [Compiler(s).compile() for s in statements],
+    }
+
+
+def measure(run, repeat):
+    """Best and mean wall time over repeat runs, then the tracemalloc peak of one more."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), statistics.mean(times), peak
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def http_latency(statements, rounds, use_cache=False):
+    """Latency of POST / through the Flask test client, in milliseconds."""
+    import app as app_module
+
+    saved_cache = app_module.compile_cache
+    if not use_cache:
+        app_module.compile_cache = None
+    try:
+        client = app_module.app.test_client()
+        client.post('/', json={'text': statements[0]})  # warm-up
+        latencies = []
+        for _ in range(rounds):
+            for statement in statements:
+                start = time.perf_counter()
+                response = client.post('/', json={'text': statement})
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code} for {statement!r}")
+    finally:
+        app_module.compile_cache = saved_cache
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'cache': use_cache,
+        'mean_ms': statistics.mean(latencies),
+        'p50_ms': percentile(latencies, 0.50),
+        'p90_ms': percentile(latencies, 0.90),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': latencies[-1],
+    }
+
+
+def run_suite(seed, count, size, depth, operators, repeat, http_rounds, http_cache):
+    generator = ProgramGenerator(seed, size, depth, operators)
+    statements = generator.statements(count)
+    token_count = sum(len(t) for t in stage_inputs(statements)[0])
+
+    stages = {}
+    for name, run in stage_benchmarks(statements).items():
+        best, mean, peak = measure(run, repeat)
+        stages[name] = {
+            'best_seconds': best,
+            'mean_seconds': mean,
+            'statements_per_second': count / best,
+            'tokens_per_second': token_count / best,
+            'peak_bytes': peak,
+        }
+
+    results = {
+        'config': {
+            'seed': seed, 'statements': count, 'size': size, 'depth': depth,
+            'operators': operators or DEFAULT_OPERATOR_MIX, 'repeat': repeat,
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+        },
+        'tokens': token_count,
+        'stages': stages,
+    }
+    if http_rounds:
+        results['http'] = http_latency(statements, http_rounds, http_cache)
+    return results
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        items = {}
+        for key, inner in value.items():
+            items.update(flatten(inner, f"{prefix}{key}."))
+        return items
+    return {prefix[:-1]: value}
+
+
+def compare(before_path, after_path):
+    """Print every numeric metric of two result files with its relative change."""
+    with open(before_path) as f:
+        before = flatten(json.load(f))
+    with open(after_path) as f:
+        after = flatten(json.load(f))
+    for key in sorted(before.keys() | after.keys()):
+        old, new = before.get(key), after.get(key)
+        if key.startswith(("config.", "environment.")):
+            if old != new:
+                print(f"  {key}: {old} -> {new}")
+            continue
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+            print(f"  {key:<45} {old:>14.6g} {new:>14.6g} {(new - old) / old * 100:>+8.1f}%")
+        elif old != new:
+            print(f"  {key}: {old} -> {new}")
+
+
+def parse_operator_mix(value):
+    """"+:4,*:2" -> {'+': 4, '*': 2}"""
+    mix = {}
+    for part in value.split(","):
+        operator, _, weight = part.partition(":")
+        mix[operator.strip()] = float(weight) if weight else 1
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--statements", type=int, default=200, help="statements in the corpus")
+    parser.add_argument("--size", type=int, default=50, help="operands per statement")
+    parser.add_argument("--depth", type=int, default=4, help="maximum bracket nesting")
+    parser.add_argument("--operators", type=parse_operator_mix, default=None,
+                        help='operator weights, e.g. "+:4,*:2,**:1"')
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--http-rounds", type=int, default=3, help="passes over the corpus via HTTP; 0 skips")
+    parser.add_argument("--http-cache", action="store_true", help="keep the compile cache on for HTTP requests")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--scaling", action="store_true", help="run the doubling-size scaling benchmark")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.scaling:
+        sizes = [1000, 2000, 4000, 8000, 16000, 32000]
+        run_scaling("operator chain", operator_chain, sizes)
+        run_scaling("nested brackets", nested_brackets, sizes)
+        run_scaling("statements", many_statements, sizes)
+        return
+
+    results = run_suite(args.seed, args.statements, args.size, args.depth, args.operators,
+                        args.repeat, args.http_rounds, args.http_cache)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,33 @@
+from types import GeneratorType
+
+from astNodes import BinaryOp, Node, from_json
+from controlFlow import ControlFlowGraph
+from intermediateCode import IRProgram, label_name, temp_name
+
+# Comparison operator -> the jump taken when it is false
+NEGATED_JUMPS = {"==": "JNE", "!=": "JE", "<": "JGE", "<=": "JG", ">": "JLE", ">=": "JL"}
+
+
 class IntermediateCodeGenerator:
     """
     Converts the AST to intermediate code (MASM-like instructions)
     """
 
+    # Node type -> handler method name
+    HANDLERS = {
+        "assignment": "handle_assignment",
+        "program": "handle_program",
+        "arithmetic": "handle_arithmetic",
+        "conditional": "handle_conditional",
+        "loop": "handle_loop",
+        "function": "handle_function",
+        "io": "handle_io",
+    }
+
     def __init__(self, ast):
-        self.ast = ast
-        self.intermediate_code = []
+        # A dict AST (the response form) is turned back into nodes
+        self.ast = from_json(ast)
+        self.intermediate_code = IRProgram()
         self.temp_counter = 0
         self.label_counter = 0
         self.symbol_table = {
@@ -49,109 +71,129 @@ class IntermediateCodeGenerator:
         }
 
     def generate_intermediate_code(self):
-        print("Generating intermediate code...")
-        if not self.ast or not isinstance(self.ast, dict):
+        if not self.ast or not isinstance(self.ast, (Node, dict)):
             raise ValueError("AST is empty or invalid")
         self.process_node(self.ast)
+        if self.label_counter:
+            # Branches were emitted one construct at a time; tidy them on the whole program's CFG
+            self.intermediate_code = ControlFlowGraph(self.intermediate_code).simplify()
         return self.intermediate_code
 
     def process_node(self, node):
-        node_type = node.get("type")
-        if node_type == "assignment":
-            self.handle_assignment(node)
-        elif node_type == "arithmetic":
-            self.handle_arithmetic(node)
-        elif node_type == "conditional":
-            self.handle_conditional(node)
-        elif node_type == "loop":
-            self.handle_loop(node)
-        elif node_type == "function":
-            self.handle_function(node)
-        elif node_type == "io":
-            self.handle_io(node)
-        else:
-            raise ValueError(f"Unknown node type: {node_type}")
+        # Block handlers are generators that yield their statements; running
+        # them from an explicit stack keeps deep if/while nesting off the
+        # Python call stack
+        stack = []
+        while True:
+            node_type = node.type if isinstance(node, Node) else node.get("type")
+            handler = self.HANDLERS.get(node_type)
+            if handler is None:
+                raise ValueError(f"Unknown node type: {node_type}")
+            result = getattr(self, handler)(node)
+            if isinstance(result, GeneratorType):
+                stack.append(result)
+            node = None
+            while stack and node is None:
+                node = next(stack[-1], None)
+                if node is None:
+                    stack.pop()
+            if node is None:
+                return
+
+    def handle_program(self, node):
+        # Statements share temp and label counters, so names never collide
+        yield from node.body
 
     def handle_assignment(self, node):
-        left = node["left"]
-        right = node["right"]
-        if isinstance(right, dict) and "operator" in right:
+        left = node.left
+        right = node.right
+        if isinstance(right, BinaryOp):
             temp = self.handle_arithmetic(right)
-            self.intermediate_code.append(f"MOV {left}, {temp}")
+            self.intermediate_code.emit("MOV", left, temp)
         else:
-            self.intermediate_code.append(f"MOV {left}, {right}")
+            self.intermediate_code.emit("MOV", left, right)
 
     def handle_arithmetic(self, node):
-        left = node["left"]
-        op = node["operator"]
-        right = node["right"]
-
-        # Recursively handle operands if they are nested operations
-        if isinstance(left, dict):
-            left = self.handle_arithmetic(left)
-        if isinstance(right, dict):
-            right = self.handle_arithmetic(right)
-
-        temp = f"temp{self.temp_counter}"
-        self.temp_counter += 1
-        self.intermediate_code.append(f"MOV {temp}, {left}")
-        self.intermediate_code.append(f"{self.symbol_table[op]} {temp}, {right}")
-        return temp
-
-    def handle_conditional(self, node):
-        cond = node["condition"]
-        true_block = node["true_block"]
-        false_block = node.get("false_block")
-        l_true = f"label{self.label_counter}"
+        # Post-order walk with an explicit stack so deeply nested expressions
+        # don't hit the recursion limit; left operands are emitted first
+        stack = [(node, False)]
+        results = []
+        while stack:
+            current, operands_ready = stack.pop()
+            if not isinstance(current, BinaryOp):
+                results.append(current)
+                continue
+            if not operands_ready:
+                stack.append((current, True))
+                stack.append((current.right, False))
+                stack.append((current.left, False))
+                continue
+
+            right = results.pop()
+            left = results.pop()
+            temp = temp_name(self.temp_counter)
+            self.temp_counter += 1
+            self.intermediate_code.emit("MOV", temp, left)
+            self.intermediate_code.emit(self.symbol_table[current.operator], temp, right)
+            results.append(temp)
+        return results[0]
+
+    def new_label(self):
+        label = label_name(f"L{self.label_counter}")
         self.label_counter += 1
+        return label
+
+    def operand(self, node):
+        """The operand holding an expression's value, computing it into a temp if needed."""
+        return self.handle_arithmetic(node) if isinstance(node, BinaryOp) else node
+
+    def branch_unless(self, condition, label):
+        """Jump to label when condition is false (zero)."""
+        jump = NEGATED_JUMPS.get(condition.operator) if isinstance(condition, BinaryOp) else None
+        if jump is not None:
+            # A comparison compares its operands directly instead of materializing 1 or 0
+            left = self.operand(condition.left)
+            right = self.operand(condition.right)
+            self.intermediate_code.emit("CMP", left, right)
+        else:
+            self.intermediate_code.emit("CMP", self.operand(condition), "0")
+            jump = "JE"
+        self.intermediate_code.emit(jump, label)
 
-        self.intermediate_code.append(f"CMP {cond['operand1']}, {cond['operand2']}")
-        self.intermediate_code.append(f"JE {l_true}")
-
-        for stmt in true_block:
-            self.process_node(stmt)
-
-        if false_block:
-            l_end = f"LABEL{self.label_counter}"
-            self.label_counter += 1
-            self.intermediate_code.append(f"JMP {l_end}")
-            for stmt in false_block:
-                self.process_node(stmt)
-            self.intermediate_code.append(f"{l_end}:")
-
-        self.intermediate_code.append(f"{l_true}:")
+    def handle_conditional(self, node):
+        l_else = self.new_label()
+        self.branch_unless(node.condition, l_else)
+        yield from node.body
+        if node.orelse:
+            l_end = self.new_label()
+            self.intermediate_code.emit("JMP", l_end)
+            self.intermediate_code.label(l_else)
+            yield from node.orelse
+            self.intermediate_code.label(l_end)
+        else:
+            self.intermediate_code.label(l_else)
 
     def handle_loop(self, node):
-        cond = node["condition"]
-        body = node["body"]
-        l_start = f"LABEL{self.label_counter}"
-        self.label_counter += 1
-        l_end = f"LABEL{self.label_counter}"
-        self.label_counter += 1
-
-        self.intermediate_code.append(f"{l_start}:")
-        self.intermediate_code.append(f"CMP {cond['operand1']}, {cond['operand2']}")
-        self.intermediate_code.append(f"JE {l_end}")
-
-        for stmt in body:
-            self.process_node(stmt)
-
-        self.intermediate_code.append(f"JMP {l_start}")
-        self.intermediate_code.append(f"{l_end}:")
+        l_start = self.new_label()
+        l_end = self.new_label()
+        self.intermediate_code.label(l_start)
+        self.branch_unless(node.condition, l_end)
+        yield from node.body
+        self.intermediate_code.emit("JMP", l_start)
+        self.intermediate_code.label(l_end)
 
     def handle_function(self, node):
         name = node["name"]
         params = node.get("parameters", [])
         body = node["body"]
 
-        self.intermediate_code.append(f"{self.symbol_table['function']} {name}")
+        self.intermediate_code.emit(self.symbol_table["function"], name)
         for param in params:
-            self.intermediate_code.append(f"; param {param}")
-        for stmt in body:
-            self.process_node(stmt)
-        self.intermediate_code.append("RET")
+            self.intermediate_code.emit(IRProgram.PARAM, param)
+        yield from body
+        self.intermediate_code.emit("RET")
 
     def handle_io(self, node):
         op = node["operation"]
         var = node["variable"]
-        self.intermediate_code.append(f"{self.symbol_table[op]} {var}")
+        self.intermediate_code.emit(self.symbol_table[op], var)
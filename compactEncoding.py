@@ -0,0 +1,170 @@
+"""
+Compact response encoding: flat arrays instead of nested lists and dicts.
+
+tokens  one flat array alternating value and type code:
+        ["x", 2, "=", 4, "1", 1]  for  x = 1
+AST     postfix (reverse Polish) array: operands are strings, operators are
+        integer codes into AST_OPERATORS, each applying to the two entries
+        before it:  ["x", "a", "1", 4, 0]  for  x = a + 1
+        A program is a list of its statements' postfix arrays. if/while
+        statements stay objects, with their condition in postfix and their
+        blocks as lists of postfix statements. An AST that is an error
+        message stays a string.
+
+Both are linear in the input with no nesting, so they encode quickly in
+JSON or MessagePack however deep the expression is.
+"""
+from astNodes import BLOCK_NODES, BLOCK_TYPES, Conditional, Node, Program, from_json
+from lexicalAnalizer import OPERATORS
+
+try:
+    import msgpack
+except ImportError:  # optional: MessagePack responses need `pip install msgpack`
+    msgpack = None
+
+TOKEN_TYPES = ("keyword", "int", "identifier", "unknown", "operator", "delimiter")
+AST_OPERATORS = ("=",) + tuple(sorted(OPERATORS - {"="}))
+
+_TOKEN_CODES = {name: code for code, name in enumerate(TOKEN_TYPES)}
+_OPERATOR_CODES = {name: code for code, name in enumerate(AST_OPERATORS)}
+
+
+def encode_tokens(tokens):
+    flat = []
+    for value, token_type in tokens:
+        flat.append(value)
+        flat.append(_TOKEN_CODES[token_type])
+    return flat
+
+
+def decode_tokens(flat):
+    return [[flat[i], TOKEN_TYPES[flat[i + 1]]] for i in range(0, len(flat), 2)]
+
+
+def encode_ast(ast):
+    if isinstance(ast, dict) and ast.get('type') in BLOCK_TYPES:
+        ast = from_json(ast)
+    if not isinstance(ast, BLOCK_NODES):
+        return encode_statement(ast)
+    # Blocks post-order with an explicit stack, so nesting depth is limited only by memory
+    encoded = {}
+
+    def block(statements):
+        return [encoded[id(statement)] if isinstance(statement, BLOCK_NODES) else encode_statement(statement)
+                for statement in statements]
+
+    stack = [(ast, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children() if isinstance(child, BLOCK_NODES))
+        elif isinstance(node, Program):
+            encoded[id(node)] = block(node.body)
+        elif isinstance(node, Conditional):
+            encoded[id(node)] = {'type': 'conditional', 'condition': encode_statement(node.condition),
+                                 'true_block': block(node.body), 'false_block': block(node.orelse)}
+        else:
+            encoded[id(node)] = {'type': 'loop', 'condition': encode_statement(node.condition),
+                                 'body': block(node.body)}
+    return encoded[id(ast)]
+
+
+def encode_statement(ast):
+    """The postfix array of an assignment or expression."""
+    if not isinstance(ast, (dict, Node)):
+        return ast
+    out = []
+    # Post-order walk: (node, children done) pairs on an explicit stack
+    stack = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if isinstance(node, Node):
+            # Nodes go straight to postfix, without a dict in between
+            if expanded:
+                out.append(_OPERATOR_CODES[node.operator])
+            else:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+        elif not isinstance(node, dict):
+            out.append(node)
+        elif expanded:
+            out.append(_OPERATOR_CODES[node['operator']])
+        else:
+            if 'left' not in node or 'right' not in node:
+                raise ValueError(f"Cannot encode AST node: {node.get('type', node)}")
+            stack.append((node, True))
+            stack.append((node['right'], False))
+            stack.append((node['left'], False))
+    return out
+
+
+def _is_block(postfix):
+    """True for an encoded program (a list of statements) or if/while statement (an object)."""
+    if isinstance(postfix, dict):
+        return True
+    return isinstance(postfix, list) and bool(postfix) and isinstance(postfix[0], (list, dict))
+
+
+def decode_ast(postfix):
+    if not _is_block(postfix):
+        return decode_statement(postfix)
+    decoded = {}
+    stack = [(postfix, False)]
+    while stack:
+        item, children_done = stack.pop()
+        blocks = ({key: item[key] for key in ('true_block', 'false_block', 'body') if key in item}
+                  if isinstance(item, dict) else {'body': item})
+        if not children_done:
+            stack.append((item, True))
+            stack.extend((statement, False) for statements in blocks.values() for statement in statements
+                         if _is_block(statement))
+            continue
+        blocks = {key: [decoded[id(statement)] if _is_block(statement) else decode_statement(statement)
+                        for statement in statements]
+                  for key, statements in blocks.items()}
+        if isinstance(item, dict):
+            decoded[id(item)] = dict(item, condition=decode_statement(item['condition']), **blocks)
+        else:
+            decoded[id(item)] = {'type': 'program', **blocks}
+    return decoded[id(postfix)]
+
+
+def decode_statement(postfix):
+    """The dict form of an assignment or expression's postfix array."""
+    if not isinstance(postfix, list):
+        return postfix
+    stack = []
+    for item in postfix:
+        if isinstance(item, int):
+            right = stack.pop()
+            left = stack.pop()
+            operator = AST_OPERATORS[item]
+            node = {'operator': operator, 'left': left, 'right': right}
+            if operator == '=':
+                node = {'type': 'assignment', 'operator': '=', 'left': left, 'right': right}
+            stack.append(node)
+        else:
+            stack.append(item)
+    return stack.pop()
+
+
+ENCODERS = {
+    "tokens": encode_tokens,
+    "AST": encode_ast,
+}
+
+
+def compact_result(result):
+    """Re-encode a Compiler.compile() result with flat tokens and AST, plus the code tables."""
+    compact = [[name, ENCODERS[name](value) if name in ENCODERS else value] for name, value in result]
+    if any(name in ENCODERS for name, _ in result):
+        compact.append(["compact", {'token_types': TOKEN_TYPES, 'ast_operators': AST_OPERATORS}])
+    return compact
+
+
+def pack_msgpack(result):
+    if msgpack is None:
+        raise ValueError("MessagePack support needs the msgpack package")
+    return msgpack.packb(result)
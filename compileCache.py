@@ -0,0 +1,137 @@
+import hashlib
+import re
+from collections import OrderedDict
+from threading import Lock
+
+STAGES = ("tokens", "AST", "intermediate_code", "optimized_code", "machine_code")
+
+# Sentinel for a stage that has not been cached (None is a valid stage output)
+MISSING = object()
+
+_HORIZONTAL_SPACE = re.compile(r'[ \t\r\f\v]+')
+
+
+def normalize_source(statement):
+    """
+    Collapse insignificant whitespace so equivalent submissions share a key.
+    Newlines are kept because they separate statements.
+    """
+    lines = (_HORIZONTAL_SPACE.sub(' ', line).strip() for line in statement.split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def source_key(statement):
+    return hashlib.sha256(normalize_source(statement).encode('utf-8')).hexdigest()
+
+
+def estimate_size(value):
+    """Rough byte size of a stage output (strings, bytes, numbers, lists, dicts and IR)."""
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += 49 + len(item)
+        elif isinstance(item, (bytes, bytearray)):
+            size += 33 + len(item)
+        elif hasattr(item, 'estimated_size'):
+            size += item.estimated_size()
+        elif isinstance(item, dict):
+            size += 64 + 16 * len(item)
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            size += 56 + 8 * len(item)
+            stack.extend(item)
+        else:
+            size += 32
+    return size
+
+
+class CompileCache:
+    """
+    Bounded LRU cache of compiler stage outputs keyed on a normalized-source hash.
+    Each stage is stored separately, so a partially cached entry still lets the
+    compiler skip the stages it already has. An optional store (such as an
+    ArtifactStore) is a second, shared tier: memory misses are looked up there
+    and every put is written through to it.
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=None, store=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.store = store
+        self.entries = OrderedDict()  # key -> {stage or (stage, variant): (value, size)}
+        self.total_bytes = 0
+        self.hits = {stage: 0 for stage in STAGES}
+        self.misses = {stage: 0 for stage in STAGES}
+        self.evictions = 0
+        self.lock = Lock()
+
+    def get(self, key, stage, variant=None):
+        """
+        Look up a stage output. Stages that depend on compile options (such as
+        the optimization passes) pass those options as the variant.
+        """
+        slot = (stage, variant) if variant else stage
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and slot in entry:
+                self.entries.move_to_end(key)
+                self.hits[stage] += 1
+                return entry[slot][0]
+            self.misses[stage] += 1
+        if self.store is None:
+            return MISSING
+        value = self.store.get(key, stage, variant)
+        if value is not MISSING:
+            self.remember(key, slot, value)
+        return value
+
+    def put(self, key, stage, value, variant=None):
+        slot = (stage, variant) if variant else stage
+        self.remember(key, slot, value)
+        if self.store is not None:
+            self.store.put(key, stage, value, variant)
+
+    def remember(self, key, slot, value):
+        """Keep a stage output in memory only."""
+        if self.max_entries == 0:
+            return
+        size = estimate_size(value)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = {}
+            elif slot in entry:
+                self.total_bytes -= entry[slot][1]
+            entry[slot] = (value, size)
+            self.total_bytes += size
+            self.entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while self.entries and (
+            (self.max_entries is not None and len(self.entries) > self.max_entries) or
+            (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= sum(size for _, size in entry.values())
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'hits': dict(self.hits),
+                'misses': dict(self.misses),
+            }
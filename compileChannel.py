@@ -0,0 +1,223 @@
+"""
+A long-lived compile channel: one connection carries many compiles, so an
+editor doesn't pay for a new HTTP request (and CORS preflight) per
+keystroke. The transport (a WebSocket in app.py) only moves text; this
+module is the protocol.
+
+Client messages are JSON objects:
+
+    {"id": 7, "text": "x = 1", "optimize", "format", "stages", "encoding",
+     "key": "main"}                 compile; every option is optional
+    {"id": 8, "cancel": 7}          cancel compile 7
+
+Replies carry the id of the message they answer and arrive as soon as they
+are ready, so they may come out of order:
+
+    {"id": 7, "result": [...]}
+    {"id": 7, "error": "...", "retry_after": 0.5}   (retry_after when rate limited)
+    {"id": 7, "cancelled": true}
+
+A compile with a "key" supersedes any earlier compile with the same key
+that hasn't been answered yet (a newer edit of the same document): the
+older one is cancelled. Each connection has a token-bucket rate limit and
+a cap on compiles in flight. A cancelled compile that had already started
+counts toward the cap until it actually stops.
+"""
+import json
+import time
+from threading import Lock
+
+from compiler import error_details, parse_stages
+from compileService import CompileOptions, QueueFull
+from optimizer import parse_passes
+from responseEncoder import dumps
+
+OUTPUT_FORMATS = ("text", "binary")
+ENCODINGS = ("json", "compact")
+
+
+class RateLimiter:
+    """Token bucket: rate messages a second on average, bursts of up to burst."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """0 when a message may go ahead, otherwise the seconds until one can."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+def message_options(message):
+    """CompileOptions from a compile message; ValueError if any is invalid."""
+    optimizations = parse_passes(message.get('optimize'))
+    stages = parse_stages(message.get('stages'))
+    output_format = message.get('format', 'text')
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(OUTPUT_FORMATS)}")
+    encoding = message.get('encoding', 'json')
+    if encoding not in ENCODINGS:
+        raise ValueError(f"encoding must be one of: {', '.join(ENCODINGS)}")
+    return CompileOptions(optimizations, output_format, stages, encoding == "compact")
+
+
+class _Job:
+    __slots__ = ('id', 'key', 'future', 'cancelled')
+
+    def __init__(self, job_id, key):
+        self.id = job_id
+        self.key = key
+        self.future = None
+        self.cancelled = False
+
+
+class CompileChannel:
+    """
+    One client connection. receive() is called with each incoming message;
+    replies go out through send(text), which may be called from the executor's
+    threads (calls are serialized here). compile(text, options) returns a
+    CompileOutcome, as app.run_compile does.
+
+    rate, burst    compile messages a second, and the burst allowed above it
+    max_pending    compiles in flight (cancelled ones still running
+                   included) before new ones are refused
+    """
+
+    def __init__(self, send, compile, executor, rate=20.0, burst=40, max_pending=8):
+        self.send_text = send
+        self.compile = compile
+        self.executor = executor
+        self.limiter = RateLimiter(rate, burst)
+        self.max_pending = max_pending
+        self.lock = Lock()
+        self.send_lock = Lock()
+        self.jobs = {}   # id -> _Job not yet answered
+        self.keys = {}   # key -> id of its newest job
+        self.draining = set()   # cancelled _Jobs whose compile is still running
+        self.closed = False
+
+    def send(self, reply):
+        with self.send_lock:
+            if not self.closed:
+                self.send_text(reply)
+
+    def receive(self, text):
+        try:
+            message = json.loads(text)
+        except ValueError:
+            self.send(dumps({'id': None, 'error': 'Messages must be JSON objects'}))
+            return
+        if not isinstance(message, dict):
+            self.send(dumps({'id': None, 'error': 'Messages must be JSON objects'}))
+            return
+        job_id = message.get('id')
+        if not isinstance(job_id, (str, int)) or isinstance(job_id, bool):
+            self.send(dumps({'id': None, 'error': 'Every message needs a string or integer id'}))
+            return
+        if 'cancel' in message:
+            self.cancel(message['cancel'])
+            return
+        self.submit(job_id, message)
+
+    def submit(self, job_id, message):
+        text = message.get('text')
+        if not isinstance(text, str) or not text:
+            self.send(dumps({'id': job_id, 'error': 'No statement provided'}))
+            return
+        try:
+            options = message_options(message)
+        except ValueError as e:
+            self.send(dumps({'id': job_id, 'error': str(e)}))
+            return
+        key = message.get('key')
+        if key is not None and not isinstance(key, str):
+            self.send(dumps({'id': job_id, 'error': 'key must be a string'}))
+            return
+        wait = self.limiter.take()
+        if wait:
+            self.send(dumps({'id': job_id, 'error': 'Rate limit exceeded', 'retry_after': round(wait, 3)}))
+            return
+        with self.lock:
+            superseded = self.jobs.get(self.keys.get(key)) if key is not None else None
+            if job_id in self.jobs:
+                error = 'A compile with this id is still in flight'
+            else:
+                if superseded is not None:
+                    self.drop(superseded)
+                if len(self.jobs) + len(self.draining) >= self.max_pending:
+                    error = 'Too many compiles in flight'
+                else:
+                    error = None
+                    job = self.jobs[job_id] = _Job(job_id, key)
+                    if key is not None:
+                        self.keys[key] = job_id
+        if superseded is not None and superseded.cancelled:
+            self.send(dumps({'id': superseded.id, 'cancelled': True}))
+        if error is not None:
+            self.send(dumps({'id': job_id, 'error': error}))
+            return
+        job.future = self.executor.submit(self.run, job, text, options)
+
+    def run(self, job, text, options):
+        reply = None
+        if not job.cancelled:
+            try:
+                outcome = self.compile(text, options)
+                reply = f'{{"id":{dumps(job.id)},"result":{outcome.json()}}}'
+            except QueueFull as e:
+                reply = dumps({'id': job.id, 'error': str(e), 'retry_after': e.retry_after})
+            except Exception as e:
+                reply = dumps(dict(error_details(e), id=job.id))
+        if self.finish(job):
+            self.send(reply)
+
+    def finish(self, job):
+        """Forget a job that has stopped; False if it was cancelled (its reply is already sent)."""
+        with self.lock:
+            if job.cancelled:
+                self.draining.discard(job)
+                return False
+            del self.jobs[job.id]
+            if job.key is not None and self.keys.get(job.key) == job.id:
+                del self.keys[job.key]
+            return True
+
+    def drop(self, job):
+        """Cancel an unanswered job; call with self.lock held."""
+        del self.jobs[job.id]
+        job.cancelled = True
+        if job.key is not None and self.keys.get(job.key) == job.id:
+            del self.keys[job.key]
+        # Not yet started: it never runs. Running: it counts as in flight
+        # until finish() sees it stop, and its result is dropped.
+        if job.future is not None and not job.future.cancel():
+            self.draining.add(job)
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            self.drop(job)
+        self.send(dumps({'id': job_id, 'cancelled': True}))
+
+    def close(self):
+        with self.send_lock:
+            self.closed = True
+        with self.lock:
+            jobs = list(self.jobs.values())
+            self.jobs.clear()
+            self.keys.clear()
+            self.draining.clear()
+        for job in jobs:
+            job.cancelled = True
+            if job.future is not None:
+                job.future.cancel()
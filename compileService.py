@@ -0,0 +1,306 @@
+import math
+import multiprocessing
+import os
+import signal
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from threading import Event, Lock
+
+from compiler import Compiler, RESPONSE_STAGES
+from compactEncoding import pack_msgpack
+from artifactStore import ArtifactStore
+from compileCache import CompileCache, source_key
+from instrumentation import Instrumentation, OFF, profile_compile
+from responseEncoder import dumps
+
+WARM_UP_STATEMENT = "x = (a + 2) * b ** 3 / 4"
+
+
+class CompileTimeout(Exception):
+    """A job used up its CPU or wall-clock budget."""
+
+
+class QueueFull(Exception):
+    """Every worker is busy and the queue is at its depth limit."""
+
+    def __init__(self, retry_after):
+        super().__init__("Compile queue is full")
+        self.retry_after = retry_after
+
+
+class CompileOptions(namedtuple("CompileOptions", "optimizations output_format stages compact profile",
+                                defaults=((), "text", RESPONSE_STAGES, False, False))):
+    """Per-request compile settings. Hashable, so requests with equal options can share a compile."""
+
+
+class CompileOutcome:
+    """What a worker sends back: the response result plus what the parent needs for metrics and raw binary."""
+
+    def __init__(self, result, stages, machine_code_bytes=None, machine_code_size=None, result_json=None):
+        self.result = result
+        self.stages = stages
+        self.machine_code_bytes = machine_code_bytes
+        self.machine_code_size = machine_code_size
+        self.result_json = result_json
+
+    def msgpack(self):
+        return pack_msgpack(self.result)
+
+    def json(self):
+        """The result as JSON text, encoded once and shared by every request that coalesced onto it."""
+        if self.result_json is None:
+            self.result_json = dumps(self.result)
+        return self.result_json
+
+
+class _Flight:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    computation and every caller that arrives while it runs waits for and
+    shares its result (or exception). Nothing is kept once it finishes.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.flights = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def run(self, key, compute):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self.lock:
+            return {
+                'in_flight': len(self.flights),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+            }
+
+
+def flight_key(statement, options):
+    """Requests with equal keys produce identical responses."""
+    return source_key(statement), options
+
+
+def run_compiler(statement, options, cache=None, instrumentation=None, lexical_analyzer=None,
+                 collect_stages=False):
+    """
+    Compile one statement with the given options, in this process.
+    collect_stages keeps per-stage timings on the outcome without a profile.
+    """
+    compiler = Compiler(statement, lexical_analyzer, cache, options.optimizations, options.output_format,
+                        instrumentation, options.profile or collect_stages, options.stages, options.compact)
+    if options.profile:
+        result, breakdown = profile_compile(compiler)
+        result.append(["profile", breakdown])
+    else:
+        result = compiler.compile()
+    return CompileOutcome(result, compiler.profile, compiler.machine_code_bytes, compiler.machine_code_size)
+
+
+# Worker-side state, set up once per process by init_worker
+
+_worker_cache = None
+_worker_instrumentation = Instrumentation(OFF)
+
+
+def _cpu_budget_exceeded(signum, frame):
+    raise CompileTimeout("Compile exceeded its CPU time budget")
+
+
+def init_worker(cache_entries, cache_bytes, store_path=None, store_bytes=None):
+    """Runs once in each worker: build its cache and compile a statement so every module and table is loaded."""
+    global _worker_cache
+    # Each worker opens the shared artifact store itself
+    store = ArtifactStore(store_path, store_bytes) if store_path else None
+    if cache_entries > 0 or store is not None:
+        _worker_cache = CompileCache(cache_entries, cache_bytes, store)
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGPROF, _cpu_budget_exceeded)
+    Compiler(WARM_UP_STATEMENT, instrumentation=_worker_instrumentation).compile()
+
+
+def compile_job(statement, options, cpu_limit):
+    """Compile one statement inside a worker, interrupted after cpu_limit seconds of CPU time."""
+    timed = cpu_limit and hasattr(signal, "setitimer")
+    if timed:
+        # ITIMER_PROF counts CPU time used by this process, not time spent waiting
+        signal.setitimer(signal.ITIMER_PROF, cpu_limit)
+    try:
+        # Stage timings always come back so the parent can record them
+        outcome = run_compiler(statement, options, _worker_cache, _worker_instrumentation, collect_stages=True)
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+    if not options.compact:
+        # Sent back already encoded: deep ASTs exceed pickle's recursion limit
+        outcome.result_json = dumps(outcome.result)
+        outcome.result = None
+    return outcome
+
+
+def warm_up_job():
+    return os.getpid()
+
+
+class CompileService:
+    """
+    Runs compiles in a bounded pool of worker processes so a slow input holds
+    a worker, not the web server's GIL.
+
+    workers      worker processes, started and warmed up front
+    max_queue    jobs allowed to wait for a free worker; more are rejected
+    cpu_limit    CPU seconds a job may use before it is interrupted
+    wall_limit   seconds the caller waits for a result, queueing included
+    store_path   artifact store file shared by the workers, if any
+    """
+
+    def __init__(self, workers=None, max_queue=None, cpu_limit=5.0, wall_limit=None,
+                 cache_entries=4096, cache_bytes=None, instrumentation=None, store_path=None, store_bytes=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 2 if max_queue is None else max_queue
+        self.cpu_limit = cpu_limit
+        self.wall_limit = wall_limit or cpu_limit * 3
+        self.cache_entries = cache_entries
+        self.cache_bytes = cache_bytes
+        self.store_path = store_path
+        self.store_bytes = store_bytes
+        self.instrumentation = instrumentation
+        self.lock = Lock()
+        self.restart_lock = Lock()
+        self.pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.executor = None
+        self.flights = SingleFlight()
+        self.start()
+
+    def start(self):
+        methods = multiprocessing.get_all_start_methods()
+        # Forking a threaded web server is unsafe; forkserver forks from a clean process
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        if context.get_start_method() == "forkserver":
+            context.set_forkserver_preload([__name__])
+        self.executor = ProcessPoolExecutor(
+            self.workers, mp_context=context, initializer=init_worker,
+            initargs=(self.cache_entries, self.cache_bytes, self.store_path, self.store_bytes))
+        # Start every worker now rather than on the first requests
+        for future in [self.executor.submit(warm_up_job) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up, for the Retry-After header."""
+        return max(1, math.ceil(self.cpu_limit * (self.pending / self.workers - 1))) \
+            if self.pending > self.workers else 1
+
+    def compile(self, statement, options=CompileOptions()):
+        if options.profile:
+            # A profile describes this request's own run, so it is never shared
+            return self.submit(statement, options)
+        return self.flights.run(flight_key(statement, options), lambda: self.submit(statement, options))
+
+    def submit(self, statement, options):
+        with self.lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise QueueFull(self.retry_after())
+            self.pending += 1
+            executor = self.executor
+        try:
+            future = executor.submit(compile_job, statement, options, self.cpu_limit)
+        except BaseException as e:
+            self.job_done(None)
+            if isinstance(e, BrokenProcessPool):
+                self.restart(executor)
+                raise RuntimeError("Compile worker crashed")
+            raise
+        future.add_done_callback(self.job_done)
+        try:
+            outcome = future.result(timeout=self.wall_limit)
+        except FutureTimeout:
+            future.cancel()
+            self.count_timeout()
+            raise CompileTimeout("Compile exceeded its time budget")
+        except CompileTimeout:
+            self.count_timeout()
+            raise
+        except BrokenProcessPool:
+            self.restart(executor)
+            raise RuntimeError("Compile worker crashed")
+        self.record_stages(outcome.stages)
+        return outcome
+
+    def job_done(self, future):
+        with self.lock:
+            self.pending -= 1
+
+    def count_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def restart(self, broken):
+        with self.restart_lock:
+            if self.executor is not broken:
+                return  # another request already replaced it
+            with self.lock:
+                self.restarts += 1
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.start()
+
+    def record_stages(self, stages):
+        # Workers don't report metrics themselves; feed the parent's sinks
+        if self.instrumentation is None or not stages:
+            return
+        for stage in stages:
+            if not stage['cached']:
+                self.instrumentation.record(stage['stage'], stage['seconds'], stage['count'])
+
+    def stats(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'pending': self.pending,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'restarts': self.restarts,
+            }
@@ -0,0 +1,316 @@
+import secrets
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from astNodes import Node, Program, to_json
+from lexicalAnalizer import LexicalAnalyzer, LexicalError
+from syntaxAnalizer import SyntaxAnalyzer, ProgramAnalyzer
+from codeGenerator import IntermediateCodeGenerator
+from machineCodeGenerator import MachineCodeGenerator
+from optimizer import Optimizer
+
+
+class SessionUnit:
+    """
+    One statement of a session's source: its text runs from the statement's
+    first token up to the next statement's, so trailing separators and
+    whitespace belong to it and the units' texts concatenate to the source.
+    """
+
+    __slots__ = ('text', 'tokens', 'statement', 'terminated', 'depth', 'newline_after',
+                 'first_type', 'last_type', 'uid', 'ast', 'intermediate_code', 'machine_code', 'error')
+
+    def __init__(self, text, tokens, statement=None, error=None):
+        self.text = text
+        self.tokens = tokens          # every token in text, separators included
+        self.statement = statement    # (start, end) of the statement within tokens
+        self.error = error
+        self.uid = None
+        self.ast = None
+        self.intermediate_code = None
+        self.machine_code = None
+        # How the statement ends, to tell whether a following statement stays separate
+        self.terminated = True
+        self.depth = 0
+        self.newline_after = False
+        self.first_type = self.last_type = None
+
+    def key(self):
+        start, end = self.statement
+        return tuple(value for value, _ in self.tokens[start:end])
+
+    def to_json(self):
+        item = {'tokens': self.tokens}
+        if self.error is not None:
+            item['error'] = self.error
+        elif self.statement is not None:
+            item['AST'] = to_json(self.ast)
+            item['intermediate_code'] = self.intermediate_code
+            item['machine_code'] = self.machine_code
+        return item
+
+
+def separates(unit, following):
+    """Whether the statement boundary between two adjacent units holds (see ProgramAnalyzer.statements)."""
+    if unit.terminated:
+        return True
+    if unit.depth or not unit.newline_after:
+        return False
+    if following.statement is not None and following.tokens[following.statement[0]][0] == 'else':
+        return False
+    return unit.last_type != 'operator' and following.first_type != 'operator'
+
+
+class UnitList:
+    """
+    Units in source order, kept in blocks with their text lengths so finding
+    the unit at an offset and splicing in new units only walk the blocks,
+    not every unit.
+    """
+
+    BLOCK_SIZE = 256
+
+    def __init__(self, units):
+        self.blocks = [units[i:i + self.BLOCK_SIZE] for i in range(0, len(units), self.BLOCK_SIZE)] or [[]]
+        self.lengths = [sum(len(unit.text) for unit in block) for block in self.blocks]
+        self.count = len(units)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for block in self.blocks:
+            yield from block
+
+    def text_length(self):
+        return sum(self.lengths)
+
+    def locate(self, offset):
+        """(index, start offset) of the unit containing offset; the end of the text maps to the last unit."""
+        index = position = 0
+        for block, length in zip(self.blocks, self.lengths):
+            if offset < position + length:
+                for unit in block:
+                    end = position + len(unit.text)
+                    if offset < end:
+                        return index, position
+                    position = end
+                    index += 1
+            position += length
+            index += len(block)
+        return self.count - 1, position - len(self.blocks[-1][-1].text)
+
+    def slice(self, start, stop):
+        units = []
+        index = 0
+        for block in self.blocks:
+            if index + len(block) > start and index < stop:
+                units.extend(block[max(start - index, 0):stop - index])
+            index += len(block)
+        return units
+
+    def splice(self, start, stop, units):
+        """Replace units[start:stop] with units."""
+        first = last = None
+        index = 0
+        for number, block in enumerate(self.blocks):
+            if first is None and (start < index + len(block) or number == len(self.blocks) - 1):
+                first, first_index = number, index
+            if stop <= index + len(block) or number == len(self.blocks) - 1:
+                last = number
+                break
+            index += len(block)
+        merged = [unit for block in self.blocks[first:last + 1] for unit in block]
+        merged[start - first_index:stop - first_index] = units
+        size = self.BLOCK_SIZE
+        blocks = [merged[i:i + size] for i in range(0, len(merged), size)] or [[]]
+        self.blocks[first:last + 1] = blocks
+        self.lengths[first:last + 1] = [sum(len(unit.text) for unit in block) for block in blocks]
+        if len(self.blocks) > 1:
+            # Keep empty blocks from piling up after deletions
+            pairs = [(b, n) for b, n in zip(self.blocks, self.lengths) if b]
+            self.blocks = [b for b, _ in pairs] or [[]]
+            self.lengths = [n for _, n in pairs] or [0]
+        self.count += len(units) - (stop - start)
+
+
+class CompileSession:
+    """
+    Source held as per-statement units for incremental recompilation. An edit
+    re-lexes only the units it touches plus one neighbour on each side
+    (statement boundaries can move), widening only when the new text runs
+    into the next statement. Only statements whose tokens changed are
+    compiled again; each is compiled on its own, with temps numbered per
+    statement and labels prefixed with the unit's ID so they never clash.
+    """
+
+    def __init__(self, source, optimizations=(), lexical_analyzer=None):
+        self.optimizations = tuple(optimizations)
+        self.lexical_analyzer = lexical_analyzer or LexicalAnalyzer()
+        self.version = 1
+        self.next_uid = 0
+        self.lock = Lock()
+        self.last_used = time.monotonic()
+        units = self.split(source)
+        for unit in units:
+            self.compile_unit(unit)
+        self.units = UnitList(units)
+
+    def source(self):
+        return "".join(unit.text for unit in self.units)
+
+    def statements(self):
+        return [unit.to_json() for unit in self.units]
+
+    def apply_edit(self, start, end, text):
+        """Replace source[start:end] with text; returns the change as a splice of the statement list."""
+        length = self.units.text_length()
+        if not (isinstance(start, int) and isinstance(end, int) and 0 <= start <= end <= length):
+            raise ValueError(f"Edit range must satisfy 0 <= start <= end <= {length}")
+        if not isinstance(text, str):
+            raise ValueError("Edit text must be a string")
+        first, region_start = self.units.locate(start)
+        last, _ = self.units.locate(end - 1 if end > start else start)
+        # The statement before may absorb the edit, and the one after may merge into it
+        if first > 0:
+            first, region_start = self.units.locate(region_start - 1)
+        last = min(last + 1, len(self.units) - 1)
+        while True:
+            old_units = self.units.slice(first, last + 1)
+            old_text = "".join(unit.text for unit in old_units)
+            new_text = old_text[:start - region_start] + text + old_text[end - region_start:]
+            new_units = self.split(new_text)
+            if last + 1 >= len(self.units) or separates(new_units[-1], self.units.slice(last + 1, last + 2)[0]):
+                break
+            last += 1
+
+        reusable = {}
+        for unit in old_units:
+            if unit.statement is not None and unit.error is None:
+                reusable.setdefault(unit.key(), []).append(unit)
+        for unit in new_units:
+            previous = reusable.get(unit.key()) if unit.statement is not None else None
+            if previous:
+                old = previous.pop()
+                unit.uid, unit.ast = old.uid, old.ast
+                unit.intermediate_code, unit.machine_code = old.intermediate_code, old.machine_code
+            else:
+                self.compile_unit(unit)
+        self.units.splice(first, last + 1, new_units)
+        self.version += 1
+        return {'start': first, 'removed': len(old_units), 'statements': [unit.to_json() for unit in new_units]}
+
+    def split(self, text):
+        """Lex text and cut it into units at statement starts."""
+        try:
+            tokens, line_breaks, offsets = self.lexical_analyzer.analyze_spans(text)
+        except LexicalError as e:
+            return [SessionUnit(text, [], error=str(e))]
+        ranges = list(ProgramAnalyzer(tokens, line_breaks).statements())
+        if not ranges:
+            return [SessionUnit(text, tokens)]
+        units = []
+        for number, (start, end) in enumerate(ranges):
+            token_start = 0 if number == 0 else start
+            text_start = 0 if number == 0 else offsets[start]
+            if number + 1 < len(ranges):
+                token_end, text_end = ranges[number + 1][0], offsets[ranges[number + 1][0]]
+            else:
+                token_end, text_end = len(tokens), len(text)
+            unit = SessionUnit(text[text_start:text_end], tokens[token_start:token_end],
+                               (start - token_start, end - token_start))
+            statement = tokens[start:end]
+            unit.first_type, unit.last_type = statement[0][1], statement[-1][1]
+            unit.terminated = any(value == ';' for value, _ in tokens[end:token_end])
+            depth = 0
+            for value, token_type in statement:
+                if token_type == 'delimiter':
+                    if value in ProgramAnalyzer.OPEN_BRACKETS:
+                        depth += 1
+                    elif value in ProgramAnalyzer.CLOSE_BRACKETS and depth:
+                        depth -= 1
+            unit.depth = depth
+            last_end = offsets[end - 1] + len(statement[-1][0]) - text_start
+            unit.newline_after = '\n' in unit.text[last_end:]
+            units.append(unit)
+        return units
+
+    def compile_unit(self, unit):
+        unit.uid = self.next_uid
+        self.next_uid += 1
+        if unit.statement is None or unit.error is not None:
+            return
+        start, end = unit.statement
+        analyzer = SyntaxAnalyzer(unit.tokens[start:end])
+        unit.ast = analyzer.parseTreeGenerator()
+        if not isinstance(unit.ast, Node):
+            unit.error = unit.ast
+            return
+        prefix = f"S{unit.uid}_"
+        try:
+            program = IntermediateCodeGenerator(unit.ast).generate_intermediate_code().prefix_labels(prefix)
+            if self.optimizations:
+                program = Optimizer(program, self.optimizations).optimize()
+            unit.intermediate_code = program.render()
+            unit.machine_code = MachineCodeGenerator(program, label_prefix=prefix + "POW").generate_code()
+        except ValueError as e:
+            unit.error = str(e)
+
+    def result(self):
+        """The whole program in Compiler.compile()'s format, or the first statement error in place of the AST."""
+        units = list(self.units)
+        tokens = [token for unit in units for token in unit.tokens]
+        for number, unit in enumerate(units, 1):
+            if unit.error is not None:
+                message = unit.error if len(units) == 1 else f"{unit.error} (statement {number})"
+                return [["tokens", tokens], ["AST", message]]
+        statements = [unit for unit in units if unit.statement is not None]
+        if not statements:
+            return [["tokens", tokens], ["AST", "❌ Invalid syntax."]]
+        ast = statements[0].ast if len(statements) == 1 else Program(unit.ast for unit in statements)
+        return [
+            ["tokens", tokens],
+            ["AST", to_json(ast)],
+            ["intermediate_code", [line for unit in statements for line in unit.intermediate_code]],
+            ["machine_code", "\n".join(unit.machine_code for unit in statements if unit.machine_code)],
+        ]
+
+
+class SessionStore:
+    """Live sessions by ID, least recently used first out, expiring after ttl idle seconds."""
+
+    def __init__(self, max_sessions=1000, ttl=3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.lock = Lock()
+
+    def create(self, source, optimizations=()):
+        session = CompileSession(source, optimizations)
+        session_id = secrets.token_urlsafe(12)
+        with self.lock:
+            self.sessions[session_id] = session
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session_id, session
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session.last_used > self.ttl:
+                del self.sessions[session_id]
+                return None
+            session.last_used = now
+            self.sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self.sessions)
@@ -1,39 +1,194 @@
-from lexicalAnalizer import LexicalAnalyzer
-from syntaxAnalizer import SyntaxAnalyzer
+import base64
+import time
+
+from astNodes import to_json
+from compactEncoding import compact_result
+from lexicalAnalizer import LexicalAnalyzer, LexicalError
+from syntaxAnalizer import ParseError, ProgramAnalyzer
 from codeGenerator import IntermediateCodeGenerator
 from machineCodeGenerator import MachineCodeGenerator
+from optimizer import Optimizer
+from compileCache import MISSING, source_key
+from instrumentation import instrumentation as default_instrumentation, count_ast_nodes
+
+
+def count_machine_code(value):
+    if isinstance(value, tuple):  # binary output: (code, size report, symbols)
+        return value[1]['instructions']
+    return value.count("\n") + 1 if value else 0
+
+
+# Cache stage -> (metric stage name, item counter for its output)
+STAGE_METRICS = {
+    "tokens": ("lex", lambda value: len(value[0])),
+    "AST": ("parse", count_ast_nodes),
+    "intermediate_code": ("ir", len),
+    "optimized_code": ("optimize", lambda value: len(value[0])),
+    "machine_code": ("machine_code", count_machine_code),
+}
+
+# Artifacts a response can include, in pipeline order
+RESPONSE_STAGES = ("tokens", "AST", "intermediate_code", "machine_code")
+
+
+def parse_stages(value):
+    """
+    Turn a request's stages option (a list or comma-separated string) into
+    the requested artifacts in pipeline order; empty means all of them.
+    """
+    if value in (None, "", "all"):
+        return RESPONSE_STAGES
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(",") if name.strip()]
+    if not isinstance(value, list) or not value:
+        raise ValueError("stages must be a list of stage names")
+    unknown = [name for name in value if name not in RESPONSE_STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage: {', '.join(map(str, unknown))}")
+    return tuple(name for name in RESPONSE_STAGES if name in value)
+
+
+def error_details(error):
+    """A compile error as a JSON response body, with where it happened when that is known."""
+    body = {'error': str(error) or type(error).__name__}
+    if isinstance(error, ParseError):
+        body['token'] = error.index
+        if error.statement is not None:
+            body['statement'] = error.statement
+    elif isinstance(error, LexicalError):
+        body['line'] = error.line
+        body['column'] = error.column
+    return body
+
 
 class Compiler:
-    def __init__(self, statement):
+    def __init__(self, statement, lexical_analyzer=None, cache=None, optimizations=(), output_format="text",
+                 instrumentation=None, profile=False, stages=RESPONSE_STAGES, compact=False):
         self.statement = statement
+        # Artifacts to return; nothing past the last of them is computed
+        self.stages = tuple(stages)
         self.tokens = []
-        self.ast = {}
-        self.lexical_analyzer = LexicalAnalyzer()
+        # Indexes of tokens that start a new line; newlines separate statements
+        self.line_breaks = []
+        self.ast = None
+        # The lexer holds no per-statement state, so batch callers can share one
+        self.lexical_analyzer = lexical_analyzer or LexicalAnalyzer()
+        self.cache = cache
+        self.cache_key = source_key(statement) if cache is not None else None
+        # Optimization passes to run between IR and machine code generation
+        self.optimizations = tuple(optimizations)
+        self.optimization_report = []
+        # "text" for opcode-prefixed lines, "binary" for assembled bytes
+        self.output_format = output_format
+        # Flat tokens and a postfix AST in the result (see compactEncoding.py)
+        self.compact = compact
+        self.machine_code_bytes = None
+        self.machine_code_size = None
+        self.machine_code_symbols = None
+        self.instrumentation = instrumentation or default_instrumentation
+        # Per-stage breakdown of this compile, filled in when profiling
+        self.profile = [] if profile else None
         self.syntax_analyzer = None
         self.intermediate_code_generator = None
         self.semantic_analyzer = None
         self.machine_code_generator = None
+        self.intermediate_program = None
         self.intermediate_code = []
         self.machine_code = []
 
+    def run_stage(self, stage, build, variant=None):
+        """Return the cached output of a stage, or build it (timed) and cache it."""
+        value = MISSING
+        if self.cache is not None:
+            value = self.cache.get(self.cache_key, stage, variant)
+        cached = value is not MISSING
+        measuring = self.instrumentation.enabled or self.profile is not None
+        if not cached:
+            start = time.perf_counter() if measuring else 0
+            value = build()
+            seconds = time.perf_counter() - start
+            if self.cache is not None:
+                self.cache.put(self.cache_key, stage, value, variant)
+        # A cache hit only needs counting for a profile (count_ast_nodes walks the whole tree)
+        if measuring and (not cached or self.profile is not None):
+            name, counter = STAGE_METRICS[stage]
+            count = counter(value)
+            if not cached:
+                self.instrumentation.record(name, seconds, count)
+            if self.profile is not None:
+                self.profile.append({'stage': name, 'seconds': 0.0 if cached else seconds,
+                                     'count': count, 'cached': cached})
+        return value
+
     def compile(self):
+        last = self.stages[-1]
         # Step 1: lexical analysis
-        self.tokens = self.lexical_analyzer.analyzer(self.statement)
+        self.tokens, self.line_breaks = self.run_stage(
+            "tokens", lambda: self.lexical_analyzer.analyze_program(self.statement))
+        if last == "tokens":
+            return self.result()
         
         # Step 2: syntax analysis
-        self.syntax_analyzer = SyntaxAnalyzer(self.tokens)
-        self.ast = self.syntax_analyzer.parseTreeGenerator()
-        print(self.ast)
+        self.ast = self.run_stage("AST", self.build_ast)
+        if last == "AST":
+            return self.result()
         
         # Step 3: semantic analysis
         
         # Step 4: intermediate code generation
-        self.intermediate_code_generator = IntermediateCodeGenerator(self.ast)
-        self.intermediate_code = self.intermediate_code_generator.generate_intermediate_code()
-        
-        # # Step 5: code generation
-        self.machine_code_generator = MachineCodeGenerator(self.intermediate_code)
-        self.machine_code = self.machine_code_generator.generate_code()
+        self.intermediate_program = self.run_stage("intermediate_code", self.build_intermediate_code)
         
+        # Step 5: optional IR optimization
+        variant = ",".join(self.optimizations)
+        if self.optimizations:
+            self.intermediate_program, self.optimization_report = self.run_stage(
+                "optimized_code", self.build_optimized_code, variant)
+        # IR stays structured inside the pipeline; text is only for the response
+        if "intermediate_code" in self.stages:
+            self.intermediate_code = self.intermediate_program.render()
+        if last == "intermediate_code":
+            return self.result()
         
-        return [["tokens",self.tokens], ["AST",self.ast], ["intermediate_code",self.intermediate_code], ["machine_code",self.machine_code]]
+        # # Step 6: code generation
+        if self.output_format == "binary":
+            self.machine_code_bytes, self.machine_code_size, self.machine_code_symbols = self.run_stage(
+                "machine_code", self.build_binary_code, variant + "|binary")
+            self.machine_code = base64.b64encode(self.machine_code_bytes).decode('ascii')
+        else:
+            self.machine_code = self.run_stage("machine_code", self.build_machine_code, variant)
+        return self.result()
+
+    def result(self):
+        """The requested artifacts as [name, value] pairs, in pipeline order."""
+        # The AST stays as nodes inside the pipeline; it becomes dicts (or postfix) only here
+        ast = self.ast if self.compact or "AST" not in self.stages else to_json(self.ast)
+        artifacts = {"tokens": self.tokens, "AST": ast,
+                     "intermediate_code": self.intermediate_code, "machine_code": self.machine_code}
+        result = [[stage, artifacts[stage]] for stage in self.stages]
+        if self.output_format == "binary" and self.machine_code_size is not None:
+            result.append(["machine_code_size", self.machine_code_size])
+            result.append(["symbols", self.machine_code_symbols])
+        if self.optimizations and self.intermediate_program is not None:
+            result.append(["optimization", self.optimization_report])
+        return compact_result(result) if self.compact else result
+
+    def build_ast(self):
+        self.syntax_analyzer = ProgramAnalyzer(self.tokens, self.line_breaks)
+        return self.syntax_analyzer.parse()
+
+    def build_intermediate_code(self):
+        self.intermediate_code_generator = IntermediateCodeGenerator(self.ast)
+        return self.intermediate_code_generator.generate_intermediate_code()
+
+    def build_optimized_code(self):
+        optimizer = Optimizer(self.intermediate_program, self.optimizations)
+        return optimizer.optimize(), optimizer.report
+
+    def build_machine_code(self):
+        self.machine_code_generator = MachineCodeGenerator(self.intermediate_program)
+        return self.machine_code_generator.generate_code()
+
+    def build_binary_code(self):
+        self.machine_code_generator = MachineCodeGenerator(self.intermediate_program)
+        assembly = self.machine_code_generator.generate_binary()
+        return bytes(assembly.code), assembly.size_report(), assembly.symbols()
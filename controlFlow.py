@@ -0,0 +1,193 @@
+"""
+Basic-block control-flow graph over an IRProgram, used to tidy the jumps
+that if/while code generation leaves behind. simplify() builds the graph,
+then:
+
+- threads jumps: a jump to a block that only jumps on goes straight to the
+  final target, and a conditional jump to where it would fall through anyway
+  is dropped
+- removes blocks no path from the entry reaches
+- lays the blocks out so each falls through to its successor where it can,
+  inverting a conditional jump when that lets its target fall through
+- emits only the labels some jump still uses
+"""
+from intermediateCode import Instruction, IRProgram, label_name
+
+JUMP_OPS = frozenset(["JMP", "JE", "JNE", "JL", "JLE", "JG", "JGE"])
+NEGATED = {"JE": "JNE", "JNE": "JE", "JL": "JGE", "JGE": "JL", "JLE": "JG", "JG": "JLE"}
+
+# Control flow the graph doesn't model; programs using these are left as they are
+OPAQUE_OPS = frozenset(["PROC", "ENDP", "CALL", "RET"])
+
+
+class BasicBlock:
+    """
+    Straight-line instructions with one way in. After the body, control goes
+    to target when the condition jump is taken, and to next otherwise (None
+    is the end of the program).
+    """
+
+    __slots__ = ('number', 'labels', 'body', 'condition', 'target', 'next', 'jump')
+
+    def __init__(self, number):
+        self.number = number  # position in the original program
+        self.labels = []      # label symbols naming the block
+        self.body = []
+        self.condition = None  # Jcc opcode, or None
+        self.target = None
+        self.next = None
+        self.jump = None      # (opcode, label symbol) ending the block, while building
+
+    def __repr__(self):
+        return f"BasicBlock({self.number})"
+
+
+class ControlFlowGraph:
+    def __init__(self, program):
+        self.program = program
+        self.blocks = None
+
+    def build(self):
+        """Split into blocks and link them; False if the program has control flow the graph can't model."""
+        blocks = [BasicBlock(0)]
+        label_blocks = {}
+        for instruction in self.program.instructions:
+            opcode = instruction.opcode
+            current = blocks[-1]
+            if opcode == IRProgram.LABEL:
+                if current.body or current.jump:
+                    current = BasicBlock(len(blocks))
+                    blocks.append(current)
+                current.labels.append(instruction.operands[0])
+                label_blocks[instruction.operands[0]] = current
+            elif opcode in JUMP_OPS and len(instruction.operands) == 1:
+                if current.jump:
+                    current = BasicBlock(len(blocks))
+                    blocks.append(current)
+                current.jump = (opcode, instruction.operands[0])
+            elif opcode in OPAQUE_OPS:
+                return False
+            else:
+                if current.jump:
+                    current = BasicBlock(len(blocks))
+                    blocks.append(current)
+                current.body.append(instruction)
+
+        for number, block in enumerate(blocks):
+            following = blocks[number + 1] if number + 1 < len(blocks) else None
+            if block.jump is None:
+                block.next = following
+                continue
+            opcode, label = block.jump
+            target = label_blocks.get(label)
+            if target is None:
+                return False
+            if opcode == "JMP":
+                block.next = target
+            else:
+                block.condition, block.target, block.next = opcode, target, following
+            block.jump = None
+        self.blocks = blocks
+        return True
+
+    def simplify(self):
+        """The program with jumps threaded, dead blocks dropped and blocks laid out for fall-through."""
+        if not self.build():
+            return self.program
+        self.thread_jumps()
+        self.remove_unreachable()
+        return self.emit(self.layout())
+
+    def thread_jumps(self):
+        for block in self.blocks:
+            if block.next is not None:
+                block.next = self.final_target(block.next)
+            if block.condition is not None:
+                block.target = self.final_target(block.target)
+                if block.target is block.next:
+                    block.condition = block.target = None
+
+    def final_target(self, block):
+        """Where control ends up from block, skipping blocks that do nothing but jump on."""
+        seen = set()
+        while not block.body and block.condition is None and block.next is not None and block not in seen:
+            seen.add(block)
+            block = block.next
+        return block
+
+    def remove_unreachable(self):
+        reached = {self.blocks[0]}
+        stack = [self.blocks[0]]
+        while stack:
+            block = stack.pop()
+            for successor in (block.next, block.target):
+                if successor is not None and successor not in reached:
+                    reached.add(successor)
+                    stack.append(successor)
+        self.blocks = [block for block in self.blocks if block in reached]
+
+    def layout(self):
+        """
+        Order blocks in chains that fall through. A chain continues into its
+        successor when that block has no other predecessor or already
+        followed it; otherwise blocks keep their original order.
+        """
+        predecessors = {}
+        for block in self.blocks:
+            for successor in (block.next, block.target):
+                if successor is not None:
+                    predecessors[successor] = predecessors.get(successor, 0) + 1
+        order = []
+        placed = set()
+        for block in self.blocks:
+            while block is not None and block not in placed:
+                placed.add(block)
+                order.append(block)
+                if block.condition is not None and block.next in placed and block.target not in placed:
+                    block.condition = NEGATED[block.condition]
+                    block.target, block.next = block.next, block.target
+                successor = block.next
+                if successor is None or (predecessors[successor] > 1 and successor.number != block.number + 1):
+                    break
+                block = successor
+        return order
+
+    def emit(self, order):
+        program = IRProgram()
+        program.symbols = self.program.symbols.copy()
+        symbols = program.symbols
+        following = {block: order[index + 1] for index, block in enumerate(order[:-1])}
+        targets = set()
+        needs_exit = False
+        for block in order:
+            if block.condition is not None:
+                targets.add(block.target)
+            if following.get(block) is not block.next:
+                if block.next is None:
+                    needs_exit = True
+                else:
+                    targets.add(block.next)
+
+        def label(block):
+            if not block.labels:
+                block.labels.append(fresh_label(label_name(f"BLOCK{block.number}")))
+            return block.labels[0]
+
+        def fresh_label(name):
+            while name in symbols.ids:
+                name += "_"
+            return symbols.intern(name)
+
+        exit_label = fresh_label(label_name("END")) if needs_exit else None
+        out = program.instructions
+        for block in order:
+            if block in targets:
+                out.append(Instruction(IRProgram.LABEL, (label(block),)))
+            out.extend(block.body)
+            if block.condition is not None:
+                out.append(Instruction(block.condition, (label(block.target),)))
+            if following.get(block) is not block.next:
+                out.append(Instruction("JMP", (exit_label if block.next is None else label(block.next),)))
+        if needs_exit:
+            out.append(Instruction(IRProgram.LABEL, (exit_label,)))
+        return program
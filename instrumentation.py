@@ -0,0 +1,152 @@
+import bisect
+import logging
+import os
+import time
+import tracemalloc
+from threading import Lock
+
+from astNodes import Node, tree_size
+
+logger = logging.getLogger("compiler")
+
+# Levels: OFF records nothing, BASIC feeds the metric sinks, DEBUG also logs each stage
+OFF, BASIC, DEBUG = 0, 1, 2
+LEVELS = {"off": OFF, "basic": BASIC, "debug": DEBUG}
+
+DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 100000, 1000000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the shape Prometheus expects."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class HistogramSink:
+    """Default sink: per-stage histograms of wall time and item counts."""
+
+    def __init__(self):
+        self.durations = {}
+        self.sizes = {}
+        self.lock = Lock()
+
+    def record(self, stage, seconds, count):
+        with self.lock:
+            if stage not in self.durations:
+                self.durations[stage] = Histogram(DURATION_BUCKETS)
+                self.sizes[stage] = Histogram(SIZE_BUCKETS)
+            self.durations[stage].observe(seconds)
+            if count is not None:
+                self.sizes[stage].observe(count)
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            for name, help_text, histograms in (
+                ("compiler_stage_duration_seconds", "Wall time spent in each compiler stage.", self.durations),
+                ("compiler_stage_items", "Tokens, AST nodes or instructions produced by each stage.", self.sizes),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for stage, histogram in sorted(histograms.items()):
+                    lines.extend(histogram.render(name, f'stage="{stage}"'))
+        return lines
+
+
+class Instrumentation:
+    """
+    Level-gated stage timing. Sinks are objects with a
+    record(stage, seconds, count) method; more can be added at runtime.
+    """
+
+    def __init__(self, level=BASIC, sinks=None):
+        self.level = level
+        self.histograms = HistogramSink()
+        self.sinks = [self.histograms] if sinks is None else list(sinks)
+
+    @property
+    def enabled(self):
+        return self.level > OFF
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def record(self, stage, seconds, count):
+        if self.level == OFF:
+            return
+        for sink in self.sinks:
+            sink.record(stage, seconds, count)
+        if self.level >= DEBUG:
+            logger.debug("stage %s took %.6fs (%s items)", stage, seconds, count)
+
+    def render_prometheus(self):
+        return self.histograms.render_prometheus()
+
+
+def count_ast_nodes(ast):
+    """Number of nodes in an AST (nodes or dicts), counting leaf operands."""
+    if isinstance(ast, Node):
+        return tree_size(ast)
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        count += 1
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if isinstance(value, (dict, list)) or key in ('left', 'right'):
+                    stack.append(value)
+    return count
+
+
+def profile_compile(compiler):
+    """
+    Run compiler.compile() (built with profile=True) under tracemalloc and
+    return its result with a per-stage breakdown. tracemalloc is process-wide,
+    so the peak is only exact when no other compile runs at the same time.
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        start = time.perf_counter()
+        result = compiler.compile()
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return result, {
+        'stages': compiler.profile,
+        'total_seconds': total,
+        'tracemalloc_peak_bytes': peak,
+    }
+
+
+# Process-wide instance; COMPILER_INSTRUMENTATION=off|basic|debug sets its level
+instrumentation = Instrumentation(LEVELS.get(os.environ.get("COMPILER_INSTRUMENTATION", "basic").lower(), BASIC))
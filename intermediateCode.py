@@ -0,0 +1,128 @@
+# Names the compiler makes up start with a character no identifier can, so
+# they never collide with the source's variables: temps are %t0, %t1, ...,
+# labels start with '.', and registers (named by the register allocator)
+# are %EAX, %EBX, ...
+TEMP_PREFIX = "%t"
+LABEL_PREFIX = "."
+
+
+def temp_name(number):
+    return f"{TEMP_PREFIX}{number}"
+
+
+def is_temp(name):
+    return name.startswith(TEMP_PREFIX)
+
+
+def label_name(name):
+    return LABEL_PREFIX + name
+
+
+class SymbolTable:
+    """Interns operand names (variables, temps, constants, labels) as small integer IDs."""
+
+    __slots__ = ('ids', 'names')
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol_id
+
+    def copy(self):
+        table = SymbolTable()
+        table.ids = dict(self.ids)
+        table.names = list(self.names)
+        return table
+
+    def name(self, symbol_id):
+        return self.names[symbol_id]
+
+    def __len__(self):
+        return len(self.names)
+
+
+class Instruction:
+    """One IR instruction: a mnemonic and a tuple of operand symbol IDs."""
+
+    __slots__ = ('opcode', 'operands')
+
+    def __init__(self, opcode, operands):
+        self.opcode = opcode
+        self.operands = operands
+
+    def __repr__(self):
+        return f"Instruction({self.opcode!r}, {self.operands!r})"
+
+
+class IRProgram:
+    """
+    Instruction list shared by the intermediate and machine code generators.
+    Operands are held as symbol IDs; text is only produced by render().
+    """
+
+    # Pseudo-instructions with their own text form
+    LABEL = "LABEL"
+    PARAM = "PARAM"
+
+    def __init__(self):
+        self.instructions = []
+        self.symbols = SymbolTable()
+
+    def emit(self, opcode, *operands):
+        intern = self.symbols.intern
+        self.instructions.append(Instruction(opcode, tuple([intern(o) for o in operands])))
+
+    def label(self, name):
+        self.emit(self.LABEL, name)
+
+    def operand_names(self, instruction):
+        names = self.symbols.names
+        return [names[o] for o in instruction.operands]
+
+    def prefix_labels(self, prefix):
+        """
+        Copy with every label name prefixed (after its leading '.'), so
+        separately generated programs can be concatenated without label
+        clashes. Instructions are shared.
+        """
+        labels = {i.operands[0] for i in self.instructions if i.opcode == self.LABEL}
+        if not labels:
+            return self
+        program = IRProgram()
+        program.instructions = self.instructions
+        program.symbols = self.symbols.copy()
+        names, ids = program.symbols.names, program.symbols.ids
+        for symbol in labels:
+            del ids[names[symbol]]
+            names[symbol] = label_name(prefix + names[symbol][len(LABEL_PREFIX):])
+            ids[names[symbol]] = symbol
+        return program
+
+    def render_instruction(self, instruction):
+        operands = self.operand_names(instruction)
+        if instruction.opcode == self.LABEL:
+            return f"{operands[0]}:"
+        if instruction.opcode == self.PARAM:
+            return f"; param {operands[0]}"
+        if not operands:
+            return instruction.opcode
+        return f"{instruction.opcode} {', '.join(operands)}"
+
+    def render(self):
+        return [self.render_instruction(instruction) for instruction in self.instructions]
+
+    def estimated_size(self):
+        """Rough byte size, used by the compile cache."""
+        return 56 + 120 * len(self.instructions) + sum(49 + len(n) for n in self.symbols.names)
+
+    def __len__(self):
+        return len(self.instructions)
+
+    def __iter__(self):
+        return iter(self.instructions)
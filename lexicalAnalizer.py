@@ -1,10 +1,47 @@
 import re
+from collections import namedtuple
+
+Token = namedtuple('Token', ['value', 'type', 'line', 'column'])
+
+
+class LexicalError(ValueError):
+    def __init__(self, char, line, column):
+        super().__init__(f"Unrecognised character {char!r} at line {line}, column {column}")
+        self.char = char
+        self.line = line
+        self.column = column
+
+    def __reduce__(self):
+        # Rebuilt from its fields when it crosses a process boundary
+        return type(self), (self.char, self.line, self.column)
+
+
+KEYWORDS = frozenset(["if", "else", "while", "for", "int", "float", "char"])
+OPERATORS = frozenset(["+", "-", "*", "**", "/", "=", "<", ">", "<=", ">=", "==", "!="])
+DELIMITERS = frozenset([";", ",", "{", "}", "(", ")", "[", "]"])
+
+# One alternation whose named group tells us the token type; order matters.
+# Leading whitespace is skipped inside the match so it costs no extra iteration.
+TOKEN_PATTERN = re.compile(r'''\s*(?:
+    (?P<keyword>\b(?:if|else|while|for|int|float|char)\b)
+  | (?P<int>\d+\b)
+  | (?P<identifier>[a-zA-Z_][a-zA-Z0-9_]*\b)
+  | (?P<unknown>\w+)
+  | (?P<operator>\*\*|==|!=|<=|>=|[+\-*/=<>])
+  | (?P<delimiter>[;,{}()\[\]])
+  | (?P<mismatch>\S)
+)''', re.VERBOSE)
+
+
+# Longest token StreamLexer holds while waiting for the rest of it
+MAX_TOKEN_LENGTH = 64 * 1024
+
 
 class LexicalAnalyzer:
     def __init__(self):
-        self.keywords = ["if", "else", "while", "for", "int", "float", "char"]
-        self.operators = ["+", "-", "*","**", "/", "=", "<", ">", "<=", ">=", "==", "!="]
-        self.delimiters = [";", ",", "{", "}", "(", ")", "[", "]"]
+        self.keywords = KEYWORDS
+        self.operators = OPERATORS
+        self.delimiters = DELIMITERS
 
     def is_keyword(self, token):
         return token in self.keywords
@@ -18,31 +55,152 @@ class LexicalAnalyzer:
     def is_identifier(self, token):
         return re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', token) and not self.is_keyword(token)
 
+    def tokenize(self, statement):
+        """
+        Lazily yield Token(value, type, line, column) tuples, with 1-based
+        positions. Raises LexicalError on characters the language doesn't use.
+        """
+        line = 1
+        line_start = 0
+        position = 0
+        for match in TOKEN_PATTERN.finditer(statement):
+            kind = match.lastgroup
+            start = match.start(kind)
+            newlines = statement.count('\n', position, start)
+            if newlines:
+                line += newlines
+                line_start = statement.rfind('\n', position, start) + 1
+            position = match.end()
+            if kind == 'mismatch':
+                raise LexicalError(match.group(kind), line, start - line_start + 1)
+            yield Token(match.group(kind), kind, line, start - line_start + 1)
+
     def scanner(self, statement):
-        # Tokenize using regex to capture operators, identifiers, numbers, etc.
-        pattern = r'(\b\w+\b|==|!=|<=|>=|\*\*|[+\-*/=<>;{},()\[\]])'
-        tokens = re.findall(pattern, statement)
-        return tokens
+        return [token.value for token in self.tokenize(statement)]
 
     def analyzer(self, statement):
+        # Fast path for the [token, type] lists the rest of the pipeline uses;
+        # tokenize() is only needed when positions are wanted
         tokensWithTypes = []
-        tokens = self.scanner(statement)
-        print(tokens)
-
-
-        for token in tokens:
-            if self.is_keyword(token):
-                tokensWithTypes.append([token, "keyword"])
-            elif self.is_operator(token):
-                tokensWithTypes.append([token, "operator"])
-            elif self.is_delimiter(token):
-                tokensWithTypes.append([token, "delimiter"])
-            elif token.isdigit():
-                tokensWithTypes.append([token,"int"])
-            elif self.is_identifier(token):
-                tokensWithTypes.append([token,"identifier"])
-            else:
-                tokensWithTypes.append([token,"unknown"])
-        
-        # print(tokensWithTypes)
+        append = tokensWithTypes.append
+        for match in TOKEN_PATTERN.finditer(statement):
+            kind = match.lastgroup
+            if kind == 'mismatch':
+                # Re-scan to report the position of the offending character
+                for _ in self.tokenize(statement):
+                    pass
+            append([match.group(kind), kind])
         return tokensWithTypes
+
+    def analyze_program(self, source):
+        """
+        Like analyzer(), but also returns the indexes of tokens that start a
+        new line, which the parser uses to split statements.
+        """
+        tokensWithTypes = []
+        line_breaks = []
+        append = tokensWithTypes.append
+        # Scanning line by line finds the breaks without a per-token check
+        for line in source.split('\n'):
+            first = len(tokensWithTypes)
+            for match in TOKEN_PATTERN.finditer(line):
+                kind = match.lastgroup
+                if kind == 'mismatch':
+                    for _ in self.tokenize(source):
+                        pass
+                append([match.group(kind), kind])
+            if first and len(tokensWithTypes) > first:
+                line_breaks.append(first)
+        return tokensWithTypes, line_breaks
+
+    def analyze_spans(self, source):
+        """
+        Like analyze_program(), plus each token's start offset in source, for
+        callers that map tokens back onto the text.
+        """
+        tokensWithTypes = []
+        line_breaks = []
+        offsets = []
+        append = tokensWithTypes.append
+        line_start = 0
+        for line in source.split('\n'):
+            first = len(tokensWithTypes)
+            for match in TOKEN_PATTERN.finditer(line):
+                kind = match.lastgroup
+                if kind == 'mismatch':
+                    for _ in self.tokenize(source):
+                        pass
+                append([match.group(kind), kind])
+                offsets.append(line_start + match.start(kind))
+            if first and len(tokensWithTypes) > first:
+                line_breaks.append(first)
+            line_start += len(line) + 1
+        return tokensWithTypes, line_breaks, offsets
+
+
+class StreamLexer:
+    """
+    Incremental analyze_program() for source that arrives in pieces. feed()
+    lexes every token that later text can't extend and keeps only the last,
+    possibly unfinished one, so memory is bounded by the longest token
+    (at most max_token_length characters) rather than the source. Tokens
+    come with a flag telling whether they start a new line, as
+    analyze_program()'s line breaks would.
+    """
+
+    def __init__(self, max_token_length=MAX_TOKEN_LENGTH):
+        self.max_token_length = max_token_length
+        self.pending = ""
+        self.started = False      # a token has been produced
+        self.new_line = False     # a newline since the last token
+        self.line = 1
+        self.column = 0           # characters lexed on the current line
+
+    def feed(self, text):
+        """[(token, starts_line)] for the tokens text completes."""
+        tokens = self.lex(self.pending + text, final=False)
+        if len(self.pending) > self.max_token_length:
+            raise ValueError(f"Token is longer than {self.max_token_length} characters")
+        return tokens
+
+    def finish(self):
+        return self.lex(self.pending, final=True)
+
+    def lex(self, text, final):
+        """
+        Tokens of text, which follows what was lexed before. Unless final, a
+        token running to the end of text may go on in the next piece: it is
+        left in self.pending.
+        """
+        tokens = []
+        append = tokens.append
+        end = 0
+        cut = len(text)
+        for match in TOKEN_PATTERN.finditer(text):
+            kind = match.lastgroup
+            start = match.start(kind)
+            if not final and match.end() == len(text):
+                # 'ab' may become 'abc', '*' '**', and '!' '!='
+                cut = start
+                break
+            if kind == 'mismatch':
+                before = text.rfind('\n', 0, start)
+                line = self.line + text.count('\n', 0, start)
+                column = start - before if before >= 0 else self.column + start + 1
+                raise LexicalError(match.group(kind), line, column)
+            if '\n' in text[match.start():start]:
+                self.new_line = True
+            append(([match.group(kind), kind], self.new_line and self.started))
+            self.started = True
+            self.new_line = False
+            end = match.end()
+        self.pending = text[cut:]
+        if '\n' in text[end:cut]:
+            self.new_line = True
+        newlines = text.count('\n', 0, cut)
+        if newlines:
+            self.line += newlines
+            self.column = cut - text.rfind('\n', 0, cut) - 1
+        else:
+            self.column += cut
+        return tokens
@@ -0,0 +1,149 @@
+import re
+
+from intermediateCode import TEMP_PREFIX, Instruction, IRProgram, is_temp, label_name, temp_name
+from optimizer import wrap
+
+_CONSTANT = re.compile(r'^-?\d+$')
+
+
+def power_of_two(value):
+    """Return k when value == 2 ** k for k >= 1, otherwise None."""
+    if value > 1 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+
+class StrengthReducer:
+    """
+    Lowers IR into cheaper machine-level instruction sequences:
+
+    - POWER by a constant becomes a square-and-multiply IMUL chain; POWER by
+      a variable becomes a binary exponentiation loop (exponents <= 0 give 1)
+    - IMUL and IDIV by powers of two become shifts; IDIV rounds toward zero
+      like the instruction it replaces
+
+    Constants are taken modulo 2**32, as the 32-bit instructions see them,
+    so every shift count is between 0 and 31.
+    - identities such as *1, *0, /1, +0, -0, **1 and **0 are folded away
+    """
+
+    def __init__(self, program, label_prefix="POW"):
+        self.source = program
+        self.label_prefix = label_prefix
+        self.program = IRProgram()
+        self.program.symbols = program.symbols.copy()
+        self.out = self.program.instructions
+        self.label_counter = 0
+        self.temp_counter = 1 + max(
+            (int(name[len(TEMP_PREFIX):]) for name in program.symbols.names if is_temp(name)), default=-1)
+
+    def lower(self):
+        for instruction in self.source.instructions:
+            handler = self.handlers.get(instruction.opcode)
+            if handler is None or len(instruction.operands) != 2 or handler(self, *instruction.operands) is False:
+                self.out.append(instruction)
+        return self.program
+
+    def constant(self, symbol):
+        """A constant operand's value as a signed 32-bit integer, or None."""
+        name = self.program.symbols.names[symbol]
+        return wrap(int(name)) if _CONSTANT.match(name) else None
+
+    def emit(self, opcode, *operands):
+        """Emit with operands given as symbol IDs or names."""
+        intern = self.program.symbols.intern
+        self.out.append(Instruction(
+            opcode, tuple(o if isinstance(o, int) else intern(o) for o in operands)))
+
+    def new_temp(self):
+        temp = temp_name(self.temp_counter)
+        self.temp_counter += 1
+        return temp
+
+    def new_label(self, name):
+        return label_name(f"{self.label_prefix}{self.label_counter}_{name}")
+
+    # Each handler returns False to keep the instruction unchanged
+
+    def lower_add_sub(self, dest, src):
+        if self.constant(src) != 0:
+            return False
+
+    def lower_multiply(self, dest, src):
+        value = self.constant(src)
+        if value is None:
+            return False
+        # The low 32 bits of a product don't depend on the multiplier's sign
+        value &= 0xFFFFFFFF
+        if value == 0:
+            self.emit("MOV", dest, "0")
+        elif value != 1:
+            shift = power_of_two(value)
+            if shift is None:
+                return False
+            self.emit("SHL", dest, str(shift))
+
+    def lower_divide(self, dest, src):
+        value = self.constant(src)
+        if value is None or value == 0:
+            return False
+        if value == 1:
+            return
+        shift = power_of_two(value)
+        if shift is None:
+            return False
+        # Arithmetic shift rounds toward -inf; add 2**shift - 1 to negative
+        # dividends first so the result truncates toward zero like IDIV
+        bias = self.new_temp()
+        self.emit("MOV", bias, dest)
+        self.emit("SAR", bias, "31")
+        self.emit("SHR", bias, str(32 - shift))
+        self.emit("ADD", dest, bias)
+        self.emit("SAR", dest, str(shift))
+
+    def lower_power(self, dest, src):
+        exponent = self.constant(src)
+        if exponent is None or exponent < 0:
+            self.power_loop(dest, src)
+        elif exponent == 0:
+            self.emit("MOV", dest, "1")
+        elif exponent > 1:
+            # Square-and-multiply over the exponent's bits after the leading one
+            bits = bin(exponent)[3:]
+            base = None
+            if "1" in bits:
+                base = self.new_temp()
+                self.emit("MOV", base, dest)
+            for bit in bits:
+                self.emit("IMUL", dest, dest)
+                if bit == "1":
+                    self.emit("IMUL", dest, base)
+
+    def power_loop(self, dest, src):
+        base, count, bit = self.new_temp(), self.new_temp(), self.new_temp()
+        loop, skip, end = self.new_label("LOOP"), self.new_label("SKIP"), self.new_label("END")
+        self.label_counter += 1
+        self.emit("MOV", base, dest)
+        self.emit("MOV", count, src)
+        self.emit("MOV", dest, "1")
+        self.emit(IRProgram.LABEL, loop)
+        self.emit("CMP", count, "0")
+        self.emit("JLE", end)
+        self.emit("MOV", bit, count)
+        self.emit("AND", bit, "1")
+        self.emit("CMP", bit, "0")
+        self.emit("JE", skip)
+        self.emit("IMUL", dest, base)
+        self.emit(IRProgram.LABEL, skip)
+        self.emit("IMUL", base, base)
+        self.emit("SAR", count, "1")
+        self.emit("JMP", loop)
+        self.emit(IRProgram.LABEL, end)
+
+    handlers = {
+        "ADD": lower_add_sub,
+        "SUB": lower_add_sub,
+        "IMUL": lower_multiply,
+        "IDIV": lower_divide,
+        "POWER": lower_power,
+    }
@@ -1,6 +1,21 @@
+from assembler import Assembler
+from lowering import StrengthReducer
+from registerAllocator import RegisterAllocator
+
+
 class MachineCodeGenerator:
-    def __init__(self, intermediate_code):
+    """
+    Translates an IRProgram into opcode-prefixed machine code text. The IR is
+    first strength-reduced, then temps are mapped onto registers (or stack
+    slots) by the register allocator. label_prefix names the labels strength
+    reduction creates.
+    """
+
+    def __init__(self, intermediate_code, allocate_registers=True, reduce_strength=True, label_prefix="POW"):
         self.intermediate_code = intermediate_code
+        self.allocate_registers = allocate_registers
+        self.reduce_strength = reduce_strength
+        self.label_prefix = label_prefix
         self.code = []
         self.masm_to_binary = {
             # Arithmetic
@@ -8,6 +23,10 @@ class MachineCodeGenerator:
             "SUB": "001010",
             "IMUL": "0000111110101111",
             "IDIV": "11110111",
+            # Shifts (emitted by strength reduction): C1 with its /4, /7, /5 extension
+            "SHL": "11000001100",
+            "SAR": "11000001111",
+            "SHR": "11000001101",
             # Assignment
             "MOV": "100010",
             # Comparison / Conditionals
@@ -41,22 +60,33 @@ class MachineCodeGenerator:
     def add_instruction(self, instruction):
         self.code.append(instruction)
 
+    def prepare(self):
+        """Lower and register-allocate the IR ahead of encoding."""
+        program = self.intermediate_code
+        if self.reduce_strength:
+            program = StrengthReducer(program, self.label_prefix).lower()
+        if self.allocate_registers:
+            program = RegisterAllocator(program).allocate()
+        return program
+
+    def generate_binary(self):
+        """Assemble into packed bytes; returns an assembler.Assembly."""
+        return Assembler(self.prepare()).assemble()
+
     def generate_code(self):
-        for instruction in self.intermediate_code:
-            instruction_parts = instruction.split()
-            if not instruction_parts:
-                continue
-            opcode = instruction_parts[0]
+        program = self.prepare()
+        names = program.symbols.names
+        for instruction in program.instructions:
+            opcode = instruction.opcode
 
             if opcode in self.masm_to_binary:
                 binary_opcode = self.masm_to_binary[opcode]
-                operands = instruction_parts[1:]
-                binary_operands = " ".join(operands) if operands else ""
+                binary_operands = ", ".join([names[o] for o in instruction.operands])
                 binary_instruction = f"{binary_opcode} {binary_operands}".strip()
                 self.add_instruction(binary_instruction)
             else:
                 # Fallback or unsupported opcode
-                self.add_instruction(f"; Unsupported instruction: {instruction}")
+                self.add_instruction(f"; Unsupported instruction: {program.render_instruction(instruction)}")
 
         return "\n".join(self.code)
 
@@ -0,0 +1,329 @@
+import re
+
+from intermediateCode import Instruction, IRProgram, is_temp
+
+# Passes in the order they run; callers pick any subset
+PASSES = ("constant_folding", "common_subexpressions", "copy_propagation", "dead_temps")
+
+# Two-address instructions: OP destination, source  (destination = destination OP source)
+BINARY_OPS = {"ADD", "SUB", "IMUL", "IDIV", "POWER", "AND", "OR",
+              # Comparisons inside expressions are emitted as JL temp, b etc.
+              "JE", "JNE", "JL", "JLE", "JG", "JGE"}
+COMMUTATIVE_OPS = {"ADD", "IMUL", "AND", "OR", "JE", "JNE"}
+JUMP_OPS = {"JMP", "JE", "JNE", "JL", "JLE", "JG", "JGE"}
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def wrap(value):
+    """value as a signed 32-bit integer."""
+    return ((value - INT32_MIN) & 0xFFFFFFFF) + INT32_MIN
+
+_CONSTANT = re.compile(r'^-?\d+$')
+
+
+def _idiv(a, b):
+    # IDIV truncates toward zero
+    if b == 0:
+        return None
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def _power(a, b):
+    if b < 0 or (b > 1 and abs(a) > 1 and b * (abs(a).bit_length() - 1) > 32):
+        return None
+    return a ** b
+
+
+FOLDERS = {
+    "ADD": lambda a, b: a + b,
+    "SUB": lambda a, b: a - b,
+    "IMUL": lambda a, b: a * b,
+    "IDIV": _idiv,
+    "POWER": _power,
+}
+
+
+def parse_passes(value):
+    """
+    Turn a request's optimize option into a tuple of pass names: true means
+    every pass, a list or comma-separated string selects passes by name.
+    """
+    if value in (None, False, "", "0", "false"):
+        return ()
+    if value in (True, "1", "true", "all"):
+        return PASSES
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(",") if name.strip()]
+    if not isinstance(value, list):
+        raise ValueError("optimize must be a boolean or a list of pass names")
+    unknown = [name for name in value if name not in PASSES]
+    if unknown:
+        raise ValueError(f"Unknown optimization pass: {', '.join(map(str, unknown))}")
+    return tuple(name for name in PASSES if name in value)
+
+
+class Optimizer:
+    """
+    Block-local optimizations over an IRProgram. Temps never outlive the
+    statement that created them, so they are treated as dead at block ends.
+    The input program is left untouched (it may be shared through the cache).
+    """
+
+    def __init__(self, program, passes=PASSES):
+        self.source = program
+        self.passes = passes
+        self.program = IRProgram()
+        self.program.symbols = program.symbols.copy()
+        self.report = []
+
+    def optimize(self):
+        instructions = self.source.instructions
+        for name in self.passes:
+            before = len(instructions)
+            instructions = getattr(self, name)(instructions)
+            self.report.append({'pass': name, 'before': before, 'after': len(instructions)})
+        self.program.instructions = instructions
+        return self.program
+
+    # Operand helpers
+
+    def constant(self, symbol):
+        name = self.program.symbols.names[symbol]
+        return int(name) if _CONSTANT.match(name) else None
+
+    def is_temp(self, symbol):
+        return is_temp(self.program.symbols.names[symbol])
+
+    def kind(self, instruction):
+        opcode, count = instruction.opcode, len(instruction.operands)
+        if opcode == "MOV" and count == 2:
+            return "move"
+        if opcode in BINARY_OPS and count == 2:
+            return "binary"
+        if opcode == "CMP":
+            return "compare"
+        if opcode == IRProgram.LABEL:
+            return "label"
+        if opcode in JUMP_OPS and count == 1:
+            return "jump"
+        # Calls, procedures etc. may touch any variable
+        return "barrier"
+
+    def blocks(self, instructions):
+        """Split into basic blocks: labels start one, jumps and barriers end one."""
+        block = []
+        for instruction in instructions:
+            kind = self.kind(instruction)
+            if kind == "label" and block:
+                yield block
+                block = []
+            block.append(instruction)
+            if kind in ("jump", "barrier"):
+                yield block
+                block = []
+        if block:
+            yield block
+
+    # Passes
+
+    def constant_folding(self, instructions):
+        """Evaluate arithmetic on known constants and substitute known values."""
+        intern = self.program.symbols.intern
+        out = []
+        for block in self.blocks(instructions):
+            known = {}
+            for instruction in block:
+                kind = self.kind(instruction)
+                if kind == "move":
+                    dest, src = instruction.operands
+                    value = known.get(src, self.constant(src))
+                    if value is None:
+                        known.pop(dest, None)
+                        out.append(instruction)
+                    else:
+                        known[dest] = value
+                        out.append(Instruction("MOV", (dest, intern(str(value)))))
+                elif kind == "binary":
+                    dest, src = instruction.operands
+                    left = known.get(dest)
+                    right = known.get(src, self.constant(src))
+                    folder = FOLDERS.get(instruction.opcode)
+                    result = None
+                    if folder and left is not None and right is not None:
+                        result = folder(left, right)
+                        if result is not None and not INT32_MIN <= result <= INT32_MAX:
+                            result = None
+                    if result is not None:
+                        known[dest] = result
+                        out.append(Instruction("MOV", (dest, intern(str(result)))))
+                        continue
+                    known.pop(dest, None)
+                    if right is not None:
+                        instruction = Instruction(instruction.opcode, (dest, intern(str(right))))
+                    out.append(instruction)
+                elif kind == "compare":
+                    first, second = instruction.operands
+                    if second in known:
+                        instruction = Instruction("CMP", (first, intern(str(known[second]))))
+                    out.append(instruction)
+                else:
+                    out.append(instruction)
+        return out
+
+    def common_subexpressions(self, instructions):
+        """
+        Local value numbering: when a temp is about to compute a value some
+        other symbol already holds, copy it instead of recomputing it.
+        """
+        out = []
+        for block in self.blocks(instructions):
+            value_of = {}   # symbol -> value number
+            holders = {}    # value number -> symbols currently holding it
+            expressions = {}  # (opcode, value, value) -> value number
+            counter = [0]
+
+            def value(symbol):
+                number = value_of.get(symbol)
+                if number is None:
+                    number = value_of[symbol] = ('initial', symbol)
+                    holders.setdefault(number, set()).add(symbol)
+                return number
+
+            def assign(symbol, number):
+                old = value_of.get(symbol)
+                if old is not None:
+                    holders[old].discard(symbol)
+                value_of[symbol] = number
+                holders.setdefault(number, set()).add(symbol)
+
+            for instruction in block:
+                kind = self.kind(instruction)
+                if kind == "move":
+                    dest, src = instruction.operands
+                    assign(dest, value(src))
+                elif kind == "binary":
+                    dest, src = instruction.operands
+                    left, right = value(dest), value(src)
+                    if instruction.opcode in COMMUTATIVE_OPS and repr(right) < repr(left):
+                        left, right = right, left
+                    key = (instruction.opcode, left, right)
+                    number = expressions.get(key)
+                    holder = None
+                    if number is not None:
+                        holder = next((s for s in holders.get(number, ()) if s != dest), None)
+                    if holder is not None:
+                        instruction = Instruction("MOV", (dest, holder))
+                    else:
+                        counter[0] += 1
+                        number = expressions[key] = ('expr', counter[0])
+                    assign(dest, number)
+                out.append(instruction)
+        return out
+
+    def copy_propagation(self, instructions):
+        """
+        Replace source operands with the symbol they were copied from, then
+        coalesce temp-to-temp copies whose source dies at the copy.
+        """
+        substituted = []
+        for block in self.blocks(instructions):
+            copies = {}      # dest -> src
+            copied_to = {}   # src -> dests
+
+            def kill(symbol):
+                src = copies.pop(symbol, None)
+                if src is not None:
+                    copied_to[src].discard(symbol)
+                for dest in copied_to.pop(symbol, ()):
+                    copies.pop(dest, None)
+
+            for instruction in block:
+                kind = self.kind(instruction)
+                if kind in ("move", "binary"):
+                    dest, src = instruction.operands
+                    src = copies.get(src, src)
+                    if src != instruction.operands[1]:
+                        instruction = Instruction(instruction.opcode, (dest, src))
+                    kill(dest)
+                    if kind == "move" and src != dest:
+                        copies[dest] = src
+                        copied_to.setdefault(src, set()).add(dest)
+                elif kind == "compare":
+                    operands = tuple(copies.get(o, o) for o in instruction.operands)
+                    if operands != instruction.operands:
+                        instruction = Instruction("CMP", operands)
+                substituted.append(instruction)
+        return self.coalesce_copies(substituted)
+
+    def coalesce_copies(self, instructions):
+        shared_temps = self.temps_in_several_blocks(instructions)
+        out = []
+        for block in self.blocks(instructions):
+            last_use = {}
+            for index, instruction in enumerate(block):
+                for symbol in instruction.operands:
+                    last_use[symbol] = index
+            renamed = {}
+
+            def resolve(symbol):
+                path = []
+                while symbol in renamed:
+                    path.append(symbol)
+                    symbol = renamed[symbol]
+                for original in path:
+                    renamed[original] = symbol
+                return symbol
+
+            for index, instruction in enumerate(block):
+                if renamed:
+                    operands = tuple(resolve(o) for o in instruction.operands)
+                    if operands != instruction.operands:
+                        instruction = Instruction(instruction.opcode, operands)
+                if self.kind(instruction) == "move":
+                    dest, src = instruction.operands
+                    if (dest != src and self.is_temp(dest) and self.is_temp(src) and
+                            dest not in shared_temps and src not in shared_temps and
+                            last_use[src] <= index):
+                        # src is dead after this copy: let it carry dest's value instead
+                        renamed[dest] = src
+                        last_use[src] = max(last_use[src], last_use[dest])
+                        continue
+                out.append(instruction)
+        return out
+
+    def dead_temps(self, instructions):
+        """Drop instructions whose destination temp is never read afterwards."""
+        shared_temps = self.temps_in_several_blocks(instructions)
+        out = []
+        for block in self.blocks(instructions):
+            live = set(shared_temps)
+            kept = []
+            for instruction in reversed(block):
+                kind = self.kind(instruction)
+                if kind in ("move", "binary"):
+                    dest, src = instruction.operands
+                    if self.is_temp(dest) and dest not in live:
+                        continue
+                    if kind == "move":
+                        live.discard(dest)
+                    else:
+                        live.add(dest)
+                    live.add(src)
+                else:
+                    live.update(instruction.operands)
+                kept.append(instruction)
+            kept.reverse()
+            out.extend(kept)
+        return out
+
+    def temps_in_several_blocks(self, instructions):
+        seen = {}
+        shared = set()
+        for number, block in enumerate(self.blocks(instructions)):
+            for instruction in block:
+                for symbol in instruction.operands:
+                    if seen.setdefault(symbol, number) != number and self.is_temp(symbol):
+                        shared.add(symbol)
+        return shared
@@ -0,0 +1,111 @@
+import random
+
+# Relative weights of the binary operators the parser accepts
+DEFAULT_OPERATOR_MIX = {
+    "+": 4, "-": 3, "*": 3, "/": 1, "**": 1,
+    "<": 1, ">": 1, "<=": 1, ">=": 1, "==": 1, "!=": 1,
+}
+
+VARIABLES = ("a", "b", "c", "d", "x", "y", "z", "total", "count")
+
+
+class ProgramGenerator:
+    """
+    Seeded generator of valid assignment statements for benchmarking. The
+    same seed and settings always give the same statements.
+
+    size      operands per statement
+    depth     maximum bracket nesting
+    operators operator -> relative weight
+    """
+
+    def __init__(self, seed=0, size=50, depth=4, operators=None, bracket_chance=0.2, constant_chance=0.4):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        if depth < 0:
+            raise ValueError("depth must not be negative")
+        self.random = random.Random(seed)
+        self.size = size
+        self.depth = depth
+        mix = operators or DEFAULT_OPERATOR_MIX
+        unknown = [op for op in mix if op not in DEFAULT_OPERATOR_MIX]
+        if unknown:
+            raise ValueError(f"Unknown operator: {', '.join(unknown)}")
+        self.operators = list(mix)
+        self.weights = [mix[op] for op in self.operators]
+        self.bracket_chance = bracket_chance
+        self.constant_chance = constant_chance
+
+    def operand(self):
+        if self.random.random() < self.constant_chance:
+            return str(self.random.randint(1, 99))
+        return self.random.choice(VARIABLES)
+
+    def statement(self):
+        target = self.random.choice(VARIABLES)
+        return f"{target} = {self.expression()}"
+
+    def expression(self):
+        rand = self.random.random
+        parts = []
+        open_brackets = 0
+        for index in range(self.size):
+            if index:
+                parts.append(self.random.choices(self.operators, self.weights)[0])
+            # Only open a bracket that still has room for a second operand
+            while open_brackets < self.depth and index < self.size - 1 and rand() < self.bracket_chance:
+                parts.append("(")
+                open_brackets += 1
+            parts.append(self.operand())
+            while open_brackets and rand() < self.bracket_chance:
+                parts.append(")")
+                open_brackets -= 1
+        parts.extend(")" * open_brackets)
+        return " ".join(parts)
+
+    def statements(self, count):
+        return [self.statement() for _ in range(count)]
+
+    def block_program(self, statements=4, depth=2, loop_bound=4):
+        """
+        Source of a program with if/else and while blocks nested up to depth,
+        about statements statements per block. Each loop counts its own
+        variable (k1, k2, ...) up to at most loop_bound, so every program
+        terminates.
+        """
+        loops = 0
+        lines = []
+        # Blocks still to fill: (level, list the block's statements go into, statements left)
+        stack = [(0, lines, statements)]
+        pending = []  # (list, index, template) of compound statements waiting for their blocks
+        while stack:
+            level, out, left = stack.pop()
+            for _ in range(left):
+                roll = self.random.random()
+                if level < depth and roll < 0.2:
+                    body, orelse = [], []
+                    condition = self.expression()
+                    if self.random.random() < 0.5:
+                        template = f"if ({condition}) {{{{ {{0}} }}}} else {{{{ {{1}} }}}}"
+                        stack.append((level + 1, orelse, self.random.randint(1, statements)))
+                    else:
+                        template = f"if ({condition}) {{{{ {{0}} }}}}"
+                    stack.append((level + 1, body, self.random.randint(1, statements)))
+                    pending.append((out, len(out), template, body, orelse))
+                    out.append(None)
+                elif level < depth and roll < 0.35:
+                    loops += 1
+                    counter = f"k{loops}"
+                    body = []
+                    stack.append((level + 1, body, self.random.randint(1, statements)))
+                    out.append(f"{counter} = 0")
+                    template = (f"while ({counter} < {self.random.randint(0, loop_bound)}) "
+                                f"{{{{ {{0}} ; {counter} = {counter} + 1 }}}}")
+                    pending.append((out, len(out), template, body, []))
+                    out.append(None)
+                else:
+                    out.append(self.statement())
+        # Fill in the innermost compound statements first
+        for out, index, template, body, orelse in reversed(pending):
+            out[index] = template.format(" ; ".join(body), " ; ".join(orelse))
+        return "\n".join(lines)
@@ -0,0 +1,163 @@
+import heapq
+
+from intermediateCode import Instruction, IRProgram, is_temp
+
+# Register names carry a '%' so no variable can be mistaken for one
+REGISTERS = ("%EAX", "%EBX", "%ECX", "%EDX", "%ESI", "%EDI")
+
+# Instructions that end a basic block
+JUMP_OPS = {"JMP", "JE", "JNE", "JL", "JLE", "JG", "JGE"}
+NO_FALLTHROUGH_OPS = {"JMP", "RET"}
+
+
+class RegisterAllocator:
+    """
+    Maps IR temps onto a small fixed register set with linear-scan allocation
+    over liveness-derived intervals. Temps that don't fit are spilled to
+    stack slots addressed from %EBP. User variables stay in memory.
+    """
+
+    def __init__(self, program, registers=REGISTERS):
+        self.source = program
+        self.registers = registers
+        self.assignment = {}  # temp symbol -> register or stack slot name
+        self.spill_slots = 0
+
+    def allocate(self):
+        instructions = self.source.instructions
+        is_temp = self.temp_symbols()
+        intervals = self.live_intervals(instructions, is_temp)
+        self.linear_scan(intervals)
+
+        program = IRProgram()
+        program.symbols = self.source.symbols.copy()
+        intern = program.symbols.intern
+        # Symbol ID -> symbol ID of its location (itself for non-temps)
+        location = list(range(len(program.symbols)))
+        for temp, name in self.assignment.items():
+            location[temp] = intern(name)
+        append = program.instructions.append
+        for instruction in instructions:
+            operands = tuple([location[o] for o in instruction.operands])
+            if instruction.opcode == "MOV" and len(operands) == 2 and operands[0] == operands[1]:
+                continue  # Both sides landed in the same register
+            append(instruction if operands == instruction.operands else Instruction(instruction.opcode, operands))
+        return program
+
+    def temp_symbols(self):
+        return [is_temp(name) for name in self.source.symbols.names]
+
+    def blocks(self, instructions):
+        """Return (start, end) index ranges of basic blocks and their successor lists."""
+        starts = {0} if instructions else set()
+        for index, instruction in enumerate(instructions):
+            if instruction.opcode == IRProgram.LABEL:
+                starts.add(index)
+            elif self.ends_block(instruction) and index + 1 < len(instructions):
+                starts.add(index + 1)
+        starts = sorted(starts)
+        ranges = list(zip(starts, starts[1:] + [len(instructions)]))
+        block_at = {start: number for number, (start, _) in enumerate(ranges)}
+        label_blocks = {instruction.operands[0]: block_at[index]
+                        for index, instruction in enumerate(instructions)
+                        if instruction.opcode == IRProgram.LABEL}
+
+        successors = []
+        for number, (start, end) in enumerate(ranges):
+            last = instructions[end - 1]
+            following = []
+            if last.opcode not in NO_FALLTHROUGH_OPS and number + 1 < len(ranges):
+                following.append(number + 1)
+            if self.ends_block(last) and last.operands:
+                target = label_blocks.get(last.operands[0])
+                if target is not None:
+                    following.append(target)
+            successors.append(following)
+        return ranges, successors
+
+    def ends_block(self, instruction):
+        return (instruction.opcode in JUMP_OPS and len(instruction.operands) == 1) or \
+            instruction.opcode in NO_FALLTHROUGH_OPS
+
+    def live_intervals(self, instructions, is_temp):
+        """Liveness dataflow over the CFG, flattened into one [start, end] interval per temp."""
+        ranges, successors = self.blocks(instructions)
+        uses, defs = [], []
+        for start, end in ranges:
+            used, defined = set(), set()
+            for instruction in instructions[start:end]:
+                for position, symbol in enumerate(instruction.operands):
+                    if not is_temp[symbol]:
+                        continue
+                    # MOV writes its destination without reading it
+                    if position == 0 and instruction.opcode == "MOV":
+                        defined.add(symbol)
+                    elif symbol not in defined:
+                        used.add(symbol)
+            uses.append(used)
+            defs.append(defined)
+
+        live_in = [set() for _ in ranges]
+        live_out = [set() for _ in ranges]
+        changed = True
+        while changed:
+            changed = False
+            for number in range(len(ranges) - 1, -1, -1):
+                out = set()
+                for successor in successors[number]:
+                    out |= live_in[successor]
+                new_in = uses[number] | (out - defs[number])
+                if out != live_out[number] or new_in != live_in[number]:
+                    live_out[number], live_in[number] = out, new_in
+                    changed = True
+
+        intervals = {}
+
+        def extend(symbol, index):
+            interval = intervals.get(symbol)
+            if interval is None:
+                intervals[symbol] = [index, index]
+            elif index < interval[0]:
+                interval[0] = index
+            elif index > interval[1]:
+                interval[1] = index
+
+        for index, instruction in enumerate(instructions):
+            for symbol in instruction.operands:
+                if is_temp[symbol]:
+                    extend(symbol, index)
+        for number, (start, end) in enumerate(ranges):
+            for symbol in live_in[number]:
+                extend(symbol, start)
+            for symbol in live_out[number]:
+                extend(symbol, end - 1)
+        return intervals
+
+    def linear_scan(self, intervals):
+        free = list(self.registers)
+        active = []  # heap of (end, temp)
+        for temp, (start, end) in sorted(intervals.items(), key=lambda item: item[1][0]):
+            # Expire intervals that end where this one starts: an instruction
+            # may read its last use and write a new temp in the same register
+            while active and active[0][0] <= start:
+                _, expired = heapq.heappop(active)
+                free.append(self.assignment[expired])
+            if free:
+                free.sort(key=self.registers.index)
+                self.assignment[temp] = free.pop(0)
+                heapq.heappush(active, (end, temp))
+                continue
+            # Spill whichever interval ends last
+            furthest_end, furthest = max(active)
+            if furthest_end > end:
+                active.remove((furthest_end, furthest))
+                heapq.heapify(active)
+                self.assignment[temp] = self.assignment[furthest]
+                self.assignment[furthest] = self.new_spill_slot()
+                heapq.heappush(active, (end, temp))
+            else:
+                self.assignment[temp] = self.new_spill_slot()
+
+    def new_spill_slot(self):
+        self.spill_slots += 1
+        return f"[%EBP-{4 * self.spill_slots}]"
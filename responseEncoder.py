@@ -0,0 +1,48 @@
+import json
+from json.encoder import encode_basestring_ascii
+
+
+class _Raw(str):
+    """Already-encoded JSON text waiting on the encoder stack."""
+
+
+def dumps(value, sort_keys=True):
+    """
+    Compact JSON encoding matching Flask's jsonify. The C encoder is tried
+    first; values nested deeper than the recursion limit (long operator
+    chains produce very deep ASTs) fall back to an explicit-stack encoder.
+    """
+    try:
+        return json.dumps(value, separators=(',', ':'), sort_keys=sort_keys)
+    except RecursionError:
+        return _dumps_iterative(value, sort_keys)
+
+
+def _dumps_iterative(value, sort_keys):
+    out = []
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, _Raw):
+            out.append(item)
+        elif isinstance(item, str):
+            out.append(encode_basestring_ascii(item))
+        elif isinstance(item, dict):
+            keys = sorted(item) if sort_keys else list(item)
+            stack.append(_Raw('}'))
+            for i in range(len(keys) - 1, -1, -1):
+                stack.append(item[keys[i]])
+                stack.append(_Raw(encode_basestring_ascii(str(keys[i])) + ':'))
+                if i:
+                    stack.append(_Raw(','))
+            out.append('{')
+        elif isinstance(item, (list, tuple)):
+            stack.append(_Raw(']'))
+            for i in range(len(item) - 1, -1, -1):
+                stack.append(item[i])
+                if i:
+                    stack.append(_Raw(','))
+            out.append('[')
+        else:
+            out.append(json.dumps(item))
+    return ''.join(out)
@@ -0,0 +1,111 @@
+"""
+Compiles source that arrives as a stream (a raw or chunked request body)
+one statement at a time, yielding each statement's machine code as soon as
+the statement is complete. Only the unfinished statement's tokens (at most
+max_statement_tokens) and its last token's text are held, so memory is
+bounded by the largest statement, not the size of the source.
+
+Statements are split by ProgramAnalyzer's rules. Every statement but the
+last one found in the tokens so far is final (later tokens can't change
+where it ends), so only the last one is carried over to the next chunk.
+Each statement is compiled on its own, with its labels prefixed as in
+incremental sessions.
+"""
+import codecs
+
+from astNodes import Node
+from codeGenerator import IntermediateCodeGenerator
+from lexicalAnalizer import LexicalError, StreamLexer
+from machineCodeGenerator import MachineCodeGenerator
+from optimizer import Optimizer
+from syntaxAnalizer import ProgramAnalyzer, SyntaxAnalyzer
+
+CHUNK_SIZE = 16 * 1024
+MAX_STATEMENT_TOKENS = 100_000
+
+
+def read_chunks(stream, size=CHUNK_SIZE):
+    """Text pieces of a binary stream, decoded as UTF-8 across chunk boundaries."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = stream.read(size)
+        if not data:
+            break
+        yield decoder.decode(data)
+    yield decoder.decode(b"", final=True)
+
+
+def compile_statement(tokens, number, optimizations=()):
+    """Machine code for one statement's [token, type] lists."""
+    ast = SyntaxAnalyzer(tokens).parseTreeGenerator()
+    if not isinstance(ast, Node):
+        raise ValueError(ast)
+    prefix = f"S{number}_"
+    program = IntermediateCodeGenerator(ast).generate_intermediate_code().prefix_labels(prefix)
+    if optimizations:
+        program = Optimizer(program, optimizations).optimize()
+    return MachineCodeGenerator(program, label_prefix=prefix + "POW").generate_code()
+
+
+def split_statements(chunks, max_statement_tokens=MAX_STATEMENT_TOKENS):
+    """Yield each statement's [token, type] lists as soon as it is complete."""
+    lexer = StreamLexer()
+    tokens = []
+    line_breaks = []
+
+    def check(length):
+        if length > max_statement_tokens:
+            raise ValueError(f"Statement is longer than {max_statement_tokens} tokens")
+
+    def complete(final):
+        nonlocal tokens, line_breaks
+        ranges = list(ProgramAnalyzer(tokens, line_breaks).statements())
+        if not final and ranges:
+            # The last statement may go on in the next chunk
+            ranges.pop()
+        for start, end in ranges:
+            check(end - start)
+            yield tokens[start:end]
+        keep = ranges[-1][1] if ranges else 0
+        if keep:
+            tokens = tokens[keep:]
+            line_breaks = [index - keep for index in line_breaks if index >= keep]
+        # The unfinished statement stops growing at the cap, not when it ends
+        check(len(tokens))
+
+    for chunk in chunks:
+        lexed = lexer.feed(chunk)
+        if not lexed:
+            continue
+        for token, starts_line in lexed:
+            if starts_line:
+                line_breaks.append(len(tokens))
+            tokens.append(token)
+        yield from complete(False)
+    for token, starts_line in lexer.finish():
+        if starts_line:
+            line_breaks.append(len(tokens))
+        tokens.append(token)
+    yield from complete(True)
+
+
+def compile_stream(chunks, optimizations=(), max_statement_tokens=MAX_STATEMENT_TOKENS):
+    """
+    Yield machine code text, one piece per statement. An error ends the
+    output with a '; error' comment line naming the statement.
+    """
+    number = 0
+    try:
+        for number, tokens in enumerate(split_statements(chunks, max_statement_tokens), 1):
+            try:
+                code = compile_statement(tokens, number, optimizations)
+            except ValueError as e:
+                yield f"; error: {e} (statement {number})\n"
+                return
+            if code:
+                yield code + "\n"
+    except (LexicalError, UnicodeDecodeError) as e:
+        yield f"; error: {e}\n"
+    except ValueError as e:
+        # The statement after the last one compiled was too long
+        yield f"; error: {e} (statement {number + 1})\n"
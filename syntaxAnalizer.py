@@ -1,302 +1,525 @@
 import re
+from types import MappingProxyType
+
+from astNodes import Assignment, Conditional, Loop, Node, NodeTable, Program
+
+# Operator precedence (higher number = higher precedence)
+PRECEDENCE = MappingProxyType({
+    '=': 1,
+    '<': 2, '>': 2, '<=': 2, '>=': 2, '==': 2, '!=': 2,
+    '+': 3, '-': 3,
+    '*': 4, '/': 4,
+    '**': 5  # Exponentiation has highest precedence
+})
+
+# Statement forms by token type, in priority order: when several match, the
+# first listed wins. OPEN_TAIL as the last element matches whatever tail the
+# rule's matcher method (SyntaxAnalyzer.OPEN_RULE_MATCHERS) accepts.
+# ProgramAnalyzer splits statements at ';' and leaves it out, so a form that
+# ends in ';' also has an unterminated version.
+OPEN_TAIL = '*expression'
+RULES = MappingProxyType({
+    'assignment': (('identifier', 'operator', OPEN_TAIL),),
+    'declaration': (
+        ('keyword', 'identifier', 'operator', 'identifier', 'delimiter'),
+        ('keyword', 'identifier', 'operator', 'string', 'delimiter'),
+        ('keyword', 'identifier', 'operator', 'identifier'),
+        ('keyword', 'identifier', 'operator', 'string'),
+    ),
+    'function_call': (
+        ('identifier', 'delimiter', 'identifier', 'delimiter'),
+        ('identifier', 'delimiter', 'string', 'delimiter'),
+    ),
+    'if': (
+        ('keyword', 'delimiter', 'identifier', 'delimiter'),
+        ('keyword', 'delimiter', 'string', 'delimiter'),
+    ),
+    'else': (('keyword',),),
+    'while': (
+        ('keyword', 'delimiter', 'identifier', 'delimiter'),
+        ('keyword', 'delimiter', 'string', 'delimiter'),
+    ),
+    'function_def': (
+        ('keyword', 'identifier', 'delimiter', 'identifier', 'delimiter', 'identifier', 'delimiter'),
+        ('keyword', 'identifier', 'delimiter', 'delimiter'),
+    ),
+})
+
+NUMBER = re.compile(r'^\d+(\.\d+)?$')
+
+# Token types convert_type passes through unchanged
+PLAIN_TYPES = frozenset(['keyword', 'operator', 'delimiter', 'unknown'])
+
+
+class _State:
+    __slots__ = ('next', 'accept', 'open')
+
+    def __init__(self):
+        self.next = {}      # token type -> _State
+        self.accept = None  # (priority, rule) of the first fixed pattern ending here
+        self.open = ()      # (priority, rule) of open-tailed patterns whose fixed prefix ends here
+
+
+class RuleAutomaton:
+    """
+    The rule patterns compiled into a trie over token types. match() walks
+    a type sequence once and returns every rule it could be, in priority
+    order, however many rules and patterns the table has.
+    """
+
+    def __init__(self, rules):
+        self.root = _State()
+        for priority, (name, patterns) in enumerate(rules.items()):
+            for pattern in patterns:
+                open_tail = pattern[-1] == OPEN_TAIL
+                state = self.root
+                for token_type in pattern[:-1] if open_tail else pattern:
+                    state = state.next.setdefault(token_type, _State())
+                if open_tail:
+                    state.open += ((priority, name),)
+                elif state.accept is None:
+                    state.accept = (priority, name)
+        # Freeze the transitions; the automaton is shared by every analyzer
+        stack = [self.root]
+        while stack:
+            state = stack.pop()
+            stack.extend(state.next.values())
+            state.next = MappingProxyType(state.next)
+
+    def match(self, types):
+        """[(rule, open_tailed)] for every rule whose pattern fits types, highest priority first."""
+        found = []
+        state = self.root
+        for token_type in types:
+            if state.open:
+                found.extend((priority, name, True) for priority, name in state.open)
+            state = state.next.get(token_type)
+            if state is None:
+                break
+        else:
+            found.extend((priority, name, True) for priority, name in state.open)
+            if state.accept is not None:
+                found.append(state.accept + (False,))
+        found.sort()
+        return [(name, open_tail) for _, name, open_tail in found]
+
+
+GRAMMAR = RuleAutomaton(RULES)
+
 
 class SyntaxAnalyzer:
-    def __init__(self, tokensWithTypes):
+    # Open-tailed rule -> method that matches the whole statement against it
+    OPEN_RULE_MATCHERS = MappingProxyType({'assignment': 'match_assignment'})
+
+    def __init__(self, tokensWithTypes, nodes=None):
         self.tokensWithTypes = tokensWithTypes
+        # Hash-consing table for expression nodes; statements of one program share it
+        self.nodes = nodes if nodes is not None else NodeTable()
         self.valid = False
         self.matched_rule = None
         self.current_index = 0
-        
-        # Define operator precedence (higher number = higher precedence)
-        self.precedence = {
-            '=': 1,
-            '<': 2, '>': 2, '<=': 2, '>=': 2, '==': 2, '!=': 2,
-            '+': 3, '-': 3,
-            '*': 4, '/': 4,
-            '**': 5  # Exponentiation has highest precedence
-        }
-
-        self.rules = {
-            'assignment': ['identifier', 'operator', '*expression'],
-            'declaration': [
-                ['keyword', 'identifier', 'operator', 'identifier', 'delimiter'],
-                ['keyword', 'identifier', 'operator', 'string', 'delimiter']
-            ],
-            'function_call': [
-                ['identifier', 'delimiter', 'identifier', 'delimiter'],
-                ['identifier', 'delimiter', 'string', 'delimiter']
-            ],
-            'if': [
-                ['keyword', 'delimiter', 'identifier', 'delimiter'],
-                ['keyword', 'delimiter', 'string', 'delimiter']
-            ],
-            'else': [['keyword']],
-            'while': [
-                ['keyword', 'delimiter', 'identifier', 'delimiter'],
-                ['keyword', 'delimiter', 'string', 'delimiter']
-            ],
-            'function_def': [
-                ['keyword', 'identifier', 'delimiter', 'identifier', 'delimiter', 'identifier', 'delimiter'],
-                ['keyword', 'identifier', 'delimiter', 'delimiter']
-            ]
-        }
+        # Grammar tables are module-level and shared, not rebuilt per analyzer
+        self.precedence = PRECEDENCE
+        self.rules = RULES
 
     def convert_type(self, token, original_type):
         if original_type == 'identifier':
             if token.startswith('"') and token.endswith('"') or token.startswith("'") and token.endswith("'"):
                 return 'string'
-            if re.match(r'^\d+(\.\d+)?$', token):
+            if token[:1].isdigit() and NUMBER.match(token):
                 return 'number'
         elif original_type == 'int':
             return 'number'
         return original_type
 
+    def token_types(self):
+        convert = self.convert_type
+        return [token_type if token_type in PLAIN_TYPES else convert(token, token_type)
+                for token, token_type in self.tokensWithTypes]
+
     def analyze(self):
-        # Reset index for parsing
+        # Reset parser state
         self.current_index = 0
+        self.expression_ast = None
+        self.error = None
+        self.error_index = None
         
         # Get types sequence with properly converted types
-        self.types_sequence = [self.convert_type(t[0], t[1]) for t in self.tokensWithTypes]
+        self.types_sequence = self.token_types()
         
-        # Try all rule patterns
-        for rule_name, patterns in self.rules.items():
-            if isinstance(patterns[0], list):  # multiple patterns
-                for pattern in patterns:
-                    if self.match_pattern(pattern):
-                        self.valid = True
-                        self.matched_rule = rule_name
-                        return True
-            else:  # flexible pattern like assignment
-                if patterns == ['identifier', 'operator', '*expression']:
-                    if (len(self.types_sequence) >= 3 and 
-                        self.types_sequence[0] == 'identifier' and 
-                        self.types_sequence[1] == 'operator' and
-                        self.tokensWithTypes[1][0] == '='):  # Must be assignment operator
-                        
-                        # Check if the rest forms a valid expression
-                        self.current_index = 2  # Start after identifier and operator
-                        if self.parse_expression():
-                            if self.current_index == len(self.types_sequence):  # Consumed all tokens
-                                self.valid = True
-                                self.matched_rule = 'assignment'
-                                return True
+        # One walk of the rule automaton gives the candidate rules, best first
+        for rule_name, open_tail in GRAMMAR.match(self.types_sequence):
+            if open_tail and not getattr(self, self.OPEN_RULE_MATCHERS[rule_name])():
+                continue
+            self.valid = True
+            self.matched_rule = rule_name
+            return True
         
+        if self.error_index is None:
+            # Nothing fits: report the error against the assignment form
+            self.match_assignment()
         return False
 
-    def match_pattern(self, pattern):
-        if len(pattern) != len(self.types_sequence):
-            return False
-        
-        for i, expected_type in enumerate(pattern):
-            if self.types_sequence[i] != expected_type:
-                return False
-        
-        return True
-
-    def parse_expression(self):
+    def match_assignment(self):
         """
-        Parse expression with operator precedence and brackets
-        Based on recursive descent parsing
+        Validate an assignment and build its expression tree in the same pass.
+        On failure the offending token index is kept in self.error_index.
         """
-        return self.parse_assignment()
-    
-    def parse_assignment(self):
-        """Lowest precedence: assignment"""
-        return self.parse_comparison()
-    
-    def parse_comparison(self):
-        """Next level: comparison operators"""
-        left = self.parse_additive()
-        if not left:
+        types = self.types_sequence
+        if not types or types[0] != 'identifier':
+            self.error, self.error_index = "expected assignment target", 0
             return False
-        
-        while (self.current_index < len(self.types_sequence) and
-               self.types_sequence[self.current_index] == 'operator' and
-               self.precedence.get(self.tokensWithTypes[self.current_index][0], 0) == 2):
-            
-            self.current_index += 1  # Skip operator
-            right = self.parse_additive()
-            if not right:
-                return False
-        
-        return True
-    
-    def parse_additive(self):
-        """Next level: addition and subtraction"""
-        left = self.parse_multiplicative()
-        if not left:
+        if len(types) < 2 or types[1] != 'operator' or self.tokensWithTypes[1][0] != '=':  # Must be assignment operator
+            self.error, self.error_index = "expected '='", 1
             return False
         
-        while (self.current_index < len(self.types_sequence) and
-               self.types_sequence[self.current_index] == 'operator' and
-               self.precedence.get(self.tokensWithTypes[self.current_index][0], 0) == 3):
-            
-            self.current_index += 1  # Skip operator
-            right = self.parse_multiplicative()
-            if not right:
-                return False
-        
-        return True
-    
-    def parse_multiplicative(self):
-        """Next level: multiplication and division"""
-        left = self.parse_exponentiation()
-        if not left:
+        # Parse the rest as an expression, starting after identifier and operator
+        parser = ExpressionParser(self.tokensWithTypes, self.precedence, 2, types, self.nodes)
+        try:
+            ast = parser.parse()
+            if parser.current != len(types):  # Must consume all tokens
+                raise ParseError("unexpected token", parser.current)
+        except ParseError as e:
+            self.error, self.error_index = e.message, e.index
             return False
         
-        while (self.current_index < len(self.types_sequence) and
-               self.types_sequence[self.current_index] == 'operator' and
-               self.precedence.get(self.tokensWithTypes[self.current_index][0], 0) == 4):
-            
-            self.current_index += 1  # Skip operator
-            right = self.parse_exponentiation()
-            if not right:
-                return False
-        
+        self.current_index = parser.current
+        self.expression_ast = ast
         return True
-    
-    def parse_exponentiation(self):
-        """Highest binary operator precedence: exponentiation"""
-        left = self.parse_primary()
-        if not left:
-            return False
-        
-        while (self.current_index < len(self.types_sequence) and
-               self.types_sequence[self.current_index] == 'operator' and
-               self.precedence.get(self.tokensWithTypes[self.current_index][0], 0) == 5):
-            
-            self.current_index += 1  # Skip operator
-            right = self.parse_primary()
-            if not right:
-                return False
-        
-        return True
-    
-    def parse_primary(self):
-        """Parse primary expressions including parenthesized expressions"""
-        if self.current_index >= len(self.types_sequence):
-            return False
-        
-        # Handle literal or identifier
-        if self.types_sequence[self.current_index] in {'identifier', 'number', 'string'}:
-            self.current_index += 1
-            return True
-        
-        # Handle parenthesized expression
-        elif (self.types_sequence[self.current_index] == 'delimiter' and 
-              self.tokensWithTypes[self.current_index][0] == '('):
-            
-            self.current_index += 1  # Skip opening bracket
-            result = self.parse_expression()
-            
-            # Check for closing bracket
-            if (result and 
-                self.current_index < len(self.types_sequence) and
-                self.types_sequence[self.current_index] == 'delimiter' and
-                self.tokensWithTypes[self.current_index][0] == ')'):
-                
-                self.current_index += 1  # Skip closing bracket
-                return True
-            
-            return False
-        
-        return False
 
     def get_result(self):
         if self.analyze():
             return f"✅ Valid syntax: {self.matched_rule}"
         else:
+            return self.error_message()
+
+    def error_message(self):
+        if self.error_index is None:
             return "❌ Invalid syntax."
+        return f"❌ Invalid syntax: {self.error} at token {self.error_index}."
 
     def parseTreeGenerator(self):
+        tokens = self.tokensWithTypes
+        if tokens and tokens[0][1] == 'keyword' and tokens[0][0] in BlockParser.COMPOUND_KEYWORDS:
+            return self.compoundTree()
         if not self.analyze():
-            return "❌ Invalid syntax."
+            return self.error_message()
         
         if self.matched_rule == 'assignment':
             return self.assignmentTree()
         else:
             return f"✅ Matched rule: {self.matched_rule}, but no AST generator implemented."
 
+    def expressionTree(self):
+        """Parse all the tokens as one expression (no assignment target); an error message if they aren't one."""
+        self.types_sequence = types = self.token_types()
+        parser = ExpressionParser(self.tokensWithTypes, self.precedence, 0, types, self.nodes)
+        try:
+            ast = parser.parse()
+            if parser.current != len(types):
+                raise ParseError("unexpected token", parser.current)
+        except ParseError as e:
+            self.error, self.error_index = e.message, e.index
+            return self.error_message()
+        self.valid = True
+        self.matched_rule = 'expression'
+        return ast
+
+    def compoundTree(self):
+        """The tree of an if/while statement and its blocks, or an error message."""
+        self.types_sequence = self.token_types()
+        try:
+            tree = BlockParser(self.tokensWithTypes, self.types_sequence, self.precedence, self.nodes).parse()
+        except ParseError as e:
+            self.error, self.error_index = e.message, e.index
+            return self.error_message()
+        self.valid = True
+        self.matched_rule = tree.type
+        return tree
+
     def assignmentTree(self):
         tokens = self.tokensWithTypes
         left = tokens[0][0]  # assignment target
         
-        # Parse the right-hand expression with precedence handling
-        ast = self.build_expression_tree(tokens[2:])
-        
-        return {
-            'type': 'assignment',
-            'operator': '=',
-            'left': left,
-            'right': ast
-        }
-
-    def build_expression_tree(self, tokens):
-        """
-        Builds an expression tree respecting operator precedence and brackets
-        """
-        # Create a parser for just the expression tokens
-        parser = ExpressionParser(tokens, self.precedence)
-        return parser.parse()
+        # The right-hand expression tree was built while validating
+        return Assignment(left, self.expression_ast)
+
+
+class ParseError(ValueError):
+    """
+    Source that doesn't parse. index is the offending token's position in
+    the program's token list; statement is the statement's number when the
+    program has several.
+    """
+
+    def __init__(self, message, index, statement=None):
+        detail = f"{message} at token {index}"
+        super().__init__(detail if statement is None else f"{detail} (statement {statement})")
+        self.message = message
+        self.index = index
+        self.statement = statement
+
+    def __reduce__(self):
+        # Rebuilt from its fields when it crosses a process boundary
+        return type(self), (self.message, self.index, self.statement)
 
 
 class ExpressionParser:
-    def __init__(self, tokens, precedence):
+    """
+    Operator-precedence (shunting-yard) parser that validates an expression and
+    builds its tree in a single pass over the tokens. It keeps explicit operand
+    and operator stacks instead of recursing, so nesting depth is bounded only
+    by memory. All binary operators are left-associative.
+    """
+
+    # Operands a primary expression may consist of
+    operand_types = {'identifier', 'number', 'string'}
+
+    # Marker for an opening bracket on the operator stack
+    OPEN_BRACKET = ('(', 0)
+
+    def __init__(self, tokens, precedence, start=0, types=None, nodes=None):
         self.tokens = tokens
-        self.current = 0
+        self.current = start
         self.precedence = precedence
+        self.types = types if types is not None else [t[1] for t in tokens]
+        self.nodes = nodes if nodes is not None else NodeTable()
     
     def parse(self):
         return self.expression()
     
     def expression(self):
-        return self.binary_expression(0)  # Start with lowest precedence
-    
-    def binary_expression(self, min_precedence):
-        left = self.primary()
+        tokens, types, precedence = self.tokens, self.types, self.precedence
+        operand_types = self.operand_types
+        # Reducing an operator replaces the two topmost operands with one hash-consed node
+        binary = self.nodes.binary
+        end = len(tokens)
+        operands = []
+        operators = []
+        open_brackets = 0
+        expect_operand = True
         
-        while self.current < len(self.tokens):
-            # Check if current token is an operator
-            if self.tokens[self.current][1] != 'operator':
-                break
+        while True:
+            current = self.current
+            if expect_operand:
+                if current >= end:
+                    raise ParseError("unexpected end of expression", current)
+                token_type = types[current]
                 
-            op = self.tokens[self.current][0]
-            op_precedence = self.precedence.get(op, 0)
+                # Handle literals and identifiers
+                if token_type in operand_types:
+                    operands.append(tokens[current][0])
+                    expect_operand = False
+                # Handle bracketed expressions
+                elif token_type == 'delimiter' and tokens[current][0] == '(':
+                    operators.append(self.OPEN_BRACKET)
+                    open_brackets += 1
+                else:
+                    raise ParseError(f"unexpected {token_type} '{tokens[current][0]}'", current)
+                self.current += 1
+                continue
+            
+            op_precedence = 0
+            if current < end and types[current] == 'operator':
+                op = tokens[current][0]
+                op_precedence = precedence.get(op, 0)
             
-            # Break if operator has lower precedence than minimum
-            if op_precedence < min_precedence:
+            # Binary operators start at comparison level; '=' ends the expression
+            if op_precedence >= 2:
+                # Reduce everything that binds at least as tightly (left-associative)
+                while operators and operators[-1][1] >= op_precedence:
+                    right = operands.pop()
+                    operands[-1] = binary(operators.pop()[0], operands[-1], right)
+                operators.append((op, op_precedence))
+                expect_operand = True
+            elif open_brackets and current < end and tokens[current][0] == ')':
+                while operators[-1] is not self.OPEN_BRACKET:
+                    right = operands.pop()
+                    operands[-1] = binary(operators.pop()[0], operands[-1], right)
+                operators.pop()
+                open_brackets -= 1
+            elif open_brackets:
+                raise ParseError("expected closing bracket ')'", current)
+            else:
                 break
-                
-            # Consume operator
             self.current += 1
-            
-            # Parse right side with higher precedence
-            right = self.binary_expression(op_precedence + 1)
-            
-            # Create binary expression node
-            left = {
-                'operator': op,
-                'left': left,
-                'right': right
-            }
         
-        return left
+        while operators:
+            right = operands.pop()
+            operands[-1] = binary(operators.pop()[0], operands[-1], right)
+        return operands[0]
     
-    def primary(self):
-        token = self.tokens[self.current]
-        
-        # Handle bracketed expressions
-        if token[1] == 'delimiter' and token[0] == '(':
-            self.current += 1  # Skip opening bracket
-            expr = self.expression()
-            
-            # Verify closing bracket
-            if self.current < len(self.tokens) and self.tokens[self.current][0] == ')':
-                self.current += 1  # Skip closing bracket
-                return expr
+
+class BlockParser:
+    """
+    Parses one if/while statement with its { } blocks:
+
+        if (condition) { ... } else if (condition) { ... } else { ... }
+        while (condition) { ... }
+
+    Blocks hold assignments and further if/while statements. A statement in
+    a block ends where its expression does, or at ';', so blocks need no line
+    breaks. Open blocks are kept on an explicit stack instead of recursing.
+    """
+
+    COMPOUND_KEYWORDS = frozenset(['if', 'while'])
+
+    def __init__(self, tokens, types, precedence, nodes):
+        self.tokens = tokens
+        self.types = types
+        self.precedence = precedence
+        self.nodes = nodes
+
+    def value(self, index):
+        return self.tokens[index][0] if index < len(self.tokens) else None
+
+    def expect(self, index, value):
+        if self.value(index) != value or self.types[index] not in ('delimiter', 'keyword', 'operator'):
+            found = "end of statement" if index >= len(self.tokens) else f"'{self.tokens[index][0]}'"
+            raise ParseError(f"expected '{value}' but found {found}", index)
+        return index + 1
+
+    def expression(self, index):
+        """(tree, index after it) of the expression starting at index."""
+        parser = ExpressionParser(self.tokens, self.precedence, index, self.types, self.nodes)
+        return parser.parse(), parser.current
+
+    def parse(self):
+        tokens, types = self.tokens, self.types
+        end = len(tokens)
+        top = []
+        statements = [top]  # statement lists of the open blocks, innermost last
+        frames = []         # per open block: (kind, condition, statements of the if block)
+        index = 0
+        while True:
+            if len(statements) > 1:
+                while index < end and tokens[index][0] == ';' and types[index] == 'delimiter':
+                    index += 1
+                if index < end and tokens[index][0] == '}' and types[index] == 'delimiter':
+                    index += 1
+                    block = statements.pop()
+                    kind, condition, if_block = frames.pop()
+                    if kind == 'if' and self.value(index) == 'else' and types[index] == 'keyword':
+                        index += 1
+                        if self.value(index) == 'if' and types[index] == 'keyword':
+                            # else if: the nested statement is the whole else block
+                            frames.append(('else if', condition, block))
+                            statements.append([])
+                            continue
+                        index = self.expect(index, '{')
+                        frames.append(('else', condition, block))
+                        statements.append([])
+                        continue
+                    if kind == 'loop':
+                        node = Loop(condition, block)
+                    elif kind == 'if':
+                        node = Conditional(condition, block)
+                    else:
+                        node = Conditional(condition, if_block, block)
+                    self.finish(node, statements, frames)
+                    continue
+            elif top:
+                if index < end:
+                    raise ParseError("unexpected token", index)
+                return top[0]
+            if index >= end:
+                raise ParseError("expected '}'" if len(statements) > 1 else "unexpected end of statement", index)
+
+            value, token_type = tokens[index]
+            if token_type == 'keyword' and value in self.COMPOUND_KEYWORDS:
+                index = self.expect(index + 1, '(')
+                condition, index = self.expression(index)
+                index = self.expect(index, ')')
+                index = self.expect(index, '{')
+                frames.append(('if' if value == 'if' else 'loop', condition, None))
+                statements.append([])
+            elif types[index] == 'identifier' and self.value(index + 1) == '=' and types[index + 1] == 'operator':
+                expression, index = self.expression(index + 2)
+                self.finish(Assignment(value, expression), statements, frames)
             else:
-                raise SyntaxError("Expected closing bracket ')'")
-        
-        # Handle literals and identifiers
-        self.current += 1
-        return token[0]
\ No newline at end of file
+                raise ParseError(f"unexpected {types[index]} '{value}'", index)
+
+    def finish(self, node, statements, frames):
+        """Add a completed statement to the innermost block, closing else-if blocks it completes."""
+        statements[-1].append(node)
+        while frames and frames[-1][0] == 'else if' and statements[-1]:
+            _, condition, if_block = frames.pop()
+            node = Conditional(condition, if_block, statements.pop())
+            statements[-1].append(node)
+
+
+class ProgramAnalyzer:
+    """
+    Splits a token stream into statements and parses each one with
+    SyntaxAnalyzer. Statements end at ';' and at line breaks, except inside
+    brackets or next to an operator (a line ending in '+' continues). An
+    if/while statement runs to the end of its blocks: ';' inside braces and a
+    line break before 'else' don't end it. A lone statement keeps its own
+    AST; two or more become a Program node.
+    """
+
+    OPEN_BRACKETS = frozenset(['(', '[', '{'])
+    CLOSE_BRACKETS = frozenset([')', ']', '}'])
+
+    def __init__(self, tokensWithTypes, line_breaks=()):
+        self.tokensWithTypes = tokensWithTypes
+        self.line_breaks = line_breaks
+        self.nodes = NodeTable()
+
+    def statements(self):
+        """Yield (start, end) token ranges of the non-empty statements."""
+        tokens = self.tokensWithTypes
+        breaks = iter(self.line_breaks)
+        next_break = next(breaks, None)
+        depth = 0
+        braces = 0
+        start = 0
+        for index, (value, token_type) in enumerate(tokens):
+            if index == next_break:
+                next_break = next(breaks, None)
+                if (depth == 0 and index > start and token_type != 'operator'
+                        and tokens[index - 1][1] != 'operator' and value != 'else'):
+                    yield start, index
+                    start = index
+            if token_type != 'delimiter':
+                continue
+            if value == ';':
+                if braces:
+                    continue
+                if index > start:
+                    yield start, index
+                start = index + 1
+                depth = 0
+            elif value in self.OPEN_BRACKETS:
+                depth += 1
+                if value == '{':
+                    braces += 1
+            elif value in self.CLOSE_BRACKETS and depth:
+                depth -= 1
+                if value == '}' and braces:
+                    braces -= 1
+        if len(tokens) > start:
+            yield start, len(tokens)
+
+    def parse(self):
+        """The program's AST; raises ParseError for the first statement that doesn't parse."""
+        tokens = self.tokensWithTypes
+        ranges = list(self.statements()) or [(0, len(tokens))]
+        body = []
+        for number, (start, end) in enumerate(ranges, 1):
+            analyzer = SyntaxAnalyzer(tokens if (start, end) == (0, len(tokens)) else tokens[start:end], self.nodes)
+            tree = analyzer.parseTreeGenerator()
+            if not isinstance(tree, Node):
+                statement = number if len(ranges) > 1 else None
+                if not analyzer.valid:
+                    raise ParseError(analyzer.error, start + analyzer.error_index, statement)
+                # Valid, but a form with no AST (declarations, calls, ...)
+                raise ParseError(f"{analyzer.matched_rule} statements are not supported", start, statement)
+            body.append(tree)
+        return body[0] if len(body) == 1 else Program(body)
+
+    def parseTreeGenerator(self):
+        try:
+            return self.parse()
+        except ParseError as e:
+            return f"❌ Invalid syntax: {e}."
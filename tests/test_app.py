@@ -0,0 +1,151 @@
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("flask")
+import app as app_module  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_compile(client):
+    response = client.post('/', json={'text': 'x = a + 1'})
+    assert response.status_code == 200
+    assert dict(response.get_json())['machine_code']
+
+
+def test_parse_error_is_a_400_with_its_position(client):
+    response = client.post('/', json={'text': 'x = 1\ny = a +'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "unexpected end of expression at token 7 (statement 2)",
+                                   'token': 7, 'statement': 2}
+
+
+def test_batch_reports_parse_positions(client):
+    response = client.post('/compile/batch', json=['x = a +', 'y = 1'])
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0] == {'index': 0, 'error': "unexpected end of expression at token 4", 'token': 4}
+    assert 'result' in lines[1]
+
+
+def test_run_reports_parse_positions(client):
+    response = client.post('/run', json={'text': 'x = (a'})
+    assert response.status_code == 400
+    assert response.get_json()['token'] == 4
+
+
+def test_lexical_error_is_a_400_with_line_and_column(client):
+    response = client.post('/', json={'text': 'x = 1\ny = 3.5'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "Unrecognised character '.' at line 2, column 6",
+                                   'line': 2, 'column': 6}
+
+
+@pytest.mark.parametrize("body", [["x = 1"], "x = 1", 7, None])
+def test_body_must_be_an_object(client, body):
+    response = client.post('/', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_text_must_be_a_string(client):
+    response = client.post('/', json={'text': 12})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("encoding", ["json", "compact"])
+def test_deeply_nested_blocks_compile(client, encoding):
+    source = "if (a < b) { while (c < 1) { c = c + 1\n" * 500 + "x = 1" + " } }" * 500
+    response = client.post('/', json={'text': source, 'encoding': encoding})
+    assert response.status_code == 200
+    response = client.post('/', json={'text': source, 'encoding': encoding, 'stages': ['AST']})
+    assert response.status_code == 200
+
+
+@pytest.fixture
+def channel_url(monkeypatch):
+    """ws:// URL of /channel on a real server; the test client doesn't speak WebSocket."""
+    pytest.importorskip("flask_sock")
+    from werkzeug.serving import make_server
+    monkeypatch.setenv('CHANNEL_RATE', '0.01')
+    monkeypatch.setenv('CHANNEL_BURST', '3')
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"ws://127.0.0.1:{server.server_port}/channel"
+    server.shutdown()
+    thread.join()
+
+
+def test_channel_supersedes_and_rate_limits(channel_url, monkeypatch):
+    from simple_websocket import Client
+    gate = threading.Event()
+    started = threading.Semaphore(0)
+    compile = app_module.run_compile
+
+    def gated_compile(text, options):
+        started.release()
+        gate.wait(10)
+        return compile(text, options)
+    monkeypatch.setattr(app_module, 'run_compile', gated_compile)
+
+    ws = Client.connect(channel_url)
+    try:
+        def receive():
+            return json.loads(ws.receive(timeout=10))
+
+        ws.send(json.dumps({'id': 1, 'text': "x = 1", 'key': "doc"}))
+        assert started.acquire(timeout=10)
+        ws.send(json.dumps({'id': 2, 'text': "x = a + 2", 'key': "doc"}))
+        assert receive() == {'id': 1, 'cancelled': True}
+        gate.set()
+        reply = receive()
+        assert reply['id'] == 2 and dict(reply['result'])['machine_code']
+        ws.send(json.dumps({'id': 3, 'text': "x = 1 +"}))
+        assert receive() == {'id': 3, 'error': "unexpected end of expression at token 4", 'token': 4}
+        # The burst of 3 is used up
+        ws.send(json.dumps({'id': 4, 'text': "x = 4"}))
+        reply = receive()
+        assert (reply['id'], reply['error']) == (4, 'Rate limit exceeded') and reply['retry_after'] > 0
+    finally:
+        ws.close()
+
+
+@pytest.mark.parametrize("body", [[1, 2], "x = 1", 7])
+def test_session_bodies_must_be_objects(client, body):
+    response = client.post('/session', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400 and 'error' in response.get_json()
+    session = client.post('/session', json={'text': "x = 1"}).get_json()['session']
+    response = client.post(f'/session/{session}/edits', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400 and 'error' in response.get_json()
+    assert client.post('/session').status_code == 201
+
+
+@pytest.mark.parametrize("body", [[1, 2], "x = 1", 7])
+def test_run_body_must_be_an_object(client, body):
+    response = client.post('/run', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def test_run_reports_unassigned_comparison_operands(client):
+    response = client.post('/run', json={'text': "x = a == b", 'inputs': {'a': 1}})
+    assert response.status_code == 400
+    assert "b used before it is assigned" in response.get_json()['error']
+
+
+@pytest.mark.parametrize("body", [[1, 2], "x + 1", 7])
+def test_evaluate_body_must_be_an_object(client, body, monkeypatch):
+    # The body is checked before numpy is used
+    monkeypatch.setattr(app_module.vectorEvaluator, 'numpy', object())
+    response = client.post('/evaluate', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def test_binary_output_refuses_wide_immediates(client):
+    response = client.post('/', json={'text': 'x = 99999999999', 'format': 'binary'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "Immediate 99999999999 does not fit in 32 bits"}
@@ -0,0 +1,22 @@
+import pytest
+
+from assembler import Assembler, AssemblerError
+from intermediateCode import IRProgram
+
+
+def assemble(*instructions):
+    program = IRProgram()
+    for instruction in instructions:
+        program.emit(*instruction)
+    return Assembler(program).assemble()
+
+
+def test_immediates_at_the_32_bit_bounds():
+    assembly = assemble(("MOV", "x", "2147483647"), ("MOV", "y", "-2147483648"))
+    assert assembly.instructions == 2 and set(assembly.data) == {"x", "y"}
+
+
+@pytest.mark.parametrize("value", ["99999999999", "2147483648", "-2147483649"])
+def test_immediates_outside_32_bits_are_refused(value):
+    with pytest.raises(AssemblerError, match=f"Immediate {value} does not fit in 32 bits"):
+        assemble(("MOV", "x", value))
@@ -0,0 +1,46 @@
+import pytest
+
+from astNodes import from_json, to_json
+from codeGenerator import IntermediateCodeGenerator
+from compactEncoding import decode_ast, encode_ast
+from compiler import Compiler
+from responseEncoder import dumps
+from virtualMachine import run
+
+# Well past the default recursion limit once every level is a few frames deep
+DEPTH = 600
+
+NESTED = "if (a < b) { while (c < 1) { c = c + 1\n" * DEPTH + "x = 1" + " } }" * DEPTH
+ELSE_IF_CHAIN = ("if (a == 0) { x = 0 }" + "".join(f" else if (a == {i}) {{ x = {i} }}" for i in range(1, DEPTH))
+                 + " else { x = 1 }")
+
+
+def ast(source):
+    compiler = Compiler(source, stages=("AST",))
+    compiler.compile()
+    return compiler.ast
+
+
+@pytest.mark.parametrize("source", [NESTED, ELSE_IF_CHAIN])
+@pytest.mark.parametrize("options", [{}, {'stages': ("AST",)}, {'stages': ("AST",), 'compact': True},
+                                     {'optimizations': ("constant_folding",), 'output_format': "binary"}])
+def test_deep_nesting_compiles(source, options):
+    result = Compiler(source, **options).compile()
+    if not isinstance(result, bytes):
+        dumps(result)
+
+
+@pytest.mark.parametrize("source", [NESTED, ELSE_IF_CHAIN])
+def test_deep_nesting_round_trips(source):
+    tree = ast(source)
+    expected = IntermediateCodeGenerator(tree).generate_intermediate_code().render()
+    for copy in (to_json(tree), decode_ast(encode_ast(tree)), decode_ast(encode_ast(to_json(tree)))):
+        assert dumps(copy) == dumps(to_json(tree))
+        assert dumps(to_json(from_json(copy))) == dumps(copy)
+        assert IntermediateCodeGenerator(copy).generate_intermediate_code().render() == expected
+
+
+def test_deep_nesting_runs():
+    assert run(ELSE_IF_CHAIN, {'a': DEPTH - 1})['variables']['x'] == DEPTH - 1
+    assert run(ELSE_IF_CHAIN, {'a': DEPTH})['variables']['x'] == 1
+    assert run(NESTED, {'a': 0, 'b': 1, 'c': 0})['variables']['c'] == 1
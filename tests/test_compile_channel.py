@@ -0,0 +1,97 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from compileChannel import CompileChannel
+
+
+class Outcome:
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        return json.dumps(self.text)
+
+
+class GatedCompile:
+    """A compile that holds every call until release(), counting the calls that have started."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def __call__(self, text, options):
+        self.started.release()
+        self.gate.wait(10)
+        return Outcome(text)
+
+    def wait_started(self, count=1):
+        for _ in range(count):
+            assert self.started.acquire(timeout=10)
+
+    def release(self):
+        self.gate.set()
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def replies(sent):
+    return [json.loads(text) for text in sent]
+
+
+def test_superseded_running_jobs_count_until_they_finish(executor):
+    sent = []
+    compile = GatedCompile()
+    channel = CompileChannel(sent.append, compile, executor, rate=1000, burst=1000, max_pending=2)
+    channel.receive(json.dumps({'id': 1, 'text': "x = 1", 'key': "doc"}))
+    compile.wait_started()
+    channel.receive(json.dumps({'id': 2, 'text': "x = 2", 'key': "doc"}))
+    compile.wait_started()
+    # 1 and 2 are both still running, though only 2 will be answered
+    channel.receive(json.dumps({'id': 3, 'text': "x = 3", 'key': "doc"}))
+    channel.receive(json.dumps({'id': 4, 'text': "y = 1"}))
+    assert replies(sent) == [{'id': 1, 'cancelled': True}, {'id': 2, 'cancelled': True},
+                             {'id': 3, 'error': 'Too many compiles in flight'},
+                             {'id': 4, 'error': 'Too many compiles in flight'}]
+    compile.release()
+    executor.shutdown(wait=True)
+    assert not channel.jobs and not channel.draining
+    assert len(sent) == 4
+
+
+def test_cancelled_running_job_counts_until_it_finishes(executor):
+    sent = []
+    compile = GatedCompile()
+    channel = CompileChannel(sent.append, compile, executor, rate=1000, burst=1000, max_pending=1)
+    channel.receive(json.dumps({'id': 1, 'text': "x = 1"}))
+    compile.wait_started()
+    channel.receive(json.dumps({'id': 2, 'cancel': 1}))
+    channel.receive(json.dumps({'id': 3, 'text': "x = 3"}))
+    compile.release()
+    executor.shutdown(wait=True)
+    assert replies(sent) == [{'id': 1, 'cancelled': True}, {'id': 3, 'error': 'Too many compiles in flight'}]
+    assert not channel.draining
+
+
+def test_queued_job_is_cancelled_before_it_runs():
+    sent = []
+    compile = GatedCompile()
+    executor = ThreadPoolExecutor(1)
+    channel = CompileChannel(sent.append, compile, executor, rate=1000, burst=1000, max_pending=3)
+    channel.receive(json.dumps({'id': 1, 'text': "x = 1"}))
+    compile.wait_started()
+    channel.receive(json.dumps({'id': 2, 'text': "x = 2", 'key': "doc"}))
+    channel.receive(json.dumps({'id': 3, 'text': "x = 3", 'key': "doc"}))
+    # 2 never started, so it stopped counting at once
+    assert len(channel.jobs) == 2 and not channel.draining
+    compile.release()
+    executor.shutdown(wait=True)
+    assert sorted(replies(sent), key=lambda reply: reply['id']) == [
+        {'id': 1, 'result': "x = 1"}, {'id': 2, 'cancelled': True}, {'id': 3, 'result': "x = 3"}]
@@ -0,0 +1,97 @@
+import random
+import re
+
+from compileSession import CompileSession
+from programGenerator import ProgramGenerator
+
+# Label prefixes number units by creation, which differs between a session and a fresh one
+_UNIT_PREFIX = re.compile(r'S\d+_')
+
+SNIPPETS = ("\n", ";", " ", "x = ", "a + 1", " * b", "(", ")", "y = 2\n", "if (a < b) { ", "} ", "else ",
+            "{ z = 3 }", "while (c < 2) { c = c + 1 }", "+", "\nw = x")
+_OPERAND = re.compile(r'\b(?:[a-z]+|\d+)\b')
+
+
+def random_edit(rng, generator, source):
+    """(start, end, text) for an edit that mostly keeps the program valid."""
+    roll = rng.random()
+    if roll < 0.3:
+        # Replace an operand
+        operands = [m for m in _OPERAND.finditer(source) if m.group() not in ("if", "else", "while")]
+        if operands:
+            match = rng.choice(operands)
+            return match.start(), match.end(), generator.operand()
+    if roll < 0.5:
+        # Insert a statement at a line start or at the start of a block
+        starts = [0] + [m.end() for m in re.finditer(r'\n|\{ ', source)]
+        offset = rng.choice(starts)
+        separator = "\n" if offset == 0 or source[offset - 1] == "\n" else " ; "
+        return offset, offset, generator.statement() + separator
+    if roll < 0.6:
+        # Delete a line
+        lines = [m.span() for m in re.finditer(r'[^\n]*\n?', source) if m.group()]
+        if lines:
+            return (*rng.choice(lines), "")
+    if roll < 0.7:
+        offset = source.rfind("\n", 0, rng.randint(0, len(source))) + 1
+        return offset, offset, generator.block_program(statements=2, depth=2) + "\n"
+    # Anything at all
+    start = rng.randint(0, len(source))
+    end = min(len(source), start + rng.choice((0, 0, 1, 2, 5, 20)))
+    return start, end, rng.choice(SNIPPETS) if rng.random() < 0.8 else ""
+
+
+def restoring_edit(source, target):
+    """The single edit that turns source back into target."""
+    prefix = 0
+    while prefix < min(len(source), len(target)) and source[prefix] == target[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < min(len(source), len(target)) - prefix
+           and source[len(source) - 1 - suffix] == target[len(target) - 1 - suffix]):
+        suffix += 1
+    return prefix, len(source) - suffix, target[prefix:len(target) - suffix]
+
+
+def normalized(session):
+    return [[stage, _UNIT_PREFIX.sub("S_", value) if stage == "machine_code"
+             else [_UNIT_PREFIX.sub("S_", line) for line in value] if stage == "intermediate_code"
+             else value]
+            for stage, value in session.result()]
+
+
+def test_source_round_trips():
+    source = "x = 1\n  y = x + 2 ;; \n\nif (x < y) { z = 1 }\nelse { z = 2 }\n"
+    session = CompileSession(source)
+    assert session.source() == source
+    assert len(session.statements()) == 3
+
+
+def test_edits_match_a_fresh_compile():
+    rng = random.Random(17)
+    generator = ProgramGenerator(seed=17, size=3, depth=1)
+    source = generator.block_program(statements=3, depth=2)
+    session = CompileSession(source)
+    valid = 0
+    last_valid = source
+    for _ in range(400):
+        if source != last_valid and rng.random() < 0.5:
+            start, end, text = restoring_edit(source, last_valid)
+        else:
+            start, end, text = random_edit(rng, generator, source)
+        change = session.apply_edit(start, end, text)
+        source = source[:start] + text + source[end:]
+        assert session.source() == source
+        assert set(change) == {'start', 'removed', 'statements'}
+        expected = normalized(CompileSession(source))
+        if len(expected) == 2:
+            # Invalid: a session may report a different error first (it never lexes the whole source at once)
+            assert len(session.result()) == 2, source
+        else:
+            assert normalized(session) == expected, source
+            valid += 1
+            last_valid = source
+        if len(source) > 2000:
+            source = last_valid = generator.block_program(statements=3, depth=2)
+            session = CompileSession(source)
+    assert valid > 150
@@ -0,0 +1,19 @@
+import compiler
+from compileCache import CompileCache
+from compiler import Compiler
+
+
+def test_cache_hits_are_counted_only_for_profiles(monkeypatch):
+    counted = []
+    monkeypatch.setattr(compiler, "STAGE_METRICS", {
+        stage: (name, lambda value, stage=stage: counted.append(stage) or 1)
+        for stage, (name, _) in compiler.STAGE_METRICS.items()})
+    cache = CompileCache()
+    source = "x = (a + b) * (a + b)"
+    first = Compiler(source, cache=cache).compile()
+    assert counted == ["tokens", "AST", "intermediate_code", "machine_code"]
+    del counted[:]
+    assert Compiler(source, cache=cache).compile() == first
+    assert counted == []
+    Compiler(source, cache=cache, profile=True).compile()
+    assert counted == ["tokens", "AST", "intermediate_code", "machine_code"]
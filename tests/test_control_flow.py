@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from compiler import Compiler
+from controlFlow import JUMP_OPS, ControlFlowGraph
+from lowering import StrengthReducer
+from optimizer import PASSES, Optimizer
+from programGenerator import VARIABLES, ProgramGenerator
+from registerAllocator import RegisterAllocator
+from virtualMachine import VirtualMachine, VMError
+
+
+def intermediate(source, optimizations=()):
+    compiler = Compiler(source, optimizations=optimizations, stages=("intermediate_code",))
+    compiler.compile()
+    return compiler.intermediate_program
+
+
+def outcome(program, inputs, names=None):
+    """Variables after running program (only those in names, if given), or the fault's class."""
+    try:
+        variables = VirtualMachine(program).run(inputs, max_steps=100_000)['variables']
+    except VMError as e:
+        return type(e).__name__
+    return variables if names is None else {name: variables.get(name) for name in names}
+
+
+def jumps(program):
+    return sum(1 for i in program.instructions if i.opcode in JUMP_OPS and len(i.operands) == 1)
+
+
+@pytest.fixture
+def unsimplified(monkeypatch):
+    """Compile without the CFG pass, by making simplify() a no-op."""
+    def compile_unsimplified(source, optimizations=()):
+        with monkeypatch.context() as patch:
+            patch.setattr(ControlFlowGraph, "simplify", lambda self: self.program)
+            return intermediate(source, optimizations)
+    return compile_unsimplified
+
+
+def test_if_else_chain():
+    source = "if (a < 0) { s = 0 - 1 } else if (a == 0) { s = 0 } else { s = 1 }"
+    program = intermediate(source)
+    assert [outcome(program, {'a': a})['s'] for a in (-5, 0, 5)] == [-1, 0, 1]
+
+
+def test_simplified_ir_runs_like_unsimplified_ir(unsimplified):
+    generator = ProgramGenerator(seed=5, size=3, depth=1)
+    rng = random.Random(5)
+    before = after = 0
+    for _ in range(300):
+        source = generator.block_program(statements=3, depth=3)
+        inputs = {name: rng.randint(-5, 5) for name in VARIABLES}
+        plain, simplified = unsimplified(source), intermediate(source)
+        before, after = before + jumps(plain), after + jumps(simplified)
+        assert jumps(simplified) <= jumps(plain), source
+        expected = outcome(plain, inputs)
+        assert outcome(simplified, inputs) == expected, source
+        optimized = Optimizer(simplified, PASSES).optimize()
+        assert outcome(optimized, inputs) == expected, source
+        assert outcome(StrengthReducer(optimized).lower(), inputs) == expected, source
+    assert after < before
+
+
+def test_register_allocation_keeps_variables(unsimplified):
+    generator = ProgramGenerator(seed=9, size=3, depth=1)
+    rng = random.Random(9)
+    for _ in range(300):
+        source = generator.block_program(statements=3, depth=3)
+        inputs = {name: rng.randint(-5, 5) for name in VARIABLES}
+        program = intermediate(source, PASSES)
+        expected = outcome(program, inputs)
+        if isinstance(expected, str):
+            continue
+        allocated = RegisterAllocator(StrengthReducer(program).lower()).allocate()
+        assert outcome(allocated, inputs, expected) == expected, source
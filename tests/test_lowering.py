@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from compiler import Compiler
+from lowering import StrengthReducer, power_of_two
+from optimizer import INT32_MAX, INT32_MIN
+from programGenerator import VARIABLES, ProgramGenerator
+from virtualMachine import VirtualMachine, VMError
+
+
+def intermediate(source):
+    compiler = Compiler(source, stages=("intermediate_code",))
+    compiler.compile()
+    return compiler.intermediate_program
+
+
+def outcome(program, inputs):
+    """Variables after running program, or the fault's class: both must agree."""
+    try:
+        return VirtualMachine(program).run(inputs, max_steps=100_000)['variables']
+    except VMError as e:
+        return type(e).__name__
+
+
+def test_power_of_two():
+    assert [power_of_two(v) for v in (1, 2, 3, 4, 64, 96, -8)] == [None, 1, None, 2, 6, None, None]
+
+
+@pytest.mark.parametrize("source", [
+    "x = a * 8", "x = a / 8", "x = a / 2", "x = a / 1", "x = a * 1", "x = a * 0", "x = a + 0",
+    "x = a - 0", "x = a ** 0", "x = a ** 1", "x = a ** 5", "x = a ** 13", "x = a ** b",
+    "x = a * 2147483648", "x = a / 2147483648", "x = a * 4294967296", "x = a / 4294967296",
+    "x = a * 1099511627776", "x = a / 1099511627776", "x = a / 4294967298", "x = a + 4294967296",
+    "x = a ** 4294967298",
+])
+def test_lowering_matches_ir_at_the_edges(source):
+    program = intermediate(source)
+    lowered = StrengthReducer(program).lower()
+    for a in (0, 1, -1, 7, -7, 9, -9, INT32_MAX, INT32_MIN, INT32_MIN + 1):
+        for b in (-2, 0, 1, 2, 31, 40):
+            inputs = {'a': a, 'b': b}
+            assert outcome(lowered, inputs) == outcome(program, inputs), (source, inputs)
+
+
+def test_lowering_matches_ir_on_random_expressions():
+    # Constants 1-99 include every power of two up to 64
+    generator = ProgramGenerator(seed=9, size=6, depth=2)
+    rng = random.Random(9)
+    for source in generator.statements(400):
+        program = intermediate(source)
+        lowered = StrengthReducer(program).lower()
+        inputs = {name: rng.choice((rng.randint(-20, 20), rng.randint(INT32_MIN, INT32_MAX)))
+                  for name in VARIABLES}
+        assert outcome(lowered, inputs) == outcome(program, inputs), (source, inputs)
+
+
+@pytest.mark.parametrize("source", ["x = a * 1099511627776", "x = a / 1099511627776", "x = a * 2147483648",
+                                    "x = a / 4294967304", "x = a * 4294967304"])
+def test_shift_counts_stay_in_range(source):
+    lowered = StrengthReducer(intermediate(source)).lower()
+    for instruction in lowered.instructions:
+        if instruction.opcode in ("SHL", "SHR", "SAR"):
+            assert 0 <= int(lowered.operand_names(instruction)[1]) < 32, lowered.render()
+
+
+def test_shifts_render_distinctly():
+    def opcodes(source):
+        return [line.split()[0] for line in Compiler(source).compile()[3][1].splitlines()]
+    assert "11000001100" in opcodes("x = a * 4")
+    divide = opcodes("x = a / 4")
+    assert {"11000001111", "11000001101"} <= set(divide) and "11000001100" not in divide
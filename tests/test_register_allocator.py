@@ -0,0 +1,52 @@
+from assembler import Assembler
+from compiler import Compiler
+from machineCodeGenerator import MachineCodeGenerator
+from registerAllocator import REGISTERS, RegisterAllocator
+from virtualMachine import VirtualMachine, run
+
+
+def intermediate(source):
+    compiler = Compiler(source, stages=("intermediate_code",))
+    compiler.compile()
+    return compiler.intermediate_program
+
+
+def test_temps_get_registers():
+    program = RegisterAllocator(intermediate("x = (a + b) * (c - d)")).allocate()
+    names = {name for i in program.instructions for name in program.operand_names(i)}
+    assert names - {"a", "b", "c", "d", "x"} <= set(REGISTERS)
+
+
+def test_spills_when_registers_run_out():
+    # Each sum stays live until the products to its right are done
+    source = "x = " + " * (".join(f"(a{i} + b{i})" for i in range(12)) + ")" * 11
+    program = intermediate(source)
+    allocated = RegisterAllocator(program, registers=REGISTERS[:2]).allocate()
+    inputs = {f"{p}{i}": i + 1 for i in range(12) for p in "ab"}
+    expected = VirtualMachine(program).run(inputs)['variables']['x']
+    assert VirtualMachine(allocated).run(inputs)['variables']['x'] == expected
+    assert any(name.startswith("[%EBP-") for name in allocated.symbols.names)
+
+
+def test_variables_named_like_temps_are_stored():
+    machine_code = Compiler("temp0 = a + b").compile()[3][1]
+    assert machine_code.splitlines()[-1].endswith("temp0, %EAX")
+    assert run("temp0 = a + b\nt = temp0 * 2", {'a': 1, 'b': 2})['variables'] == {
+        'a': 1, 'b': 2, 'temp0': 3, 't': 6}
+
+
+def test_variables_named_like_registers_stay_variables():
+    program = intermediate("x = b + c * d\ny = EAX")
+    machine_code = MachineCodeGenerator(program).generate_code()
+    assert machine_code.splitlines()[-1] == "100010 y, EAX"
+    assembly = Assembler(MachineCodeGenerator(program).prepare()).assemble()
+    assert "EAX" in assembly.data and not any(name.startswith("%") for name in assembly.data)
+    assert run("x = b + c * d\ny = EAX", {'b': 1, 'c': 2, 'd': 3, 'EAX': 9})['variables']['y'] == 9
+
+
+def test_variables_named_like_labels_stay_variables():
+    source = "L0 = 1\nLABEL0 = 2\nif (L0 < LABEL0) { x = 1 } else { x = 2 }"
+    assert run(source)['variables']['x'] == 1
+    assembly = Compiler(source, output_format="binary").compile()
+    symbols = dict(assembly)['symbols']
+    assert {"L0", "LABEL0"} <= set(symbols['data']) and not {"L0", "LABEL0"} & set(symbols['labels'])
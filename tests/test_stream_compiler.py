@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from lexicalAnalizer import LexicalAnalyzer, LexicalError, StreamLexer
+from programGenerator import ProgramGenerator
+from streamCompiler import compile_stream, split_statements
+
+
+def random_chunks(rng, text):
+    pieces = []
+    while text:
+        size = rng.choice((1, 2, 3, 7, 50))
+        pieces.append(text[:size])
+        text = text[size:]
+    return pieces
+
+
+def stream_tokens(chunks):
+    lexer = StreamLexer()
+    lexed = [token for chunk in chunks for token in lexer.feed(chunk)] + lexer.finish()
+    return [token for token, _ in lexed], [index for index, (_, starts_line) in enumerate(lexed) if starts_line]
+
+
+def sources(seed, count):
+    generator = ProgramGenerator(seed=seed, size=3, depth=1)
+    rng = random.Random(seed)
+    for _ in range(count):
+        source = generator.block_program(statements=4, depth=2)
+        yield source.replace(" ", "") if rng.random() < 0.5 else source.replace("\n", rng.choice(("\n", ";", "\n\n ")))
+
+
+def test_stream_lexer_matches_analyze_program():
+    rng = random.Random(3)
+    for source in sources(3, 200):
+        assert stream_tokens(random_chunks(rng, source)) == LexicalAnalyzer().analyze_program(source), source
+
+
+def test_operators_split_across_chunks():
+    assert stream_tokens(["x=a*", "*2;y=a<", "=b!", "=c"])[0] == LexicalAnalyzer().analyze_program(
+        "x=a**2;y=a<=b!=c")[0]
+
+
+def test_lexical_error_position_across_chunks():
+    with pytest.raises(LexicalError) as caught:
+        stream_tokens(["x = 1\ny", " = 3", ".5"])
+    assert (caught.value.line, caught.value.column) == (2, 6)
+
+
+def test_no_whitespace_body_holds_one_token():
+    lexer = StreamLexer()
+    longest = 0
+    for chunk in ["x=a"] + ["+abc"] * 20_000:
+        lexer.feed(chunk)
+        longest = max(longest, len(lexer.pending))
+    assert longest == 3
+
+
+def test_long_token_is_refused():
+    lexer = StreamLexer(max_token_length=100)
+    with pytest.raises(ValueError):
+        for _ in range(10):
+            lexer.feed("a" * 20)
+
+
+def test_stream_matches_whole_source():
+    rng = random.Random(5)
+    for source in sources(5, 100):
+        expected = "".join(compile_stream([source]))
+        assert "; error" not in expected, source
+        assert "".join(compile_stream(random_chunks(rng, source))) == expected, source
+
+
+@pytest.mark.parametrize("chunks, statement", [(["x=" + "a+" * 2_000 + "a"], 1),
+                                               (["y = 1\n", "x=" + "a+" * 2_000, "a"], 2)])
+def test_token_cap_applies_to_the_last_statement(chunks, statement):
+    output = "".join(compile_stream(chunks, max_statement_tokens=1_000))
+    assert output.endswith(f"; error: Statement is longer than 1000 tokens (statement {statement})\n")
+
+
+def test_token_cap_stops_a_growing_statement():
+    chunks = iter(["x=a"] + ["+a"] * 10_000)
+    with pytest.raises(ValueError):
+        for _ in split_statements(chunks, max_statement_tokens=1_000):
+            pass
+    # Stopped soon after the cap, not at the end of the body
+    assert len(list(chunks)) > 9_000
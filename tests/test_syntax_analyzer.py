@@ -0,0 +1,52 @@
+import pickle
+
+import pytest
+
+from astNodes import Assignment, Program
+from lexicalAnalizer import LexicalAnalyzer, LexicalError
+from syntaxAnalizer import ParseError, ProgramAnalyzer, SyntaxAnalyzer
+
+
+def parse(source):
+    return ProgramAnalyzer(*LexicalAnalyzer().analyze_program(source)).parse()
+
+
+def test_statements():
+    assert isinstance(parse("x = a + 1"), Assignment)
+    program = parse("x = 1\ny = x * (2 +\n 3); z = y")
+    assert isinstance(program, Program) and len(program.body) == 3
+
+
+@pytest.mark.parametrize("source, message, index, statement", [
+    ("x = a +", "unexpected end of expression", 4, None),
+    ("= 1", "expected assignment target", 0, None),
+    ("x = 1\ny = (2", "expected closing bracket ')'", 7, 2),
+    ("x = 1; y 2", "expected '='", 5, 2),
+])
+def test_parse_errors_carry_their_position(source, message, index, statement):
+    with pytest.raises(ParseError) as caught:
+        parse(source)
+    assert (caught.value.message, caught.value.index, caught.value.statement) == (message, index, statement)
+
+
+@pytest.mark.parametrize("source, start", [("int x = y;", 0), ("int x = y", 0), ("a = 1; int x = y;", 4),
+                                           ("a = 1\nint x = y\nb = 2", 3)])
+def test_declarations_keep_matching_after_the_split(source, start):
+    tokens = LexicalAnalyzer().analyze_program(source)[0]
+    with pytest.raises(ParseError) as caught:
+        parse(source)
+    # Recognised as a declaration, which has no AST, rather than a broken assignment
+    assert (caught.value.message, caught.value.index) == ("declaration statements are not supported", start)
+    analyzer = SyntaxAnalyzer(tokens[start:start + 4])
+    assert analyzer.analyze() and analyzer.matched_rule == 'declaration'
+
+
+def test_parse_error_pickles():
+    # Pool workers send errors back to the web process
+    error = pickle.loads(pickle.dumps(ParseError("expected '='", 5, 2)))
+    assert (str(error), error.index, error.statement) == ("expected '=' at token 5 (statement 2)", 5, 2)
+
+
+def test_lexical_error_pickles():
+    error = pickle.loads(pickle.dumps(LexicalError('.', 2, 6)))
+    assert (str(error), error.line, error.column) == ("Unrecognised character '.' at line 2, column 6", 2, 6)
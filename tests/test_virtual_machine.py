@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from compiler import Compiler
+from lowering import StrengthReducer
+from optimizer import INT32_MAX, INT32_MIN, PASSES, Optimizer
+from programGenerator import VARIABLES, ProgramGenerator
+from virtualMachine import StepLimitExceeded, TimeLimitExceeded, VirtualMachine, VMError, run, wrap
+
+
+def intermediate(source):
+    compiler = Compiler(source, stages=("intermediate_code",))
+    compiler.compile()
+    return compiler.intermediate_program
+
+
+def outcome(program, inputs):
+    try:
+        return VirtualMachine(program).run(inputs, max_steps=100_000)['variables']
+    except VMError as e:
+        return type(e).__name__
+
+
+def test_wrap():
+    assert wrap(INT32_MAX + 1) == INT32_MIN
+    assert wrap(INT32_MIN - 1) == INT32_MAX
+    assert wrap(-5) == -5
+
+
+def test_arithmetic_follows_32_bit_machine_code():
+    result = run("a = x * x\nb = 0 - 7 / 2\nc = 2 ** 40\nd = 3 ** 0\ne = x < 3", {'x': 65536})
+    assert result['variables'] == {'x': 65536, 'a': 0, 'b': -3, 'c': 0, 'd': 1, 'e': 0}
+
+
+def test_loops_and_branches():
+    source = "s = 0\ni = 0\nwhile (i < n) { if (i / 2 * 2 == i) { s = s + i } else { s = s - 1 } ; i = i + 1 }"
+    assert run(source, {'n': 10})['variables']['s'] == 20 - 5
+
+
+@pytest.mark.parametrize("source, inputs, message", [
+    ("x = a / b", {'a': 1, 'b': 0}, "Division fault"),
+    ("x = a / b", {'a': INT32_MIN, 'b': -1}, "Division fault"),
+    ("x = y + 1", {}, "y used before it is assigned"),
+    ("x = a == b", {'a': 1}, "b used before it is assigned"),
+    ("x = a != b", {'a': 1}, "b used before it is assigned"),
+    ("x = b == a", {'a': 1}, "b used before it is assigned"),
+])
+def test_faults(source, inputs, message):
+    with pytest.raises(VMError, match=message):
+        run(source, inputs)
+
+
+def test_step_and_time_limits():
+    source = "i = 0\nwhile (i < 1000000) { i = i + 1 }"
+    with pytest.raises(StepLimitExceeded):
+        run(source, max_steps=1000)
+    with pytest.raises(TimeLimitExceeded):
+        run(source, max_steps=10 ** 9, time_limit=0.001)
+
+
+def test_optimized_and_lowered_ir_agree_with_plain_ir():
+    generator = ProgramGenerator(seed=22, size=8, depth=3)
+    rng = random.Random(22)
+    for source in generator.statements(400):
+        program = intermediate(source)
+        inputs = {name: rng.randint(-50, 50) for name in VARIABLES}
+        expected = outcome(program, inputs)
+        optimized = Optimizer(program, PASSES).optimize()
+        assert outcome(optimized, inputs) == expected, source
+        assert outcome(StrengthReducer(optimized).lower(), inputs) == expected, source
@@ -0,0 +1,224 @@
+"""
+Vectorized evaluation of an expression over columns of variable bindings.
+
+The expression is parsed once, compiled into an ExpressionKernel (a list of
+whole-column NumPy operations, one per distinct AST node), and run once
+over all the rows. Arithmetic follows the 32-bit machine code the compiler
+generates:
+
+    + - *        wrap around modulo 2**32
+    /            truncates toward zero; division by zero and
+                 INT32_MIN / -1 fault the row (its result is null)
+    **           repeated multiplication, wrapping; exponents <= 0 give 1
+    < <= > >= == !=   1 when true, 0 when false
+
+Needs NumPy (`pip install numpy`); without it evaluate() raises ValueError.
+"""
+from astNodes import Assignment, BinaryOp
+from lexicalAnalizer import LexicalAnalyzer
+from optimizer import INT32_MIN, INT32_MAX
+from syntaxAnalizer import SyntaxAnalyzer
+
+try:
+    import numpy
+except ImportError:  # optional: /evaluate needs `pip install numpy`
+    numpy = None
+
+MAX_ROWS = 100_000
+MAX_OPERATIONS = 1_000
+
+
+# Each operation takes two int32 columns and the row validity mask, which it
+# clears for rows that fault, and returns an int32 column
+
+def _add(left, right, valid):
+    return left + right
+
+
+def _subtract(left, right, valid):
+    return left - right
+
+
+def _multiply(left, right, valid):
+    return left * right
+
+
+def _divide(left, right, valid):
+    faults = (right == 0) | ((left == INT32_MIN) & (right == -1))
+    valid &= ~faults
+    right = numpy.where(faults, 1, right)
+    # Quotient of the magnitudes in 64 bits, then the sign: truncation toward zero like IDIV
+    quotient = numpy.abs(left.astype(numpy.int64)) // numpy.abs(right.astype(numpy.int64))
+    return numpy.where((left < 0) != (right < 0), -quotient, quotient).astype(numpy.int32)
+
+
+def _power(left, right, valid):
+    # Square-and-multiply over the exponent bits, as the lowered POWER loop does
+    result = numpy.ones_like(left)
+    base = left
+    exponent = numpy.maximum(right, 0)
+    while exponent.any():
+        odd = (exponent & 1).astype(bool)
+        result = numpy.where(odd, result * base, result)
+        base = base * base
+        exponent = exponent >> 1
+    return result
+
+
+def _comparison(compare):
+    def operation(left, right, valid):
+        return compare(left, right).astype(numpy.int32)
+    return operation
+
+
+OPERATIONS = {
+    "+": _add,
+    "-": _subtract,
+    "*": _multiply,
+    "/": _divide,
+    "**": _power,
+    "<": _comparison(lambda a, b: a < b),
+    "<=": _comparison(lambda a, b: a <= b),
+    ">": _comparison(lambda a, b: a > b),
+    ">=": _comparison(lambda a, b: a >= b),
+    "==": _comparison(lambda a, b: a == b),
+    "!=": _comparison(lambda a, b: a != b),
+}
+
+
+def parse_expression(source):
+    """The expression tree of "expr" or of the right-hand side of "name = expr"."""
+    tokens = LexicalAnalyzer().analyzer(source)
+    analyzer = SyntaxAnalyzer(tokens)
+    if len(tokens) > 1 and tokens[1][0] == '=':
+        tree = analyzer.parseTreeGenerator()
+        if isinstance(tree, Assignment):
+            return tree.right
+    else:
+        tree = analyzer.expressionTree()
+        if analyzer.valid:
+            return tree
+    raise ValueError(tree)
+
+
+class ExpressionKernel:
+    """
+    An expression compiled to a flat list of column operations. Every
+    distinct operand and node gets a slot; a subexpression shared in the
+    (hash-consed) AST is computed once. Slots are released after their last
+    use, so only the columns still needed are alive.
+    """
+
+    def __init__(self, expression, max_operations=MAX_OPERATIONS):
+        self.variables = {}   # name -> slot
+        self.constants = {}   # slot -> value
+        self.steps = []       # (slot, operation, left slot, right slot)
+        slots = {}
+        stack = [(expression, False)]
+        while stack:
+            node, children_done = stack.pop()
+            key = node if isinstance(node, BinaryOp) else ('operand', node)
+            if key in slots:
+                continue
+            if not isinstance(node, BinaryOp):
+                slots[key] = len(slots)
+                self.add_operand(node, slots[key])
+            elif not children_done:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            else:
+                if len(self.steps) >= max_operations:
+                    raise ValueError(f"Expression has more than {max_operations} operations")
+                operation = OPERATIONS.get(node.operator)
+                if operation is None:
+                    raise ValueError(f"Unsupported operator: {node.operator}")
+                left = slots[node.left if isinstance(node.left, BinaryOp) else ('operand', node.left)]
+                right = slots[node.right if isinstance(node.right, BinaryOp) else ('operand', node.right)]
+                slots[key] = len(slots)
+                self.steps.append((slots[key], operation, left, right))
+        self.slot_count = len(slots)
+        self.output = slots[expression if isinstance(expression, BinaryOp) else ('operand', expression)]
+        # Slots whose last use is each step, to drop once it has run
+        last_use = {}
+        for index, (_, _, left, right) in enumerate(self.steps):
+            last_use[left] = last_use[right] = index
+        self.releases = [[] for _ in self.steps]
+        for slot, index in last_use.items():
+            if slot != self.output:
+                self.releases[index].append(slot)
+
+    def add_operand(self, operand, slot):
+        if operand.isdecimal():
+            value = int(operand)
+            if value > INT32_MAX:
+                raise ValueError(f"Constant {operand} does not fit in 32 bits")
+            self.constants[slot] = value
+        elif operand.isidentifier():
+            self.variables[operand] = slot
+        else:
+            raise ValueError(f"Unsupported operand: {operand}")
+
+    def evaluate(self, columns, rows):
+        """Run over int32 columns of length rows; returns (results, valid row mask)."""
+        values = [None] * self.slot_count
+        for name, slot in self.variables.items():
+            values[slot] = columns[name]
+        for slot, value in self.constants.items():
+            values[slot] = numpy.full(rows, value, dtype=numpy.int32)
+        valid = numpy.ones(rows, dtype=bool)
+        for (slot, operation, left, right), releases in zip(self.steps, self.releases):
+            values[slot] = operation(values[left], values[right], valid)
+            for released in releases:
+                values[released] = None
+        return values[self.output], valid
+
+
+def load_column(name, values, max_rows):
+    if not isinstance(values, list):
+        raise ValueError(f"Column {name} must be a list of integers")
+    if len(values) > max_rows:
+        raise ValueError(f"Column {name} has more than {max_rows} rows")
+    try:
+        column = numpy.asarray(values)
+    except (ValueError, OverflowError):
+        column = None
+    if column is None or column.ndim != 1 or (column.size and column.dtype.kind not in "iu"):
+        raise ValueError(f"Column {name} must be a list of integers")
+    if column.size and (column.min() < INT32_MIN or column.max() > INT32_MAX):
+        raise ValueError(f"Column {name} has values outside the 32-bit range")
+    return column.astype(numpy.int32)
+
+
+def evaluate(source, columns, max_rows=MAX_ROWS, max_operations=MAX_OPERATIONS):
+    """
+    Evaluate source for every row of columns ({name: [int, ...]}, all the
+    same length). Returns {'results': [...], 'rows', 'faults'}, with null
+    results for rows that faulted.
+    """
+    if numpy is None:
+        raise ValueError("Expression evaluation needs the numpy package")
+    if not isinstance(source, str) or not source.strip():
+        raise ValueError("No expression provided")
+    if not isinstance(columns, dict):
+        raise ValueError("columns must map variable names to lists of integers")
+    kernel = ExpressionKernel(parse_expression(source), max_operations)
+    missing = sorted(name for name in kernel.variables if name not in columns)
+    if missing:
+        raise ValueError(f"No column for variable: {', '.join(missing)}")
+    lengths = {len(values) if isinstance(values, list) else None for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("Columns must all be lists of the same length")
+    # Every column sets the row count; only the ones the expression uses are loaded
+    rows = lengths.pop() if lengths else 1
+    loaded = {name: load_column(name, columns[name], max_rows) for name in kernel.variables}
+    if rows is None or rows > max_rows:
+        raise ValueError(f"Columns must be lists of at most {max_rows} rows")
+    results, valid = kernel.evaluate(loaded, rows)
+    output = results.tolist()
+    faults = 0
+    if not valid.all():
+        for row in numpy.flatnonzero(~valid).tolist():
+            output[row] = None
+            faults += 1
+    return {'results': output, 'rows': rows, 'faults': faults}
@@ -0,0 +1,234 @@
+"""
+Interpreter for the IR produced by IntermediateCodeGenerator, so compiled
+programs can be checked without an assembler or a real machine.
+
+A program is decoded once into a flat list of (opcode number, operand,
+operand) tuples: labels are resolved to instruction indexes, and every
+operand becomes an index into one memory list that holds variables, temps
+and constants alike. Execution is a single loop over that list.
+
+Arithmetic follows the 32-bit machine code the compiler generates:
+
+    ADD SUB IMUL POWER   wrap around modulo 2**32; POWER exponents <= 0 give 1
+    IDIV                 truncates toward zero; division by zero and
+                         INT32_MIN / -1 are faults
+    CMP a, b + Jcc label signed comparison of a and b
+    Jcc dest, src        (comparisons inside expressions) dest = 1 or 0
+
+The shift, AND/OR/NOT instructions of strength-reduced code also run, as do
+CALL Print (appends to the output) and CALL Input (takes the next input).
+"""
+import re
+import time
+
+from compiler import Compiler
+from intermediateCode import IRProgram, is_temp
+from optimizer import INT32_MIN, INT32_MAX, wrap
+
+MAX_STEPS = 1_000_000
+TIME_LIMIT = 1.0
+
+# Taken jumps between checks of the clock
+CLOCK_INTERVAL = 1024
+
+_CONSTANT = re.compile(r'^-?\d+$')
+
+# Opcode numbers of the decoded program, roughly in order of frequency
+(MOV, ADD, SUB, IMUL, IDIV, POWER, CMP, JMP, JE, JNE, JL, JLE, JG, JGE,
+ SETE, SETNE, SETL, SETLE, SETG, SETGE, SHL, SAR, SHR, AND, OR, NOT, PRINT, INPUT) = range(28)
+
+OPCODES = {
+    "MOV": MOV, "ADD": ADD, "SUB": SUB, "IMUL": IMUL, "IDIV": IDIV, "POWER": POWER, "CMP": CMP,
+    "SHL": SHL, "SAR": SAR, "SHR": SHR, "AND": AND, "OR": OR, "NOT": NOT,
+    "CALL Print": PRINT, "CALL Input": INPUT, "JMP": JMP,
+}
+# Jcc label after a CMP, and Jcc dest, src computing a comparison into dest
+JUMPS = {"JE": JE, "JNE": JNE, "JL": JL, "JLE": JLE, "JG": JG, "JGE": JGE}
+SETS = {"JE": SETE, "JNE": SETNE, "JL": SETL, "JLE": SETLE, "JG": SETG, "JGE": SETGE}
+
+
+class VMError(ValueError):
+    pass
+
+
+class StepLimitExceeded(VMError):
+    pass
+
+
+class TimeLimitExceeded(VMError):
+    pass
+
+
+def power(base, exponent):
+    result = 1
+    while exponent > 0:
+        if exponent & 1:
+            result = wrap(result * base)
+        base = wrap(base * base)
+        exponent >>= 1
+    return result
+
+
+class VirtualMachine:
+    """
+    An IRProgram decoded for execution. Decoding checks every opcode and
+    jump target up front, so run() only has to execute. One instance can be
+    run any number of times, with different inputs.
+    """
+
+    def __init__(self, program):
+        self.program = program
+        names = program.symbols.names
+        self.memory = [None] * len(names)  # initial memory: constants filled in
+        self.variables = {}                # variable name -> memory index
+        self.code = []
+        labels = {}
+        jumps = []
+        for instruction in program.instructions:
+            opcode, operands = instruction.opcode, instruction.operands
+            if opcode == IRProgram.LABEL:
+                labels[names[operands[0]]] = len(self.code)
+                continue
+            if opcode == IRProgram.PARAM:
+                continue
+            if opcode in JUMPS and len(operands) == 1 or opcode == "JMP":
+                if len(operands) != 1:
+                    raise VMError(f"Cannot execute: {program.render_instruction(instruction)}")
+                jumps.append(len(self.code))
+                self.code.append((JUMPS.get(opcode, JMP), names[operands[0]], None))
+                continue
+            number = SETS[opcode] if opcode in SETS else OPCODES.get(opcode)
+            expected = 1 if number in (NOT, PRINT, INPUT) else 2
+            if number is None or len(operands) != expected:
+                raise VMError(f"Cannot execute: {program.render_instruction(instruction)}")
+            for symbol in operands:
+                self.load(symbol, names[symbol])
+            self.code.append((number, operands[0], operands[-1]))
+        for index in jumps:
+            opcode, label, _ = self.code[index]
+            if label not in labels:
+                raise VMError(f"Jump to undefined label: {label}")
+            self.code[index] = (opcode, labels[label], None)
+
+    def load(self, symbol, name):
+        if _CONSTANT.match(name):
+            self.memory[symbol] = wrap(int(name))
+        elif not is_temp(name):
+            self.variables[name] = symbol
+
+    def run(self, inputs=None, max_steps=MAX_STEPS, time_limit=TIME_LIMIT):
+        """
+        Execute with variables bound from inputs ({name: int}); CALL Input
+        reads inputs['input'], a list. Returns {'variables', 'output', 'steps'}.
+        """
+        inputs = inputs or {}
+        memory = list(self.memory)
+        for name, value in inputs.items():
+            symbol = self.variables.get(name)
+            if symbol is not None:
+                if type(value) is not int or not INT32_MIN <= value <= INT32_MAX:
+                    raise VMError(f"Input {name} must be a 32-bit integer")
+                memory[symbol] = value
+        stdin = list(reversed(inputs.get('input') or ()))
+        output = []
+        code = self.code
+        end = len(code)
+        deadline = time.perf_counter() + time_limit
+        clock = CLOCK_INTERVAL
+        flags = 0
+        pc = 0
+        # Steps are counted per straight-line run, when a jump is taken or the program ends
+        steps = 0
+        run_start = 0
+        try:
+            while pc < end:
+                opcode, a, b = code[pc]
+                pc += 1
+                if opcode == MOV:
+                    value = memory[b]
+                    if value is None:
+                        raise TypeError
+                    memory[a] = value
+                elif opcode == ADD:
+                    value = memory[a] + memory[b]
+                    memory[a] = value if INT32_MIN <= value <= INT32_MAX else wrap(value)
+                elif opcode == SUB:
+                    value = memory[a] - memory[b]
+                    memory[a] = value if INT32_MIN <= value <= INT32_MAX else wrap(value)
+                elif opcode == IMUL:
+                    value = memory[a] * memory[b]
+                    memory[a] = value if INT32_MIN <= value <= INT32_MAX else wrap(value)
+                elif opcode == IDIV:
+                    dividend, divisor = memory[a], memory[b]
+                    if divisor == 0 or (divisor == -1 and dividend == INT32_MIN):
+                        raise VMError(f"Division fault at instruction {pc - 1}")
+                    quotient = abs(dividend) // abs(divisor)
+                    memory[a] = quotient if (dividend < 0) == (divisor < 0) else -quotient
+                elif opcode == POWER:
+                    memory[a] = power(memory[a], memory[b])
+                elif opcode == CMP:
+                    flags = memory[a] - memory[b]
+                elif opcode <= JGE:
+                    if (opcode == JMP or (opcode == JE and flags == 0) or (opcode == JNE and flags != 0)
+                            or (opcode == JL and flags < 0) or (opcode == JLE and flags <= 0)
+                            or (opcode == JG and flags > 0) or (opcode == JGE and flags >= 0)):
+                        steps += pc - run_start
+                        pc = run_start = a
+                        if steps > max_steps:
+                            raise StepLimitExceeded(f"Program ran for more than {max_steps} steps")
+                        clock -= 1
+                        if not clock:
+                            clock = CLOCK_INTERVAL
+                            if time.perf_counter() > deadline:
+                                raise TimeLimitExceeded(f"Program ran for more than {time_limit} seconds")
+                elif opcode <= SETGE:
+                    left, right = memory[a], memory[b]
+                    if left is None or right is None:
+                        # None == x is no TypeError; fault like the other comparisons
+                        raise TypeError
+                    memory[a] = int(
+                        left == right if opcode == SETE else left != right if opcode == SETNE else
+                        left < right if opcode == SETL else left <= right if opcode == SETLE else
+                        left > right if opcode == SETG else left >= right)
+                elif opcode == SHL:
+                    memory[a] = wrap(memory[a] << (memory[b] & 31))
+                elif opcode == SAR:
+                    memory[a] = memory[a] >> (memory[b] & 31)
+                elif opcode == SHR:
+                    memory[a] = wrap((memory[a] & 0xFFFFFFFF) >> (memory[b] & 31))
+                elif opcode == AND:
+                    memory[a] = memory[a] & memory[b]
+                elif opcode == OR:
+                    memory[a] = memory[a] | memory[b]
+                elif opcode == NOT:
+                    memory[a] = ~memory[a]
+                elif opcode == PRINT:
+                    if memory[a] is None:
+                        raise TypeError
+                    output.append(memory[a])
+                else:
+                    if not stdin:
+                        raise VMError(f"No input left at instruction {pc - 1}")
+                    value = stdin.pop()
+                    if type(value) is not int or not INT32_MIN <= value <= INT32_MAX:
+                        raise VMError("Inputs must be 32-bit integers")
+                    memory[a] = value
+        except TypeError:
+            # Arithmetic on None: an operand was read before anything was stored in it
+            names = self.program.symbols.names
+            unset = [names[o] for o in code[pc - 1][1:] if isinstance(o, int) and memory[o] is None]
+            raise VMError(f"{', '.join(unset) or 'Operand'} used before it is assigned "
+                          f"at instruction {pc - 1}") from None
+        steps += end - run_start
+        if steps > max_steps:
+            raise StepLimitExceeded(f"Program ran for more than {max_steps} steps")
+        variables = {name: memory[symbol] for name, symbol in self.variables.items()
+                     if memory[symbol] is not None}
+        return {'variables': variables, 'output': output, 'steps': steps}
+
+
+def run(source, inputs=None, optimizations=(), cache=None, max_steps=MAX_STEPS, time_limit=TIME_LIMIT):
+    """Compile source to IR (through the compile cache, if given) and execute it."""
+    compiler = Compiler(source, cache=cache, optimizations=optimizations, stages=("intermediate_code",))
+    compiler.compile()
+    return VirtualMachine(compiler.intermediate_program).run(inputs, max_steps, time_limit)